@@ -0,0 +1,179 @@
+"""
+This module runs all the steps of the CPEX-CV forecasting template in one python process:
+archiving yesterday's images, downloading, creating the animations, and cropping/processing.
+What the download step found (run_state.RunState) is handed to the next steps in memory, and each run works in its
+own workspace, ./runs/<profile>-<YYYY-MM-DD>/ (workspace.py), so the main and model_4panel profiles (or two forecast
+days) can run at the same time without sharing any switch file or image directory. The final images are published
+into ./figs_final/ at the end of the run, each one renamed over the old one, one run at a time.
+
+Run it from the template directory:
+
+  python -m cpexcv run --profile main
+  python -m cpexcv run --profile model_4panel
+  python -m cpexcv run --profile main --resume --jobs 4
+  python -m cpexcv run --profile main --state ./figs/.run_state.json
+  python -m cpexcv run --profile main --animation-format mp4
+  python -m cpexcv run --profile main --image-cache-mb 1024
+  python -m cpexcv run --profile main --date 2022-08-26 --no-archive
+  python -m cpexcv run --profile main --run-id main-rerun
+  python -m cpexcv run --profile main --workspace .
+  python -m cpexcv backfill --from 2022-08-20 --to 2022-08-26 --workers 3
+
+Profiles:
+ - main: the full night run (switches_download_main.txt)
+ - model_4panel: the mesoscale model 4-panel before the briefing (switches_download_model_4panel.txt)
+
+The backfill command runs past forecast days again, several at a time, each in its own workspace, and archives
+their final images (backfill.py).
+
+Required packages: argparse, collections, datetime, os, sys.
+"""
+
+import argparse
+from collections import namedtuple
+from datetime import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'supplementary'))
+
+import animation_writer
+import archive_yesterdays_images
+import backfill
+import create_animations
+import crop_edit_daily_images
+import download_daily_images_all
+import image_engine
+import workspace
+
+
+Profile = namedtuple('Profile', ['name', 'switches_file', 'archive', 'download', 'animations', 'processing'])
+
+profiles = {'main': Profile('main', 'switches_download_main.txt', True, True, True, True),
+            'model_4panel': Profile('model_4panel', 'switches_download_model_4panel.txt', False, True, False, True)}
+
+
+def banner(text):
+  """
+  banner(text)
+
+  Prints the name of the step that is starting, after a few empty lines.
+  """
+
+  print(" ")
+  print(" ")
+  print(" ")
+  print("... " + text)
+
+
+def runProfile(profile, resume=False, jobs=None, stateFile=None, day=None, ws=None):
+  """
+  runProfile(profile, resume, jobs, stateFile, day, ws)
+
+  Runs the steps of a profile one after the other in the workspace of the run, and publishes its final images.
+
+  Parameters:
+  - profile: Profile (e.g. profiles['main'])
+  - resume: True to rerun a night that died partway through (no archive, only the missing images are downloaded)
+  - jobs: number of worker processes for the frames (None for one per core)
+  - stateFile: JSON file the state of the download step is also written to (None to keep it in memory only)
+  - day: forecast day to run (datetime, None for today)
+  - ws: workspace.Workspace of the run (None for ./runs/<profile>-<YYYY-MM-DD>/)
+  """
+
+  if ws is None:
+    ws = workspace.Workspace.forRun(profile.name, day)
+  ws.create()
+  print('... Working in ' + ws.root + '.')
+
+  # the workspace is not removed by the archive step of another run while this one works in it
+  with ws.running():
+    state = None
+    compaction = None
+
+    if profile.archive and not resume:
+      banner("Archiving yesterday's imagery.")
+      archive_yesterdays_images.run(ws)
+      # older archive days are packed in the background, while the night's images are made
+      compaction = archive_yesterdays_images.startCompaction(archiveDir=ws.archiveDir)
+
+    if profile.download:
+      banner("Running download_daily_images_all.py")
+      state = download_daily_images_all.run(resume=resume, switchesFile=profile.switches_file, profile=profile.name, stateFile=stateFile, day=day, workspace=ws,
+                                            nJobs=jobs)
+
+    if profile.animations:
+      banner("Running create_animations.py")
+      create_animations.run(state, ws)
+
+    if profile.processing:
+      banner("Running crop_edit_daily_images.py")
+      crop_edit_daily_images.run(state, jobs or crop_edit_daily_images.nJobs, ws)
+
+    if profile.processing and ws.publishDir is not None:
+      banner("Publishing the final images into " + ws.publishDir)
+      print('... ' + str(len(ws.publish())) + ' images published.')
+
+    print(image_engine.cache.report())
+
+    if compaction is not None and compaction.is_alive():
+      print('... Waiting for the archive compaction to finish (the images of the night are ready).')
+    if compaction is not None:
+      compaction.join()
+
+  return
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python -m cpexcv', description='CPEX-CV forecasting template')
+  commands = parser.add_subparsers(dest='command')
+  run_parser = commands.add_parser('run', help='run the steps of a profile')
+  run_parser.add_argument('--profile', choices=sorted(profiles), default='main')
+  run_parser.add_argument('--resume', action='store_true', help='rerun a night that died partway through')
+  run_parser.add_argument('--jobs', type=int, default=None, help='worker processes for the frames (default: one per core)')
+  run_parser.add_argument('--state', default=None, help='also write the download results to this JSON file')
+  run_parser.add_argument('--animation-format', choices=sorted(animation_writer.writers), default=animation_writer.animation_format,
+                          help='write the animations as gif, mp4 (H.264) or webp')
+  run_parser.add_argument('--image-cache-mb', type=int, default=image_engine.cache_bytes//(1024*1024),
+                          help='memory kept for decoded images shared by the stages (0 to read every image from disk)')
+  run_parser.add_argument('--date', default=None, help='run a past forecast day (YYYY-MM-DD, default: today)')
+  run_parser.add_argument('--no-archive', action='store_true', help="do not archive yesterday's images first")
+  run_parser.add_argument('--run-id', default=None, help='name of the workspace of the run (default: <profile>-<YYYY-MM-DD>)')
+  run_parser.add_argument('--workspace', default=None, help='work directly in DIR/figs*/ instead, without publishing (e.g. .)')
+  backfill_parser = commands.add_parser('backfill', help='run past forecast days again and archive them')
+  backfill_parser.add_argument('--from', dest='first', required=True, help='first forecast day (YYYY-MM-DD)')
+  backfill_parser.add_argument('--to', dest='last', required=True, help='last forecast day (YYYY-MM-DD)')
+  backfill_parser.add_argument('--profile', choices=sorted(profiles), default='main')
+  backfill_parser.add_argument('--workers', type=int, default=backfill.max_workers, help='days run at once')
+  backfill_parser.add_argument('--jobs', type=int, default=None, help='image processes per day (default: the cores shared between the days)')
+  backfill_parser.add_argument('--animation-format', choices=sorted(animation_writer.writers), default=animation_writer.animation_format)
+  backfill_parser.add_argument('--keep-workspaces', action='store_true', help='keep ./backfill/YYYY-MM-DD/ of the days that succeeded')
+  args = parser.parse_args(argv)
+
+  if args.command == 'backfill':
+    results = backfill.backfill(args.first, args.last, args.profile, args.workers, args.jobs, args.animation_format,
+                                keepWorkspaces=args.keep_workspaces)
+    return 0 if all(results.values()) else 1
+
+  if args.command != 'run':
+    parser.print_help()
+    return 1
+
+  animation_writer.animation_format = args.animation_format
+  image_engine.cache.maxBytes = args.image_cache_mb*1024*1024
+  profile = profiles[args.profile]
+  if args.no_archive:
+    profile = profile._replace(archive=False)
+  day = datetime.strptime(args.date, '%Y-%m-%d') if args.date else None
+  ws = None
+  if args.workspace is not None:
+    ws = workspace.Workspace.inPlace(args.workspace)
+  elif args.run_id is not None:
+    ws = workspace.Workspace.forRun(profile.name, day, args.run_id)
+  runProfile(profile, args.resume, args.jobs, args.state, day, ws)
+
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
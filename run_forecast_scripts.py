@@ -7,71 +7,19 @@ swu@ou.edu
 This python script will combine a bunch of steps (true/false switches) in creating the forecast template.
 Things you will need to change after downloading this to your computer:
   - change true/false switches according to what you want executed
-  - change true/false switched_download.txt according to what you want to download
+  - change true/false switches_download_main.txt according to what you want to download
+  - set resume_run=True to rerun a night that died partway through without downloading everything again
+  - all the steps run in this python process (cpexcv.py, same as: python -m cpexcv run --profile main)
 """
 
-import os
-import subprocess
+import cpexcv
 
 
-#os_system='Windows'
-#os_system='Linux'
-os_system='Mac'
-
-change_work_dir=True
 run_archive=True
 run_download=True
 run_animations=True
 run_processing=True
-
-cwd = os.getcwd()
-cmd = ['cp', os.path.join(cwd,'supplementary','switches_download_main.txt'), os.path.join(cwd,'supplementary','switches_download.txt') ]
-os.system(' '.join(cmd))
-
-
-if change_work_dir:
-  print(" ")
-  print(" ")
-  print(" ")
-  print("... Changing working directory to CPEX forecast template.")
-  cmd = ['cd ' + cwd]
-  os.system(' '.join(cmd))
-
-
-if run_archive:
-  print(" ")
-  print(" ")
-  print(" ")
-  print("... Archiving yesterday's imagery.")
-  cmd = ['python ' + os.path.join(cwd,'supplementary','archive_yesterdays_images.py')]
-  os.system(' '.join(cmd))
-
-
-if run_download:
-  print(" ")
-  print(" ")
-  print(" ")
-  print("... Running download_daily_images_all.py")
-  if os_system=='Mac' or os_system=='Linux': cmd = ['python ' + os.path.join(cwd,'supplementary','download_daily_images_all.py')]
-  if os_system=='Windows': cmd = ['python ' + os.path.join(cwd,'supplementary','download_daily_images_all_windows.py')]
-  os.system(' '.join(cmd))
-
-
-if run_animations:
-  print(" ")
-  print(" ")
-  print(" ")
-  print("... Running create_animations.py")
-  if os_system=='Mac' or os_system=='Linux': cmd = ['python ' + os.path.join(cwd,'supplementary','create_animations.py')]
-  if os_system=='Windows': cmd = ['python ' + os.path.join(cwd,'supplementary','create_animations_windows.py')]
-  os.system(' '.join(cmd))
+resume_run=False  # rerun after a failed night: keeps ./figs/ (no archive) and only downloads the missing images
 
 
-if run_processing:
-  print(" ")
-  print(" ")
-  print(" ")
-  print("... Running crop_edit_daily_images.py")
-  if os_system=='Mac' or os_system=='Linux': cmd = ['python ' + os.path.join(cwd,'supplementary','crop_edit_daily_images.py')]
-  if os_system=='Windows': cmd = ['python ' + os.path.join(cwd,'supplementary','crop_edit_daily_images_windows.py')]
-  os.system(' '.join(cmd))
+cpexcv.runProfile(cpexcv.profiles['main']._replace(archive=run_archive, download=run_download, animations=run_animations, processing=run_processing), resume=resume_run)
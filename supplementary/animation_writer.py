@@ -0,0 +1,515 @@
+"""
+This module writes the .gif animations of the CPEX-CV forecasting template in memory (Pillow), instead of
+copying the last frame nDup times (persistLastImage) and having ImageMagick's convert read every frame again:
+
+  convert -delay 50 uwincm_precip_day1_anim_* -loop 0 +repage uwincm_precip_day1_movie.gif
+
+The last frame is held on screen by giving it a longer duration (delay x (1 + hold)) instead of adding copies of
+it, and all the frames are mapped to one palette made from a sample of the frames (median cut, optionally refined
+with k-means), so the colors do not flicker from frame to frame and each frame does not carry its own color table.
+
+The model maps are mostly the same from one frame to the next (coastlines, labels, color bars), so after the
+first frame only the rectangle around the pixels that changed is written, and the pixels inside it that did not
+change are made transparent (they compress to almost nothing). Frames that did not change at all are merged into
+the previous frame's duration. Each animation prints a line with its size and the time it took:
+
+  animate(cropDir, 'ECMWF_GFS_midRH_day1_anim_', 'ECMWF_GFS_midRH_day1.gif')
+  ... ... ECMWF_GFS_midRH_day1.gif: 15 frames (12 written, 31% of the pixels), 1843 kB in 2.1 s
+
+The same frames can also be written as a video or an animated WebP (animation_format, or fmt=), which are much
+smaller and decode faster in the briefing deck; the extension of the output name follows the format:
+ - gif: as above
+ - mp4: H.264, with the local ffmpeg (or OpenCV's cv2.VideoWriter if there is no ffmpeg); the last frame is
+   repeated hold times, since a video has one frame rate
+ - webp: animated WebP (Pillow built with WebP)
+A format that is not available on the computer falls back to gif, with a message.
+
+The frames are streamed: writeAnimation takes any iterable of frames (e.g. a generator reading them one by one),
+and the gif and mp4 writers encode each frame as it comes, keeping only the previous frame, so the memory does not
+grow with the length of the loop, and each output is written once. The shared palette is made beforehand from a
+few sampled frames (paletteFrames). Pillow's WebP encoder needs all the frames at once, so webp keeps them.
+
+  frames = (image_engine.load(fl) for fl in fls)
+  paletteFrames = (image_engine.load(fl) for fl in sampleOf(fls))
+  writeAnimation(frames, './figs_safety/SLP_Rainrate_day1.gif', paletteFrames=paletteFrames)
+
+Required packages: collections, itertools, numpy, os, shutil, struct, subprocess, time, PIL. Optional: cv2 (mp4 without ffmpeg).
+"""
+
+
+from collections import namedtuple
+import itertools
+import os
+import shutil
+import struct
+import subprocess
+import time
+
+import numpy as np
+from PIL import GifImagePlugin, Image, features
+
+import image_engine
+
+try:
+  import cv2
+except ImportError:
+  cv2 = None
+
+
+frame_delay = 50      # centiseconds between frames, as convert -delay
+hold_frames = 3       # the last frame stays on screen this many delays longer (was 3 copies of it)
+palette_colors = 255  # the 256th palette entry is the transparent color of the frame rectangles
+palette_kmeans = 0    # > 0 refines the median cut palette with this many k-means passes (slower)
+palette_samples = 8   # frames used to make the shared palette
+palette_scale = 4     # the sampled frames are shrunk by this factor first
+transparent_index = 255
+
+animation_format = 'gif'  # gif, mp4 or webp
+mp4_crf = 23              # H.264 quality (lower is better and larger)
+webp_quality = 80
+
+AnimationReport = namedtuple('AnimationReport', ['name', 'frames', 'written', 'changed', 'size', 'seconds'])
+reports = []          # one AnimationReport per animation written, for summary()
+
+
+def frameFiles(fileDir, imageNameRoot):
+  """
+  frameFiles(fileDir, imageNameRoot)
+
+  Returns the sorted paths of the frames of an animation (the files starting with imageNameRoot).
+
+  Parameters:
+  - fileDir: the directory where the files are saved
+  - imageNameRoot: the complete root of the animation images (e.g. uwincm_anim_day1_)
+  """
+
+  return [os.path.join(fileDir,fl) for fl in sorted(os.listdir(fileDir)) if fl.startswith(imageNameRoot)]
+
+
+def sampleOf(items, samples=palette_samples):
+  """
+  sampleOf(items, samples)
+
+  Returns at most samples items, evenly spaced (e.g. the frame files used for the shared palette).
+  """
+
+  step = max(1, len(items) // samples)
+
+  return items[::step][:samples]
+
+
+def sharedPalette(frames, colors=palette_colors, scale=palette_scale, kmeans=palette_kmeans):
+  """
+  sharedPalette(frames, colors, scale, kmeans)
+
+  Makes one palette for all the frames of an animation (median cut over the pixels of a few shrunk frames).
+  The entries after the colors found are copies of the first color, and are never used by the frames.
+
+  Parameters:
+  - frames: iterable of the sampled RGB PIL images (each is shrunk as soon as it is read)
+  - colors: number of colors in the palette (at most 255, the last entry is kept for transparency)
+  - scale: the sampled frames are shrunk by this factor
+  - kmeans: number of k-means passes refining the palette (0 for median cut only)
+  - palette: returned P mode PIL image holding the palette
+  - nColors: returned number of colors in the palette
+  """
+
+  shrunk = [np.asarray(frame.resize((max(1, frame.width // scale), max(1, frame.height // scale)), Image.NEAREST)).reshape(-1, 3)
+            for frame in frames]
+  # all the sampled pixels in one row (the frames can have different sizes)
+  mosaic = Image.fromarray(np.concatenate(shrunk)[np.newaxis, :, :], 'RGB')
+
+  quantized = mosaic.quantize(colors=colors, method=Image.MEDIANCUT, kmeans=kmeans)
+  nColors = quantized.getextrema()[1] + 1
+  entries = quantized.getpalette()[:3*nColors]
+  entries += entries[:3] * (256 - nColors)
+
+  palette = Image.new('P', (1, 1))
+  palette.putpalette(entries)
+
+  return palette, nColors
+
+
+def toCanvas(frame, size):
+  """
+  toCanvas(frame, size)
+
+  Returns the frame, placed at the top left of a white canvas of the animation size if it is not that size.
+  """
+
+  if frame.size != size:
+    canvas = Image.new('RGB', size, 'white')
+    canvas.paste(frame, (0, 0))
+    frame = canvas
+
+  return frame
+
+
+def toIndices(frame, palette, nColors, size):
+  """
+  toIndices(frame, palette, nColors, size)
+
+  Maps a frame to the shared palette, and returns its palette indices as a numpy array.
+
+  Parameters:
+  - frame: RGB PIL image
+  - palette: P mode PIL image from sharedPalette
+  - nColors: number of colors in the palette
+  - size: (width, height) of the animation
+  """
+
+  indices = np.asarray(toCanvas(frame, size).quantize(palette=palette, dither=Image.NONE)).copy()
+  # the padding entries have the same color as entry 0
+  indices[indices >= nColors] = 0
+
+  return indices
+
+
+def gifHeader(size, palette, loop):
+  """
+  gifHeader(size, palette, loop)
+
+  Returns the header of a .gif file: logical screen, global color table (256 colors) and loop extension.
+  """
+
+  entries = bytes(palette.getpalette()[:768])
+  entries += bytes(768 - len(entries))
+
+  return (b'GIF89a' + struct.pack('<HHBBB', size[0], size[1], 0xF7, 0, 0) + entries +
+          b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\x00')
+
+
+class GifWriter:
+  """
+  GifWriter(outName, size, delay, loop, palette)
+
+  Writes a .gif animation one frame at a time, with one shared palette. After the first frame, only the
+  rectangle that changed is written, with the unchanged pixels inside it transparent. Each frame is written when
+  the next one comes in (an unchanged frame only makes the previous one last longer), and the last one on close().
+
+  Parameters:
+  - outName: the complete path and name of the output file (e.g. ./figs/something.gif)
+  - size: (width, height) of the animation
+  - delay: delay between frames in centiseconds (as convert -delay)
+  - loop: 0 means repeating
+  - palette: (palette, nColors) from sharedPalette
+  """
+
+  def __init__(self, outName, size, delay=frame_delay, loop=0, palette=None):
+    self.outName = outName
+    self.tmpName = outName + '.part'
+    self.size = size
+    self.delay = delay
+    self.palette, self.nColors = palette
+    self.previous = None
+    self.pending = None   # [indices of the rectangle, offset, duration in ms] of the frame not written yet
+    self.frames = 0
+    self.written = 0
+    self.changed_pixels = 0
+    self.start = time.time()
+    self.fl = open(self.tmpName, 'wb')
+    self.fl.write(gifHeader(size, self.palette, loop))
+
+  def writePending(self):
+    block, offset, duration = self.pending
+    params = {'duration': duration, 'disposal': 1}
+    if self.written > 0:
+      params['transparency'] = transparent_index
+    for chunk in GifImagePlugin.getdata(Image.fromarray(block, 'L'), offset, **params):
+      self.fl.write(chunk)
+    self.written += 1
+    self.pending = None
+
+  def add(self, frame):
+    """
+    add(frame)
+
+    Adds the next frame (RGB PIL image).
+    """
+
+    indices = toIndices(frame, self.palette, self.nColors, self.size)
+    self.frames += 1
+
+    if self.previous is None:
+      self.pending = [indices, (0, 0), self.delay * 10]
+      self.changed_pixels += indices.size
+    else:
+      changed = indices != self.previous
+      if not changed.any():
+        self.pending[2] += self.delay * 10
+        return
+      self.writePending()
+      rows = np.flatnonzero(changed.any(axis=1))
+      cols = np.flatnonzero(changed.any(axis=0))
+      y0, y1, x0, x1 = rows[0], rows[-1]+1, cols[0], cols[-1]+1
+      block = indices[y0:y1, x0:x1].copy()
+      block[~changed[y0:y1, x0:x1]] = transparent_index
+      self.pending = [block, (int(x0), int(y0)), self.delay * 10]
+      self.changed_pixels += int(changed.sum())
+    self.previous = indices
+
+    return
+
+  def close(self, hold=hold_frames):
+    """
+    close(hold)
+
+    Writes the last frame, held on screen hold delays longer, and moves the file into place.
+    """
+
+    self.pending[2] += self.delay * 10 * hold
+    self.writePending()
+    self.fl.write(b';')
+    self.fl.close()
+    os.replace(self.tmpName, self.outName)
+
+    return AnimationReport(os.path.basename(self.outName), self.frames, self.written,
+                           self.changed_pixels / float(self.frames * self.size[0] * self.size[1]),
+                           os.path.getsize(self.outName), time.time() - self.start)
+
+  def abort(self):
+    self.fl.close()
+    if os.path.exists(self.tmpName):
+      os.remove(self.tmpName)
+
+
+class WebpWriter:
+  """
+  WebpWriter(outName, size, delay, loop, palette)
+
+  Writes an animated WebP (Pillow), holding the last frame longer. The frames are kept until close(), since
+  Pillow's WebP encoder takes them all at once. palette is not used.
+  """
+
+  def __init__(self, outName, size, delay=frame_delay, loop=0, palette=None):
+    self.outName = outName
+    self.tmpName = outName + '.part'
+    self.size = size
+    self.delay = delay
+    self.loop = loop
+    self.canvas = []
+    self.start = time.time()
+
+  def add(self, frame):
+    self.canvas.append(toCanvas(frame, self.size))
+
+  def close(self, hold=hold_frames):
+    durations = [self.delay * 10] * len(self.canvas)
+    durations[-1] = self.delay * 10 * (1 + hold)
+    self.canvas[0].save(self.tmpName, format='WEBP', save_all=True, append_images=self.canvas[1:], duration=durations,
+                        loop=self.loop, quality=webp_quality)
+    os.replace(self.tmpName, self.outName)
+
+    return AnimationReport(os.path.basename(self.outName), len(self.canvas), len(self.canvas), 1.0,
+                           os.path.getsize(self.outName), time.time() - self.start)
+
+  def abort(self):
+    self.canvas = []
+
+
+class Mp4Writer:
+  """
+  Mp4Writer(outName, size, delay, loop, palette)
+
+  Writes an H.264 .mp4 video one frame at a time (ffmpeg, or cv2.VideoWriter), with the last frame repeated hold
+  times on close(). The video is padded to an even width and height. loop and palette are not used (set the video
+  to loop in the deck).
+  """
+
+  def __init__(self, outName, size, delay=frame_delay, loop=0, palette=None):
+    self.outName = outName
+    self.tmpName = outName + '.part.mp4'
+    self.size = size
+    self.last = None
+    self.frames = 0
+    self.written = 0
+    self.start = time.time()
+    fps = 100. / delay
+
+    self.proc = None
+    self.video = None
+    if shutil.which('ffmpeg') is not None:
+      cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '%dx%d' % size, '-r', str(fps), '-i', '-',
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2:color=white', '-c:v', 'libx264', '-crf', str(mp4_crf), '-pix_fmt', 'yuv420p',
+             '-movflags', '+faststart', self.tmpName]
+      self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    else:
+      self.size = (size[0] + size[0] % 2, size[1] + size[1] % 2)
+      self.video = cv2.VideoWriter(self.tmpName, cv2.VideoWriter_fourcc(*'avc1'), fps, self.size)
+      if not self.video.isOpened():
+        self.video = cv2.VideoWriter(self.tmpName, cv2.VideoWriter_fourcc(*'mp4v'), fps, self.size)
+
+  def writeFrame(self, frame):
+    if self.proc is not None:
+      self.proc.stdin.write(frame.tobytes())
+    else:
+      self.video.write(cv2.cvtColor(np.asarray(frame), cv2.COLOR_RGB2BGR))
+    self.written += 1
+
+  def add(self, frame):
+    self.last = toCanvas(frame, self.size)
+    self.writeFrame(self.last)
+    self.frames += 1
+
+  def close(self, hold=hold_frames):
+    for num in range(hold):
+      self.writeFrame(self.last)
+    if self.proc is not None:
+      self.proc.stdin.close()
+      if self.proc.wait() != 0:
+        raise RuntimeError('ffmpeg could not write ' + self.outName)
+    else:
+      self.video.release()
+    os.replace(self.tmpName, self.outName)
+
+    return AnimationReport(os.path.basename(self.outName), self.frames, self.written, 1.0,
+                           os.path.getsize(self.outName), time.time() - self.start)
+
+  def abort(self):
+    if self.proc is not None:
+      self.proc.stdin.close()
+      self.proc.wait()
+    else:
+      self.video.release()
+    if os.path.exists(self.tmpName):
+      os.remove(self.tmpName)
+
+
+writers = {'gif': GifWriter,
+           'mp4': Mp4Writer,
+           'webp': WebpWriter}
+
+
+def available(fmt):
+  """
+  available(fmt)
+
+  Returns True if the animation format can be written on this computer.
+  """
+
+  if fmt == 'mp4':
+    return shutil.which('ffmpeg') is not None or cv2 is not None
+  if fmt == 'webp':
+    return features.check('webp')
+
+  return fmt in writers
+
+
+def outputName(outName, fmt=None):
+  """
+  outputName(outName, fmt)
+
+  Returns the output name with the extension of the format (e.g. ECMWF_GFS_midRH_day1.gif -> ECMWF_GFS_midRH_day1.mp4).
+
+  Parameters:
+  - outName: the name of the output file (e.g. something.gif)
+  - fmt: gif, mp4 or webp (None for animation_format, falling back to gif if it is not available)
+  """
+
+  if fmt is None:
+    fmt = animation_format if available(animation_format) else 'gif'
+
+  return os.path.splitext(outName)[0] + '.' + fmt
+
+
+def writeAnimation(frames, outName, delay=frame_delay, loop=0, hold=hold_frames, fmt=None, paletteFrames=None):
+  """
+  writeAnimation(frames, outName, delay, loop, hold, fmt, paletteFrames)
+
+  Streams the frames into the writer of the format, to outName with the extension of the format.
+
+  Parameters:
+  - frames: iterable of RGB PIL images (e.g. a generator loading them one by one); the first one sets the size
+  - outName: the complete path and name of the output file (e.g. ./figs/something.gif)
+  - delay: delay between frames in centiseconds (as convert -delay)
+  - loop: 0 means repeating
+  - hold: the last frame stays on screen hold delays longer
+  - fmt: gif, mp4 or webp (None for animation_format)
+  - paletteFrames: iterable of a few frames for the shared .gif palette (None to use the first frame)
+  - report: returned AnimationReport (None if there were no frames)
+  """
+
+  if fmt is None:
+    fmt = animation_format
+  if not available(fmt):
+    print('... ... ' + fmt + ' animations cannot be written on this computer, writing a .gif instead.')
+    fmt = 'gif'
+
+  frames = iter(frames)
+  try:
+    first = next(frames)
+  except StopIteration:
+    return None
+
+  palette = None
+  if fmt == 'gif':
+    palette = sharedPalette(paletteFrames if paletteFrames is not None else [first])
+
+  writer = writers[fmt](outputName(outName, fmt), first.size, delay, loop, palette)
+  try:
+    for frame in itertools.chain([first], frames):
+      writer.add(frame)
+    report = writer.close(hold)
+  except BaseException:
+    writer.abort()
+    raise
+  reports.append(report)
+
+  return report
+
+
+def animate(fileDir, imageNameRoot, outName, delay=frame_delay, loop=0, hold=hold_frames, fmt=None):
+  """
+  animate(fileDir, imageNameRoot, outName, delay, loop, hold, fmt)
+
+  Streams the frames of an animation from fileDir to fileDir/outName (with the extension of fmt).
+
+  Parameters:
+  - fileDir: the directory where the files are saved
+  - imageNameRoot: the complete root of the animation images (e.g. uwincm_anim_day1_)
+  - outName: the name of the output file (e.g. something.gif)
+  - delay: delay between frames in centiseconds
+  - loop: 0 means repeating
+  - hold: the last frame stays on screen hold delays longer
+  - fmt: gif, mp4 or webp (None for animation_format)
+  - working: returned Boolean, False if there were no frames
+  """
+
+  fls = frameFiles(fileDir, imageNameRoot)
+  if len(fls) == 0:
+    return False
+
+  report = writeAnimation((image_engine.load(fl) for fl in fls), os.path.join(fileDir,outName), delay, loop, hold, fmt,
+                          paletteFrames=(image_engine.load(fl) for fl in sampleOf(fls)))
+  printReport(report)
+
+  return True
+
+
+def printReport(report):
+  """
+  printReport(report)
+
+  Prints the frames, size and time of one animation.
+  """
+
+  print('... ... ' + report.name + ': ' + str(report.frames) + ' frames (' + str(report.written) + ' written, ' +
+        '{:.0f}'.format(report.changed*100) + '% of the pixels), ' + '{:.0f}'.format(report.size/1024.) + ' kB in ' +
+        '{:.1f}'.format(report.seconds) + ' s')
+
+  return
+
+
+def summary():
+  """
+  summary()
+
+  Prints the number, total size and total time of the animations written so far, and clears the list.
+  """
+
+  if len(reports) > 0:
+    print('... ' + str(len(reports)) + ' animations, ' + '{:.1f}'.format(sum(report.size for report in reports)/1024./1024.) + ' MB in ' +
+          '{:.1f}'.format(sum(report.seconds for report in reports)) + ' s')
+  del reports[:]
+
+  return
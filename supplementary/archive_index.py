@@ -0,0 +1,311 @@
+"""
+This module keeps an SQLite index of the forecast archive (./forecast_archive/index.sqlite), so archived images can
+be found without walking the archive directories and matching file names: one row per file of each archived day,
+with the product, models, lead day, valid time, checksum, size in pixels and size in bytes.
+
+The index is updated by archive_store.archiveDay() each time a day is archived, and can be rebuilt from the
+manifests (archive_store.py) at any time. The product, models and lead day are read from the final file names:
+
+  14_ECMWF_GFS_mslp_pcpn_day2.gif  ->  product mslp_pcpn, models ECMWF,GFS, lead day 2, valid day + 2 days
+  06_GEOS_dust_aot_day1_vert_15N.png  ->  product dust_aot_vert_15N, model GEOS, lead day 1
+
+From python:
+
+  for entry in archive_index.find(product='mslp_pcpn', model='ECMWF', lead_day=2, since='2022-09-06'):
+    print(entry.day, archive_index.filePath(entry))
+
+From the template directory:
+
+  python ./supplementary/archive_index.py find --product mslp_pcpn --model ECMWF --lead-day 2 --last 10
+  python ./supplementary/archive_index.py extract 2022-09-16 14_ECMWF_GFS_mslp_pcpn_day1.gif --to ./comparison/
+  python ./supplementary/archive_index.py rebuild
+
+Required packages: argparse, collections, datetime, os, re, sqlite3, sys, time, PIL.
+"""
+
+
+import argparse
+from collections import namedtuple
+from datetime import datetime, timedelta
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from PIL import Image
+
+import archive_store
+
+
+indexName = 'index.sqlite'
+models = ['ECMWF', 'GFS', 'GEOS', 'MPAS', 'NHC', 'MIMIC-TPW', 'Goes16', 'Meteosat11', 'uwincm', 'uutah', 'ucdavis']
+
+ArchivedFile = namedtuple('ArchivedFile', ['day', 'name', 'product', 'model', 'lead_day', 'valid_time', 'sha256',
+                                           'width', 'height', 'size'])
+
+schema = ['CREATE TABLE IF NOT EXISTS files (day TEXT NOT NULL, name TEXT NOT NULL, product TEXT, model TEXT, '
+          'lead_day INTEGER, valid_time TEXT, sha256 TEXT NOT NULL, width INTEGER, height INTEGER, size INTEGER, '
+          'PRIMARY KEY (day, name))',
+          'CREATE INDEX IF NOT EXISTS files_product ON files (product, lead_day, day)',
+          'CREATE INDEX IF NOT EXISTS files_day ON files (day)',
+          'CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)']
+
+
+def indexPath(directory=None):
+  return os.path.join(directory or archive_store.archiveDir,indexName)
+
+
+def connect(directory=None):
+  """
+  connect(directory)
+
+  Opens the index of the archive, creating it if needed.
+
+  Parameters:
+  - directory: the archive directory (None for archive_store.archiveDir)
+  - db: returned sqlite3.Connection
+  """
+
+  if not os.path.isdir(directory or archive_store.archiveDir):
+    os.makedirs(directory or archive_store.archiveDir)
+
+  db = sqlite3.connect(indexPath(directory))
+  for statement in schema:
+    db.execute(statement)
+
+  return db
+
+
+def describe(name):
+  """
+  describe(name)
+
+  Reads the product, models and lead day from the name of a final image.
+
+  Parameters:
+  - name: file name (e.g. 14_ECMWF_GFS_mslp_pcpn_day2.gif)
+  - product, model, lead_day: returned product name, comma-separated models ('' if none) and lead day (None if none)
+  """
+
+  parts = os.path.splitext(name)[0].split('_')
+  if len(parts) > 1 and parts[0].isdigit():
+    parts = parts[1:]   # slide number
+
+  found = []
+  lead_day = None
+  product = []
+  lower = dict((model.lower(), model) for model in models)
+  for part in parts:
+    match = re.match(r'^day(\d+)$', part)
+    if match:
+      lead_day = int(match.group(1))
+    elif part.lower() in lower:
+      found.append(lower[part.lower()])
+    elif part not in ('anim', 'movie'):
+      product.append(part)
+
+  return '_'.join(product), ','.join(found), lead_day
+
+
+def imageSize(fileName):
+  """
+  imageSize(fileName)
+
+  Returns the (width, height) of an image, read from its header ((None, None) if it is not an image).
+  """
+
+  try:
+    with Image.open(fileName) as img:
+      return img.size
+  except (OSError, ValueError):
+    return None, None
+
+
+def indexDay(day, files, directory=None, db=None):
+  """
+  indexDay(day, files, directory, db)
+
+  Writes the rows of an archived day, replacing the ones already there. The size in pixels of a file already
+  indexed under the same checksum is not read again.
+
+  Parameters:
+  - day: forecast day (e.g. 2022-09-16)
+  - files: dictionary of file name -> {'sha256': ..., 'size': ...} (archive_store.readManifest)
+  - directory: the archive directory (None for archive_store.archiveDir)
+  - db: open sqlite3.Connection (None to open and close the index here)
+  """
+
+  own = db is None
+  if own:
+    db = connect(directory)
+
+  rows = []
+  for name, entry in files.items():
+    product, model, lead_day = describe(name)
+    valid_time = None
+    if lead_day is not None:
+      valid_time = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=lead_day)).strftime('%Y-%m-%dT%H:%M')
+
+    known = db.execute('SELECT width, height FROM files WHERE sha256 = ? LIMIT 1', (entry['sha256'],)).fetchone()
+    width, height = known if known else imageSize(archive_store.blobPath(entry['sha256'], directory))
+
+    rows.append((day, name, product, model, lead_day, valid_time, entry['sha256'], width, height, entry['size']))
+
+  with db:
+    db.execute('DELETE FROM files WHERE day = ?', (day,))
+    db.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+  if own:
+    db.close()
+
+  return
+
+
+def rebuild(directory=None):
+  """
+  rebuild(directory)
+
+  Writes the index again from the manifests of all the archived days.
+
+  Parameters:
+  - directory: the archive directory (None for archive_store.archiveDir)
+  - days: returned number of days indexed
+  """
+
+  db = connect(directory)
+  with db:
+    db.execute('DELETE FROM files')
+  days = archive_store.archivedDays(directory)
+  for day in days:
+    indexDay(day, archive_store.readManifest(day, directory), directory, db)
+  db.close()
+
+  return len(days)
+
+
+def find(product=None, model=None, lead_day=None, since=None, until=None, name=None, directory=None):
+  """
+  find(product, model, lead_day, since, until, name, directory)
+
+  Returns the archived files matching all the given conditions, sorted by day and name.
+
+  Parameters:
+  - product: product name (e.g. mslp_pcpn)
+  - model: one of the models of the file (e.g. ECMWF)
+  - lead_day: lead day (e.g. 2)
+  - since, until: first and last forecast day (e.g. 2022-09-06)
+  - name: part of the file name (e.g. Four_model)
+  - directory: the archive directory (None for archive_store.archiveDir)
+  - entries: returned list of ArchivedFile
+  """
+
+  conditions = []
+  values = []
+  if product is not None:
+    conditions.append('product = ?')
+    values.append(product)
+  if model is not None:
+    conditions.append("(',' || model || ',') LIKE ?")
+    values.append('%,' + model + ',%')
+  if lead_day is not None:
+    conditions.append('lead_day = ?')
+    values.append(lead_day)
+  if since is not None:
+    conditions.append('day >= ?')
+    values.append(since)
+  if until is not None:
+    conditions.append('day <= ?')
+    values.append(until)
+  if name is not None:
+    conditions.append('name LIKE ?')
+    values.append('%' + name + '%')
+
+  query = 'SELECT ' + ', '.join(ArchivedFile._fields) + ' FROM files'
+  if len(conditions) > 0:
+    query += ' WHERE ' + ' AND '.join(conditions)
+  query += ' ORDER BY day, name'
+
+  db = connect(directory)
+  entries = [ArchivedFile(*row) for row in db.execute(query, values)]
+  db.close()
+
+  return entries
+
+
+def filePath(entry, directory=None):
+  """
+  filePath(entry, directory)
+
+  Returns the path of an archived file: its blob in the store, or the pack of its day once the day is packed
+  (archive_store.readFile reads it back from either).
+
+  Parameters:
+  - entry: ArchivedFile
+  - directory: the archive directory (None for archive_store.archiveDir)
+  """
+
+  blob = archive_store.blobPath(entry.sha256, directory)
+  if os.path.isfile(blob) or not archive_store.isPacked(entry.day, directory):
+    return blob
+
+  return archive_store.packPath(entry.day, directory)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python ./supplementary/archive_index.py', description='query the forecast archive')
+  parser.add_argument('--archive', default=archive_store.archiveDir, help='archive directory (default: ./forecast_archive)')
+  commands = parser.add_subparsers(dest='command')
+  find_parser = commands.add_parser('find', help='list the archived files matching all the options')
+  find_parser.add_argument('--product', help='product name (e.g. mslp_pcpn)')
+  find_parser.add_argument('--model', help='model (e.g. ECMWF)')
+  find_parser.add_argument('--lead-day', type=int, help='lead day (e.g. 2)')
+  find_parser.add_argument('--since', help='first forecast day (YYYY-MM-DD)')
+  find_parser.add_argument('--until', help='last forecast day (YYYY-MM-DD)')
+  find_parser.add_argument('--last', type=int, help='only the last N days')
+  find_parser.add_argument('--name', help='part of the file name')
+  find_parser.add_argument('--paths', action='store_true', help='print only the paths of the files')
+  extract_parser = commands.add_parser('extract', help='write an archived file (also from a packed day)')
+  extract_parser.add_argument('day', help='forecast day (YYYY-MM-DD)')
+  extract_parser.add_argument('name', help='file name')
+  extract_parser.add_argument('--to', default='.', help='directory the file is written to (default: .)')
+  commands.add_parser('rebuild', help='write the index again from the manifests')
+  args = parser.parse_args(argv)
+
+  if args.command == 'rebuild':
+    print('... ' + str(rebuild(args.archive)) + ' days indexed in ' + indexPath(args.archive))
+    return 0
+
+  if args.command == 'extract':
+    fileName = os.path.join(args.to,args.name)
+    archive_store.extractFile(args.day, args.name, fileName, args.archive)
+    print('... ' + fileName)
+    return 0
+
+  if args.command != 'find':
+    parser.print_help()
+    return 1
+
+  since = args.since
+  if args.last is not None:
+    since = (datetime.today() - timedelta(days=args.last)).strftime('%Y-%m-%d')
+
+  start = time.time()
+  entries = find(args.product, args.model, args.lead_day, since, args.until, args.name, args.archive)
+  seconds = time.time() - start
+
+  for entry in entries:
+    if args.paths:
+      print(filePath(entry, args.archive))
+    else:
+      print(entry.day + '  ' + entry.name + '  ' + entry.product + '  ' + (entry.model or '-') + '  ' +
+            ('day' + str(entry.lead_day) if entry.lead_day is not None else '-') + '  ' + str(entry.width) + 'x' +
+            str(entry.height) + '  ' + '{:.0f}'.format(entry.size/1024.) + ' kB  ' + entry.sha256[:12])
+  if not args.paths:
+    print('... ' + str(len(entries)) + ' files (' + '{:.1f}'.format(seconds*1000) + ' ms)')
+
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,529 @@
+"""
+This module keeps the forecast archive (./forecast_archive/) as a content-addressed store: every archived file is
+stored once under the sha256 of its content, and each forecast day has a manifest listing its file names and
+checksums. Many files are the same from one day to the next (the logo, static outlooks, "latest" products that did
+not change), so they take the disk space of one copy for the whole campaign.
+
+  ./forecast_archive/blobs/9f/9f2c...            content of the files, read-only, one per checksum
+  ./forecast_archive/manifests/2022-09-16.json  {"day": "2022-09-16", "files": {"NHC_2day_outlook.png": {"sha256": ..., "size": ...}}}
+  ./forecast_archive/archive-forecast_2022-09-16/NHC_2day_outlook.png   hardlink to its blob
+
+Archiving a file moves it into the store (a rename) or, when the same content is already stored, removes it, and
+the day directory gets a hardlink to the blob: no image data is written again. Where hardlinks are not possible
+(another filesystem, some network drives), and for a file that has other links (or is kept with move=False), the
+file is copied, so the store never shares its read-only blobs with a file someone may write again.
+
+The blobs are shared by all the days that link to them, so they are read-only and should never be edited in place.
+
+  archive_store.archiveDay('2022-09-16', ['./figs_final/NHC_2day_outlook.png', ...])
+  manifest = archive_store.readManifest('2022-09-16')
+
+The archived files can be looked up by product, model and lead day with archive_index.py.
+
+Only the recent days are kept as blobs. compact() packs the days older than keep_days into one file per day
+(./forecast_archive/packs/2022-09-16.pack), where each file is compressed on its own (zstd, or lzma when the
+zstandard package is not installed) and its offset is written in the manifest, so one image can be read back
+without decompressing the whole day. The blobs no longer used by a recent day are then removed. A packed day is
+unpacked again if files are added to it.
+
+  archive_store.compact(keepDays=14)
+  data = archive_store.readFile('2022-09-16', '14_ECMWF_GFS_mslp_pcpn_day1.gif')
+
+archiveDay() and compact() take turns through ./forecast_archive/.archive.lock (file_lock.py), also when they run in
+different processes (e.g. a backfill archiving its days while the night run compacts in the background).
+
+Required packages: datetime, hashlib, json, lzma, os, shutil, stat, sqlite3 (archive_index.py). Optional: zstandard.
+"""
+
+
+from datetime import datetime, timedelta
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import stat
+
+import archive_index
+import file_lock
+
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+
+
+archiveDir = os.path.join('.','forecast_archive')
+dayPrefix = 'archive-forecast_'
+keep_days = 14        # days kept as blobs (browsable in archive-forecast_YYYY-MM-DD/), older days are packed
+zstd_level = 19
+
+stats = {'files': 0, 'new': 0, 'new_bytes': 0, 'stored': 0, 'stored_bytes': 0}
+
+
+def storeLock(directory=None):
+  # archiveDay and compact do not change the store at the same time, in this process (compaction runs in the
+  # background) or in another one (e.g. a backfill archiving its days while the night run compacts)
+  return file_lock.FileLock(os.path.join(directory or archiveDir,'.archive.lock'), 'archive')
+
+
+def blobPath(checksum, directory=None):
+  """
+  blobPath(checksum, directory)
+
+  Returns the path of the blob of a checksum (e.g. ./forecast_archive/blobs/9f/9f2c...).
+
+  Parameters:
+  - checksum: sha256 hex digest
+  - directory: the archive directory (None for archiveDir)
+  """
+
+  return os.path.join(directory or archiveDir,'blobs',checksum[:2],checksum)
+
+
+def manifestPath(day, directory=None):
+  return os.path.join(directory or archiveDir,'manifests',day + '.json')
+
+
+def dayPath(day, directory=None):
+  return os.path.join(directory or archiveDir,dayPrefix + day)
+
+
+def packPath(day, directory=None):
+  return os.path.join(directory or archiveDir,'packs',day + '.pack')
+
+
+def fileChecksum(fileName):
+  """
+  fileChecksum(fileName)
+
+  Returns the sha256 hex digest of a file.
+
+  Parameters:
+  - fileName: the complete path and name of the file
+  """
+
+  digest = hashlib.sha256()
+  with open(fileName, 'rb') as fl:
+    for block in iter(lambda: fl.read(1024*1024), b''):
+      digest.update(block)
+
+  return digest.hexdigest()
+
+
+def linkFile(source, fileName):
+  """
+  linkFile(source, fileName)
+
+  Puts the file at source under fileName, as a hardlink if possible and as a copy otherwise.
+
+  Parameters:
+  - source: the complete path and name of the blob
+  - fileName: the complete path and name of the link
+  """
+
+  if os.path.lexists(fileName):
+    os.remove(fileName)
+  try:
+    os.link(source, fileName)
+  except OSError:
+    shutil.copyfile(source, fileName)
+
+  return
+
+
+def storeFile(fileName, move=True, directory=None):
+  """
+  storeFile(fileName, move, directory)
+
+  Puts a file into the blob store, unless a file with the same content is already there.
+
+  Parameters:
+  - fileName: the complete path and name of the file
+  - move: True to take the file away (renamed into the store, or removed if already stored), False to keep it
+  - directory: the archive directory (None for archiveDir)
+  - checksum, size: returned sha256 hex digest and size of the file
+  """
+
+  checksum = fileChecksum(fileName)
+  size = os.path.getsize(fileName)
+  blob = blobPath(checksum, directory)
+
+  if os.path.isfile(blob):
+    if move:
+      os.remove(fileName)
+    stats['stored'] += 1
+    stats['stored_bytes'] += size
+    return checksum, size
+
+  if not os.path.isdir(os.path.dirname(blob)):
+    os.makedirs(os.path.dirname(blob))
+
+  # written under a temporary name first, so a blob is always complete. A file is only renamed into the store when
+  # the store gets its only link (made read-only there): a file kept by the caller, or also linked elsewhere (e.g.
+  # ./figs_final/ published from a workspace, runs/<run id>/figs_final/), is copied, so writing it again later
+  # never changes the blob.
+  tmpName = blob + '.part'
+  renamed = False
+  if move and os.stat(fileName).st_nlink == 1:
+    try:
+      os.rename(fileName, tmpName)
+      renamed = True
+    except OSError:
+      pass
+  if not renamed:
+    shutil.copyfile(fileName, tmpName)
+    if move:
+      os.remove(fileName)
+  os.chmod(tmpName, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+  os.replace(tmpName, blob)
+
+  stats['new'] += 1
+  stats['new_bytes'] += size
+
+  return checksum, size
+
+
+def writeManifest(day, files, directory=None, pack=None):
+  """
+  writeManifest(day, files, directory, pack)
+
+  Writes the manifest of a day (written to a temporary file first, then renamed).
+
+  Parameters:
+  - day: forecast day (e.g. 2022-09-16)
+  - files: dictionary of file name -> {'sha256': ..., 'size': ...}
+  - directory: the archive directory (None for archiveDir)
+  - pack: {'codec': ..., 'members': {sha256: [offset, length]}} of a packed day (None for a day kept as blobs)
+  """
+
+  fileName = manifestPath(day, directory)
+  if not os.path.isdir(os.path.dirname(fileName)):
+    os.makedirs(os.path.dirname(fileName))
+
+  with open(fileName + '.part', 'w') as fl:
+    manifest = {'day': day, 'files': files}
+    if pack is not None:
+      manifest['pack'] = pack
+    json.dump(manifest, fl, indent=1, sort_keys=True)
+  os.replace(fileName + '.part', fileName)
+
+  return
+
+
+def readManifest(day, directory=None):
+  """
+  readManifest(day, directory)
+
+  Reads the manifest of a day.
+
+  Parameters:
+  - day: forecast day (e.g. 2022-09-16)
+  - directory: the archive directory (None for archiveDir)
+  - files: returned dictionary of file name -> {'sha256': ..., 'size': ...} (empty if the day is not archived)
+  """
+
+  return loadManifest(day, directory).get('files', {})
+
+
+def loadManifest(day, directory=None):
+  fileName = manifestPath(day, directory)
+  if not os.path.isfile(fileName):
+    return {}
+
+  with open(fileName, 'r') as fl:
+    return json.load(fl)
+
+
+def isPacked(day, directory=None):
+  return 'pack' in loadManifest(day, directory)
+
+
+def archivedDays(directory=None):
+  """
+  archivedDays(directory)
+
+  Returns the sorted forecast days that have a manifest.
+  """
+
+  manifestDir = os.path.join(directory or archiveDir,'manifests')
+  if not os.path.isdir(manifestDir):
+    return []
+
+  return sorted(fl[:-len('.json')] for fl in os.listdir(manifestDir) if fl.endswith('.json'))
+
+
+def archiveDay(day, fileNames, move=True, directory=None):
+  """
+  archiveDay(day, fileNames, move, directory)
+
+  Stores the files of a forecast day, writes its manifest, links the files into its day directory
+  (e.g. ./forecast_archive/archive-forecast_2022-09-16/) and updates the index (archive_index.py). Files of the day
+  already archived are kept, unless a file of the same name is given again.
+
+  Parameters:
+  - day: forecast day (e.g. 2022-09-16)
+  - fileNames: complete paths and names of the files (e.g. ./figs_final/NHC_2day_outlook.png)
+  - move: True to take the files away (as the archive used to move ./figs_final/), False to keep them
+  - directory: the archive directory (None for archiveDir)
+  - files: returned dictionary of file name -> {'sha256': ..., 'size': ...}
+  """
+
+  with storeLock(directory):
+    if isPacked(day, directory):
+      unpackDay(day, directory)
+
+    files = readManifest(day, directory)
+    for fileName in fileNames:
+      checksum, size = storeFile(fileName, move, directory)
+      files[os.path.basename(fileName)] = {'sha256': checksum, 'size': size}
+      stats['files'] += 1
+
+    writeManifest(day, files, directory)
+
+    linkDay(day, files, directory)
+    archive_index.indexDay(day, files, directory)
+
+  return files
+
+
+def linkDay(day, files, directory=None):
+  """
+  linkDay(day, files, directory)
+
+  Links the blobs of a day into its day directory, so the archive can still be browsed by day.
+
+  Parameters:
+  - day: forecast day (e.g. 2022-09-16)
+  - files: dictionary of file name -> {'sha256': ..., 'size': ...}
+  - directory: the archive directory (None for archiveDir)
+  """
+
+  dayDir = dayPath(day, directory)
+  if not os.path.isdir(dayDir):
+    os.makedirs(dayDir)
+
+  for name, entry in files.items():
+    fileName = os.path.join(dayDir,name)
+    blob = blobPath(entry['sha256'], directory)
+    if os.path.isfile(fileName) and os.path.samefile(fileName, blob):
+      continue
+    linkFile(blob, fileName)
+
+  return
+
+
+def compressor():
+  """
+  compressor()
+
+  Returns the codec used for new packs, and a function compressing one file.
+  """
+
+  if zstandard is not None:
+    return 'zstd', zstandard.ZstdCompressor(level=zstd_level).compress
+
+  return 'xz', lambda data: lzma.compress(data, preset=6)
+
+
+def decompress(codec, data):
+  if codec == 'zstd':
+    if zstandard is None:
+      raise RuntimeError('the zstandard package is needed to read this pack')
+    return zstandard.ZstdDecompressor().decompress(data)
+
+  return lzma.decompress(data)
+
+
+def packDay(day, directory=None):
+  """
+  packDay(day, directory)
+
+  Writes the files of an archived day into its pack, each compressed on its own, and removes its day directory.
+  The blobs are left for removeUnusedBlobs().
+
+  Parameters:
+  - day: forecast day (e.g. 2022-09-16)
+  - directory: the archive directory (None for archiveDir)
+  - size, packedSize: returned bytes of the files and of the pack
+  """
+
+  files = readManifest(day, directory)
+  codec, compress = compressor()
+  fileName = packPath(day, directory)
+  if not os.path.isdir(os.path.dirname(fileName)):
+    os.makedirs(os.path.dirname(fileName))
+
+  members = {}
+  with open(fileName + '.part', 'wb') as fl:
+    for entry in files.values():
+      if entry['sha256'] in members:
+        continue
+      with open(blobPath(entry['sha256'], directory), 'rb') as blob:
+        data = compress(blob.read())
+      members[entry['sha256']] = [fl.tell(), len(data)]
+      fl.write(data)
+  os.replace(fileName + '.part', fileName)
+
+  # the manifest says the day is packed only once the pack is complete
+  writeManifest(day, files, directory, pack={'codec': codec, 'members': members})
+  shutil.rmtree(dayPath(day, directory), ignore_errors=True)
+
+  return sum(entry['size'] for entry in files.values()), os.path.getsize(fileName)
+
+
+def readFile(day, name, directory=None):
+  """
+  readFile(day, name, directory)
+
+  Returns the content of an archived file, from its blob or from the pack of its day (only that file is decompressed).
+
+  Parameters:
+  - day: forecast day (e.g. 2022-09-16)
+  - name: file name (e.g. 14_ECMWF_GFS_mslp_pcpn_day1.gif)
+  - directory: the archive directory (None for archiveDir)
+  - data: returned bytes
+  """
+
+  manifest = loadManifest(day, directory)
+  entry = manifest.get('files', {}).get(name)
+  if entry is None:
+    raise KeyError(name + ' is not archived for ' + day)
+
+  if 'pack' not in manifest:
+    with open(blobPath(entry['sha256'], directory), 'rb') as fl:
+      return fl.read()
+
+  offset, length = manifest['pack']['members'][entry['sha256']]
+  with open(packPath(day, directory), 'rb') as fl:
+    fl.seek(offset)
+    data = decompress(manifest['pack']['codec'], fl.read(length))
+
+  if hashlib.sha256(data).hexdigest() != entry['sha256']:
+    raise ValueError(name + ' of ' + day + ' does not match its checksum')
+
+  return data
+
+
+def extractFile(day, name, fileName, directory=None):
+  """
+  extractFile(day, name, fileName, directory)
+
+  Writes an archived file to fileName (e.g. to build a comparison loop from older days).
+  """
+
+  data = readFile(day, name, directory)
+  with open(fileName + '.part', 'wb') as fl:
+    fl.write(data)
+  os.replace(fileName + '.part', fileName)
+
+  return
+
+
+def unpackDay(day, directory=None):
+  """
+  unpackDay(day, directory)
+
+  Puts the files of a packed day back into the blob store and its day directory, and removes its pack.
+  """
+
+  manifest = loadManifest(day, directory)
+  files = manifest.get('files', {})
+  for name in files:
+    blob = blobPath(files[name]['sha256'], directory)
+    if not os.path.isfile(blob):
+      if not os.path.isdir(os.path.dirname(blob)):
+        os.makedirs(os.path.dirname(blob))
+      extractFile(day, name, blob + '.tmp', directory)
+      os.chmod(blob + '.tmp', stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+      os.replace(blob + '.tmp', blob)
+
+  writeManifest(day, files, directory)
+  linkDay(day, files, directory)
+  os.remove(packPath(day, directory))
+
+  return
+
+
+def removeUnusedBlobs(directory=None):
+  """
+  removeUnusedBlobs(directory)
+
+  Removes the blobs of the packed days that are not listed by a day kept as blobs.
+
+  Parameters:
+  - directory: the archive directory (None for archiveDir)
+  - removed: returned number of blobs removed
+  """
+
+  used = set()
+  packed = set()
+  for day in archivedDays(directory):
+    manifest = loadManifest(day, directory)
+    checksums = set(entry['sha256'] for entry in manifest.get('files', {}).values())
+    if 'pack' in manifest:
+      packed.update(checksums)
+    else:
+      used.update(checksums)
+
+  removed = 0
+  for checksum in packed - used:
+    fileName = blobPath(checksum, directory)
+    if os.path.isfile(fileName):
+      os.chmod(fileName, stat.S_IRUSR | stat.S_IWUSR)
+      os.remove(fileName)
+      removed += 1
+
+  return removed
+
+
+def compact(keepDays=None, today=None, directory=None):
+  """
+  compact(keepDays, today, directory)
+
+  Packs the archived days older than keepDays, and removes the blobs only they used. Meant to run in the
+  background, after the archive step (archive_yesterdays_images.startCompaction).
+
+  Parameters:
+  - keepDays: number of recent days kept as blobs (None for keep_days)
+  - today: datetime the age of the days is counted from (None for today)
+  - directory: the archive directory (None for archiveDir)
+  - text: returned line with the days packed, their size and the blobs removed
+  """
+
+  if keepDays is None:
+    keepDays = keep_days
+  if today is None:
+    today = datetime.today()
+  oldest = (today - timedelta(days=keepDays)).strftime('%Y-%m-%d')
+
+  packed = 0
+  size = packedSize = 0
+  for day in archivedDays(directory):
+    if day < oldest and not isPacked(day, directory):
+      # one day at a time, so archiveDay only waits for the day being packed
+      with storeLock(directory):
+        if isPacked(day, directory):
+          continue   # packed by another process meanwhile
+        daySize, dayPacked = packDay(day, directory)
+      packed += 1
+      size += daySize
+      packedSize += dayPacked
+
+  with storeLock(directory):
+    removed = removeUnusedBlobs(directory)
+
+  return ('... Archive compaction: ' + str(packed) + ' days packed (' + '{:.1f}'.format(size/1024./1024.) + ' MB -> ' +
+          '{:.1f}'.format(packedSize/1024./1024.) + ' MB), ' + str(removed) + ' blobs removed')
+
+
+def report():
+  """
+  report()
+
+  Returns a line with the files archived, and how many of them were already stored.
+  """
+
+  return ('... Archive: ' + str(stats['files']) + ' files, ' + str(stats['new']) + ' new (' +
+          '{:.1f}'.format(stats['new_bytes']/1024./1024.) + ' MB), ' + str(stats['stored']) + ' already stored (' +
+          '{:.1f}'.format(stats['stored_bytes']/1024./1024.) + ' MB not written again)')
@@ -11,70 +11,137 @@ swu@ou.edu
 
 This program is used to retrieve images for the CPEX-AW and CPEX-CV field campaign forecasting template.
 
-Required packages: os, subprocess, time.
+Required packages: datetime, os, threading.
 
 
 Updates:
  - 2022-08-27: Adopt to all operating systems
+ - 2026-10-17: The steps are in run(), called by cpexcv.py or when the script is run
+ - 2026-10-17: Content-addressed archive (archive_store.py): each file is stored once by checksum, with a manifest per day, and the day directory holds hardlinks
+ - 2026-10-17: Days older than archive_store.keep_days are packed (compressed, one pack per day) in a background thread after the archive step
+ - 2026-10-17: run(workspace=...) archives the published ./figs_final/ and empties the workspace of the run (workspace.py), and removes the workspaces of past days
 """
 
 
 from datetime import datetime, timedelta
 import os
+import threading
 
-forecastDir = os.getcwd()
-saveDir = os.path.join('.','figs')
-cropDir = os.path.join('.','figs_cropped')
-finDir = os.path.join('.','figs_final')
-archiveDir = os.path.join('.','forecast_archive')
-
-today = datetime.today()
-today = today.replace(hour=0, minute=0, second=0, microsecond=0)
-yesterday = today - timedelta(days=1)
-
-print("Archiving yesterday's forecast.")
-
-archive_forecast_directories = [directory for directory in sorted(os.listdir(archiveDir)) if os.path.isdir(os.path.join(archiveDir,directory)) and 'archive-forecast' in directory]
-yesterdays_directory = 'archive-forecast_' + yesterday.strftime('%Y-%m-%d')
-
-files_in_figs = [fl for fl in os.listdir(saveDir) if not fl.startswith('.') and 'logo_cpexcv.png' not in fl]
-files_in_figs_cropped = [fl for fl in os.listdir(cropDir) if not fl.startswith('.')]
-files_in_figs_final = [fl for fl in os.listdir(finDir) if not fl.startswith('.')]
-
-if yesterdays_directory in archive_forecast_directories:
-  print('... Archive directory for yesterday already exists.')
-  print('    ... Checking for images.')
-  files_in_yesterdays_directory = [fl for fl in os.listdir( os.path.join(archiveDir,yesterdays_directory) )]
-  if len(files_in_yesterdays_directory) > 0:
-    print('    ... There are already files there. Will not overwrite.')
-  else:
-    print('    ... Archive directory is empty. Will move in figures from ./figs_final/.')
-    for fl in files_in_figs_final:
-      os.rename(os.path.join(finDir,fl), os.path.join(archiveDir,yesterdays_directory,fl))
-
-    print('    ... Removing all files in ./figs./')
-    for fl in files_in_figs:
-      os.remove( os.path.join(saveDir,fl) )
-
-    print('    ... Removing all files in ./figs_cropped/.')
-    for fl in files_in_figs_cropped:
-      os.remove( os.path.join(cropDir,fl) )
-
-else:
-  print('... Archive directory for yesterday does not exist.')
-  print('    ... Creating a new directory.')
-  os.mkdir( os.path.join(archiveDir,yesterdays_directory) )
-
-  print('    ... Move in figures from ./figs_final/')
-  for fl in files_in_figs_final:
-    os.rename( os.path.join(finDir,fl), os.path.join(archiveDir,yesterdays_directory,fl) )
-
-  print('    ... Removing all files in ./figs/')
-  for fl in files_in_figs:
-    os.remove( os.path.join(saveDir,fl) )
-
-  print('    ... Removing all files in ./figs_cropped/')
-  for fl in files_in_figs_cropped:
-    os.remove( os.path.join(cropDir,fl) )
-
-print("Archiving yesterday's forecast complete.")
+import archive_store
+import workspace as run_workspace
+
+
+def run(workspace=None):
+  """
+  run(workspace)
+
+  Moves yesterday's ./figs_final/ images into the archive store (archive_store.py), linked into
+  ./forecast_archive/archive-forecast_YYYY-MM-DD/, and empties ./figs/ and ./figs_cropped/ of the run.
+
+  Parameters:
+  - workspace: workspace.Workspace of the run (None for ./figs*/ of the working directory)
+  """
+
+  if workspace is None:
+    workspace = run_workspace.Workspace.inPlace()
+  saveDir = workspace.saveDir
+  cropDir = workspace.cropDir
+  finDir = workspace.finalDir
+  archiveDir = workspace.archiveDir
+
+  today = datetime.today()
+  today = today.replace(hour=0, minute=0, second=0, microsecond=0)
+  yesterday = today - timedelta(days=1)
+
+  print("Archiving yesterday's forecast.")
+
+  if not os.path.isdir(archiveDir):
+    os.makedirs(archiveDir)
+
+  # a run publishing into ./figs_final/ meanwhile waits until the archive step is done
+  with workspace.publishLock():
+    archive_forecast_directories = [directory for directory in sorted(os.listdir(archiveDir)) if os.path.isdir(os.path.join(archiveDir,directory)) and 'archive-forecast' in directory]
+    yesterdays_directory = 'archive-forecast_' + yesterday.strftime('%Y-%m-%d')
+
+    files_in_figs = [fl for fl in listDir(saveDir) if not fl.startswith('.') and 'logo_cpexcv.png' not in fl]
+    files_in_figs_cropped = [fl for fl in listDir(cropDir) if not fl.startswith('.')]
+    files_in_figs_final = [fl for fl in listDir(finDir) if not fl.startswith('.') and os.path.isfile(os.path.join(finDir,fl))]
+
+    if yesterdays_directory in archive_forecast_directories:
+      print('... Archive directory for yesterday already exists.')
+      print('    ... Checking for images.')
+      files_in_yesterdays_directory = [fl for fl in os.listdir( os.path.join(archiveDir,yesterdays_directory) )]
+      if len(files_in_yesterdays_directory) > 0:
+        print('    ... There are already files there. Will not overwrite.')
+      else:
+        print('    ... Archive directory is empty. Will move in figures from ./figs_final/.')
+        archive_store.archiveDay(yesterday.strftime('%Y-%m-%d'), [os.path.join(finDir,fl) for fl in files_in_figs_final], directory=archiveDir)
+
+        print('    ... Removing all files in ./figs./')
+        for fl in files_in_figs:
+          os.remove( os.path.join(saveDir,fl) )
+
+        print('    ... Removing all files in ./figs_cropped/.')
+        for fl in files_in_figs_cropped:
+          os.remove( os.path.join(cropDir,fl) )
+
+    else:
+      print('... Archive directory for yesterday does not exist.')
+      print('    ... Creating a new directory.')
+      print('    ... Move in figures from ./figs_final/')
+      archive_store.archiveDay(yesterday.strftime('%Y-%m-%d'), [os.path.join(finDir,fl) for fl in files_in_figs_final], directory=archiveDir)
+
+      print('    ... Removing all files in ./figs/')
+      for fl in files_in_figs:
+        os.remove( os.path.join(saveDir,fl) )
+
+      print('    ... Removing all files in ./figs_cropped/')
+      for fl in files_in_figs_cropped:
+        os.remove( os.path.join(cropDir,fl) )
+
+  removed = run_workspace.removeOldRuns(workspace.day or today, keep=workspace.runId)
+  if len(removed) > 0:
+    print('... Removed the workspaces of ' + ', '.join(removed) + '.')
+
+  print(archive_store.report())
+  print("Archiving yesterday's forecast complete.")
+
+  return
+
+
+def listDir(directory):
+  return os.listdir(directory) if os.path.isdir(directory) else []
+
+
+def compaction(keepDays, archiveDir=None):
+  try:
+    print(archive_store.compact(keepDays, directory=archiveDir))
+  except Exception as err:
+    # the archive is left as it was (a day is only marked packed once its pack is complete)
+    print('... Archive compaction failed: ' + repr(err))
+
+  return
+
+
+def startCompaction(keepDays=None, archiveDir=None):
+  """
+  startCompaction(keepDays, archiveDir)
+
+  Packs the archived days older than keepDays (archive_store.compact) in a background thread, so the download and
+  processing steps do not wait for it.
+
+  Parameters:
+  - keepDays: number of recent days kept as blobs (None for archive_store.keep_days)
+  - archiveDir: the archive directory (None for ./forecast_archive/)
+  - thread: returned threading.Thread (join() it before the program ends)
+  """
+
+  thread = threading.Thread(target=compaction, args=(keepDays, archiveDir), name='archive-compaction')
+  thread.start()
+
+  return thread
+
+
+if __name__ == '__main__':
+  run()
+  startCompaction()
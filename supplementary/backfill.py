@@ -0,0 +1,165 @@
+"""
+This module runs the CPEX-CV forecasting template again for a range of past forecast days (e.g. to rebuild the
+briefings of a week after an outage), several days at a time, and puts the final images of each day in the archive
+(archive_store.py), as the nightly archive step would have.
+
+Each day runs as its own python process (cpexcv.py run --date YYYY-MM-DD --no-archive --workspace .) in its own
+workspace, ./backfill/YYYY-MM-DD/ with its own figs/, figs_cropped/ and figs_final/, so the days do not share any file
+or any module state, and the template's own ./figs* directories are left alone. At most workers days run at once. When a
+day is done, its ./figs_final/ is archived under its date (one day at a time, by this process) and its workspace is
+removed. The output of a day is kept in its workspace (run.log) if it failed.
+
+The products whose url has no date (NHC analysis and outlooks, GOES-16 and Meteosat-11 latest, MIMIC-TPW, SAL) are
+only ever today's images, so they are not downloaded for a past day (product_catalog.isDated) and the archive does
+not hold today's imagery under an older day.
+
+  python -m cpexcv backfill --from 2022-08-20 --to 2022-08-26 --workers 3
+
+Required packages: concurrent.futures, datetime, os, shutil, subprocess, sys, time.
+"""
+
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import archive_store
+
+
+templateDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+workspaceDir = os.path.join(templateDir,'backfill')
+max_workers = 3
+
+
+def dateRange(first, last):
+  """
+  dateRange(first, last)
+
+  Returns the days from first to last included, as YYYY-MM-DD strings.
+
+  Parameters:
+  - first, last: YYYY-MM-DD
+  """
+
+  day = datetime.strptime(first, '%Y-%m-%d')
+  end = datetime.strptime(last, '%Y-%m-%d')
+  days = []
+  while day <= end:
+    days.append(day.strftime('%Y-%m-%d'))
+    day += timedelta(days=1)
+
+  return days
+
+
+def makeWorkspace(day, directory=None):
+  """
+  makeWorkspace(day, directory)
+
+  Creates the workspace of a day (figs/, figs_cropped/, figs_final/ and the logo) and returns its path.
+
+  Parameters:
+  - day: YYYY-MM-DD
+  - directory: where the workspaces are made (None for workspaceDir)
+  """
+
+  root = os.path.join(directory or workspaceDir,day)
+  if os.path.isdir(root):
+    shutil.rmtree(root)
+  for name in ['figs', 'figs_cropped', 'figs_final']:
+    os.makedirs(os.path.join(root,name))
+  archive_store.linkFile(os.path.join(templateDir,'logo_cpexcv.png'), os.path.join(root,'logo_cpexcv.png'))
+
+  return root
+
+
+def runDay(day, root, profile, jobs, animationFormat):
+  """
+  runDay(day, root, profile, jobs, animationFormat)
+
+  Runs the steps of a profile for one day in its workspace (a separate python process), and waits for it.
+
+  Parameters:
+  - day: YYYY-MM-DD
+  - root: the workspace of the day
+  - profile: name of the profile (e.g. main)
+  - jobs: number of image processes of the day
+  - animationFormat: gif, mp4 or webp
+  - ok, seconds: returned True if the run succeeded, and how long it took
+  """
+
+  cmd = [sys.executable, os.path.join(templateDir,'cpexcv.py'), 'run', '--profile', profile, '--date', day, '--no-archive',
+         '--workspace', '.', '--jobs', str(jobs), '--animation-format', animationFormat]
+  start = time.time()
+  with open(os.path.join(root,'run.log'), 'w') as log:
+    result = subprocess.run(cmd, cwd=root, stdout=log, stderr=subprocess.STDOUT)
+
+  return result.returncode == 0, time.time() - start
+
+
+def archiveDay(day, root, archiveDir=None):
+  """
+  archiveDay(day, root, archiveDir)
+
+  Moves the final images of a day from its workspace into the archive, and returns how many there were.
+  """
+
+  finDir = os.path.join(root,'figs_final')
+  fileNames = [os.path.join(finDir,fl) for fl in sorted(os.listdir(finDir)) if not fl.startswith('.') and os.path.isfile(os.path.join(finDir,fl))]
+  if len(fileNames) > 0:
+    archive_store.archiveDay(day, fileNames, move=True, directory=archiveDir)
+
+  return len(fileNames)
+
+
+def backfill(first, last, profile='main', workers=max_workers, jobs=None, animationFormat='gif', archiveDir=None, keepWorkspaces=False):
+  """
+  backfill(first, last, profile, workers, jobs, animationFormat, archiveDir, keepWorkspaces)
+
+  Runs the template for every day from first to last, workers days at a time, and archives their final images.
+
+  Parameters:
+  - first, last: first and last forecast day (YYYY-MM-DD)
+  - profile: name of the profile (e.g. main)
+  - workers: number of days run at once
+  - jobs: number of image processes per day (None to share the cores between the days)
+  - animationFormat: gif, mp4 or webp
+  - archiveDir: the archive directory (None for ./forecast_archive/ of the template)
+  - keepWorkspaces: True to keep the workspaces of the days that succeeded
+  - results: returned dictionary of day -> True/False
+  """
+
+  days = dateRange(first, last)
+  workers = max(1, min(workers, len(days)))
+  if jobs is None:
+    jobs = max(1, (os.cpu_count() or 1)//workers)
+  if archiveDir is None:
+    archiveDir = os.path.join(templateDir,'forecast_archive')
+
+  print('Backfilling ' + str(len(days)) + ' days (' + first + ' to ' + last + '), ' + str(workers) + ' at a time.')
+  start = time.time()
+
+  results = {}
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    roots = dict((day, makeWorkspace(day)) for day in days)
+    futures = dict((executor.submit(runDay, day, roots[day], profile, jobs, animationFormat), day) for day in days)
+    for future in as_completed(futures):
+      day = futures[future]
+      ok, seconds = future.result()
+      results[day] = ok
+      if not ok:
+        print('... ' + day + ': failed after ' + '{:.0f}'.format(seconds) + ' s, see ' + os.path.join(roots[day],'run.log'))
+        continue
+
+      nFiles = archiveDay(day, roots[day], archiveDir)
+      print('... ' + day + ': ' + str(nFiles) + ' final images archived (' + '{:.0f}'.format(seconds) + ' s)')
+      if not keepWorkspaces:
+        shutil.rmtree(roots[day])
+
+  print(archive_store.report())
+  print('Backfilling complete: ' + str(sum(results.values())) + '/' + str(len(days)) + ' days in ' + '{:.0f}'.format(time.time() - start) + ' s.')
+
+  return results
@@ -11,7 +11,7 @@ swu@ou.edu
 
 This program is used to retrieve images for the CPEX-AW and CPEX-CV field campaign forecasting template.
 
-Required packages: os, subprocess, time.
+Required packages: os, PIL.
 
 
 NOTE: Read through the True/False switches at the top of the script to make sure the ones you want are selected.
@@ -20,16 +20,22 @@ Updates:
  - 2022-08-20: Add ECWMF 700 & 850 mb outlook
  - 2022-08-27: Adopt to all operating systems
  - 2022-09-12: Change to object oriented version
+ - 2026-10-17: The steps are in run(switches), called by cpexcv.py with the switches of the download stage, or when the script is run
+ - 2026-10-17: The products downloaded are read from the run state of the download stage (run_state.py) instead of switches_process.txt
+ - 2026-10-17: Animations are written in memory (animation_writer.py): one shared palette, and the last frame held longer instead of copied 3 times
+ - 2026-10-17: After the first frame only the changed rectangle of each frame is written (unchanged pixels transparent); size and time printed per animation
+ - 2026-10-17: Animations can be written as .mp4 (H.264) or animated .webp instead of .gif (animation_writer.animation_format)
+ - 2026-10-17: run(state, workspace) reads and writes the images of the workspace of the run (workspace.py)
 """
 
 
 import os
-import subprocess
-import time
-from PIL import Image
+
+import animation_writer
+import run_state
+import workspace as run_workspace
 
 
-readSwitches = True
 createAnimations = True
 
 model_day1 = model_day2 = True
@@ -40,181 +46,134 @@ model_day1 = model_day2 = True
 
 nDup_frames = 3
 
-forecastDir = os.getcwd()
-saveDir = os.path.join('.','figs')
-cropDir = os.path.join('.','figs_cropped')
-finDir  = os.path.join('.','figs_final')
-
-
-present_files = [fl for fl in os.listdir(saveDir)]
-present_files_animation = [fl for fl in present_files if '_anim_' in fl]
-
 
-def persistLastImage(fileDir, imageNameRoot, nDup=3):
+def animationSteps(fileDir, imageNameRoot, outName):
   """
-  persistLastImage(fileDir, imageNameRoot, nDup)
+  animationSteps(fileDir, imageNameRoot, outName)
 
-  Will copy the last image in the series nDup times, so it persists a bit longer in animation.
+  Writes the .gif animation of the images starting with imageNameRoot (animation_writer.py), with the last frame held nDup_frames delays longer.
 
   Parameters:
   - fileDir: the directory where the files are saved
   - imageNameRoot: the complete root of the animation images (e.g. uwincm_anim_day1_)
-  - nDup: number of times the last image is duplicated
-  """
-
-  fls = sorted([el for el in os.listdir(fileDir) if imageNameRoot in el])
-  if len(fls) > 0:
-    working = True
-    frame_num = [int(el[-6:-4]) for el in fls]
-    for fl in range(nDup):
-      cmd = ['cp ', os.path.join(fileDir,imageNameRoot+'{:02d}'.format(frame_num[-1])+fls[-1][-4:]), os.path.join(fileDir,imageNameRoot+'{:02d}'.format(frame_num[-1]+fl+1)+fls[-1][-4:]) ]
-      os.system(' '.join(cmd))
-  else:
-    working = False
-
-  return working
-
-
-def createAnimation(fileDir, imageNameRoot, outName, delay=50, loop=0):
+  - outName: the name of the output file (e.g. something.gif)
   """
-  createAnimation(fileDir, imageNameRoot, delay=50, loop=0, outName)
 
-  Will create a .gif animation of the provided images and save it.
+  dl = animation_writer.animate(fileDir, imageNameRoot, outName, hold=nDup_frames)
 
-  Parameters:
-  - fileDir: the directory where the files are saved
-  - imageNameRoot: the complete root of the animation images (e.g. uwincm_anim_day1_)
-  - outName: the name of the output file (e.g. something.gif)
-  - delay: delay in ms
-  - loop: 0 means repeating
-  """
-  cmd = ['convert ', '-delay', str(delay), os.path.join(fileDir,imageNameRoot+'*'), '-loop', str(loop), '+repage', os.path.join(fileDir,outName) ]
-  os.system(' '.join(cmd))
+  if not dl:
+    print('... ... Missing images - cannot create animation')
 
   return
 
 
-def animationSteps(fileDir, imageNameRoot, outName):
+def run(state=None, workspace=None):
   """
-  animationSteps(fileDir, imageNameRoot, outName)
+  run(state, workspace)
 
-  Sequentially calls persistLastImage, then createAnimation (if possible), to output an animation.
+  Creates the .gif animations of the model output downloaded to ./figs/ of the workspace.
 
   Parameters:
-  - fileDir: the directory where the files are saved
-  - imageNameRoot: the complete root of the animation images (e.g. uwincm_anim_day1_)
-  - outName: the name of the output file (e.g. something.gif)
+  - state: run_state.RunState returned by the download stage (None to read ./figs/.run_state.json)
+  - workspace: workspace.Workspace of the run (None for ./figs/ of the working directory)
   """
 
-  dl = persistLastImage(fileDir, imageNameRoot)
-
-  if dl:
-    createAnimation(fileDir, imageNameRoot, outName)
-  else:
-    print('... ... Missing images - cannot create animation')
+  if workspace is None:
+    workspace = run_workspace.Workspace.inPlace()
+  saveDir = workspace.saveDir
+
+  if state is None:
+    print("Reading the download results from " + workspace.stateFile)
+    state = run_state.load(workspace.stateFile)
+    print("Reading the download results complete.")
+  switches = state.switches()
+
+  print('')
+  print('')
+  print('')
+  print('')
+  print('')
+
+
+  if createAnimations:
+    print('Creating model output animations.')
+    present_files = [fl for fl in os.listdir(saveDir)]
+    present_files_animation = [fl for fl in present_files if '_anim_' in fl]
+
+    if switches['uwincm_clouds_animation']:
+      current_fls = [fl for fl in present_files_animation if 'uwincm_clouds_day1_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day1:
+          print('... UWINCM clouds - model day 1')
+          animationSteps(saveDir, 'uwincm_clouds_day1_anim_', 'uwincm_clouds_day1_movie.gif')
+
+      current_fls = [fl for fl in present_files_animation if 'uwincm_clouds_day2_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day2:
+          print('... UWINCM clouds - model day 2')
+          animationSteps(saveDir, 'uwincm_clouds_day2_anim_', 'uwincm_clouds_day2_movie.gif')
+
+
+    if switches['uwincm_precipitation_animation']:
+      current_fls = [fl for fl in present_files_animation if 'uwincm_precip_day1_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day1:
+          print('... UWINCM precipitation - model day 1')
+          animationSteps(saveDir, 'uwincm_precip_day1_anim_', 'uwincm_precip_day1_movie.gif')
+
+      current_fls = [fl for fl in present_files_animation if 'uwincm_precip_day2_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day2:
+          print('... UWINCM precipitation - model day 2')
+          animationSteps(saveDir, 'uwincm_precip_day2_anim_', 'uwincm_precip_day2_movie.gif')
+
+
+    if switches['uutah_precipitation_animation'] or switches['UTAH_website']:
+      current_fls = [fl for fl in present_files_animation if 'uutah_precip_day1_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day1:
+          print('... UofUtah precipitation - model day 1')
+          animationSteps(saveDir, 'uutah_precip_day1_anim_', 'uutah_precip_day1_movie.gif')
+
+      current_fls = [fl for fl in present_files_animation if 'uutah_precip_day2_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day2:
+          print('... UofUtah precipitation - model day 2')
+          animationSteps(saveDir, 'uutah_precip_day2_anim_', 'uutah_precip_day2_movie.gif')
+
+
+    if switches['ucdavis_precipitation_animation']:
+      current_fls = [fl for fl in present_files_animation if 'ucdavis_precip_day1_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day1:
+          print('... UofDavis precipitation - model day 1')
+          animationSteps(saveDir, 'ucdavis_precip_day1_anim_', 'ucdavis_precip_day1_movie.gif')
+
+      current_fls = [fl for fl in present_files_animation if 'ucdavis_precip_day2_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day2:
+          print('... UofDavis precipitation - model day 2')
+          animationSteps(saveDir, 'ucdavis_precip_day2_anim_', 'ucdavis_precip_day2_movie.gif')
+
+
+    if switches['mpas_precipitation']:
+      current_fls = [fl for fl in present_files_animation if 'ucdavis_precip_day1_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day1:
+          print('... MPAS precipitation - model day 1')
+          animationSteps(saveDir, 'mpas_precip_day1_anim_', 'mpas_precip_day1_movie.gif')
+
+      current_fls = [fl for fl in present_files_animation if 'ucdavis_precip_day2_anim_' in fl]
+      if len(current_fls) == 12:
+        if model_day2:
+          print('... MPAS precipitation - model day 2')
+          animationSteps(saveDir, 'mpas_precip_day2_anim_', 'mpas_precip_day2_movie.gif')
+
+    animation_writer.summary()
+    print('Creating model output animations complete.')
 
   return
 
 
-if readSwitches:
-  print("Reading True/False switches from switches_process.txt")
-  fl = open( os.path.join(forecastDir,'supplementary','switches_process.txt'), 'r')
-  data = fl.readlines()
-  fl.close()
-  data = [line.rstrip() for line in data]
-
-  switches = {}
-  for line in data:
-    if len(line) > 0:
-      switch_name, switch_setting = line.split(' = ')
-
-      if switch_setting == 'True':
-        switches[switch_name] = True
-      elif switch_setting == 'False':
-        switches[switch_name] = False
-
-
-  print("Reading True/False switches complete.")
-
-  time.sleep(10)
-
-print('')
-print('')
-print('')
-print('')
-print('')
-
-
-if createAnimations:
-  print('Creating model output animations.')
-
-  if switches['uwincm_clouds_animation']:
-    current_fls = [fl for fl in present_files_animation if 'uwincm_clouds_day1_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day1:
-        print('... UWINCM clouds - model day 1')
-        animationSteps(saveDir, 'uwincm_clouds_day1_anim_', 'uwincm_clouds_day1_movie.gif')
-
-    current_fls = [fl for fl in present_files_animation if 'uwincm_clouds_day2_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day2:
-        print('... UWINCM clouds - model day 2')
-        animationSteps(saveDir, 'uwincm_clouds_day2_anim_', 'uwincm_clouds_day2_movie.gif')
-
-
-  if switches['uwincm_precipitation_animation']:
-    current_fls = [fl for fl in present_files_animation if 'uwincm_precip_day1_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day1:
-        print('... UWINCM precipitation - model day 1')
-        animationSteps(saveDir, 'uwincm_precip_day1_anim_', 'uwincm_precip_day1_movie.gif')
-
-    current_fls = [fl for fl in present_files_animation if 'uwincm_precip_day2_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day2:
-        print('... UWINCM precipitation - model day 2')
-        animationSteps(saveDir, 'uwincm_precip_day2_anim_', 'uwincm_precip_day2_movie.gif')
-
-
-  if switches['uutah_precipitation_animation'] or switches['UTAH_website']:
-    current_fls = [fl for fl in present_files_animation if 'uutah_precip_day1_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day1:
-        print('... UofUtah precipitation - model day 1')
-        animationSteps(saveDir, 'uutah_precip_day1_anim_', 'uutah_precip_day1_movie.gif')
-
-    current_fls = [fl for fl in present_files_animation if 'uutah_precip_day2_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day2:
-        print('... UofUtah precipitation - model day 2')
-        animationSteps(saveDir, 'uutah_precip_day2_anim_', 'uutah_precip_day2_movie.gif')
-
-
-  if switches['ucdavis_precipitation_animation']:
-    current_fls = [fl for fl in present_files_animation if 'ucdavis_precip_day1_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day1:
-        print('... UofDavis precipitation - model day 1')
-        animationSteps(saveDir, 'ucdavis_precip_day1_anim_', 'ucdavis_precip_day1_movie.gif')
-
-    current_fls = [fl for fl in present_files_animation if 'ucdavis_precip_day2_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day2:
-        print('... UofDavis precipitation - model day 2')
-        animationSteps(saveDir, 'ucdavis_precip_day2_anim_', 'ucdavis_precip_day2_movie.gif')
-
-
-  if switches['mpas_precipitation']:
-    current_fls = [fl for fl in present_files_animation if 'ucdavis_precip_day1_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day1:
-        print('... MPAS precipitation - model day 1')
-        animationSteps(saveDir, 'mpas_precip_day1_anim_', 'mpas_precip_day1_movie.gif')
-
-    current_fls = [fl for fl in present_files_animation if 'ucdavis_precip_day2_anim_' in fl]
-    if len(current_fls) == 12:
-      if model_day2:
-        print('... MPAS precipitation - model day 2')
-        animationSteps(saveDir, 'mpas_precip_day2_anim_', 'mpas_precip_day2_movie.gif')
-
-  print('Creating model output animations complete.')
+if __name__ == '__main__':
+  run()
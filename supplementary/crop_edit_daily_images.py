@@ -11,7 +11,7 @@ swu@ou.edu
 
 This program is used to retrieve images for the CPEX-AW and CPEX-CV field campaign forecasting template.
 
-Required packages: os, subprocess, time.
+Required packages: argparse, os, shutil, numpy, PIL.
 
 
 NOTE: Read through the True/False switches at the top of the script to make sure the ones you want are selected.
@@ -23,11 +23,29 @@ Updates:
  - 2022-08-20: Changing the highlight point to Sal island
  - 2022-08-27: Adopt to all operating systems
  - 2022-09-12: Change to object oriented version
+ - 2026-10-17: Cropping, markers, resizing and color scale labels are done in memory (image_engine.py), each image is read and written once
+ - 2026-10-17: Each product is described by one Recipe (crop, markers, resize, extent, labels), applied to all of its frames at once
+ - 2026-10-17: Frames are processed by a pool of worker processes, one per core by default (--jobs N)
+ - 2026-10-17: The products are listed in product_recipes.py (also run by the download stage), and images already processed are left out
+ - 2026-10-17: The steps are in run(switches, jobs), called by cpexcv.py with the switches of the download stage, or when the script is run
+ - 2026-10-17: The products downloaded are read from the run state of the download stage (run_state.py) instead of switches_process.txt
+ - 2026-10-17: Animations are written in memory (animation_writer.py): one shared palette, and the last frame held longer instead of copied 3 times
+ - 2026-10-17: After the first frame only the changed rectangle of each frame is written (unchanged pixels transparent); size and time printed per animation
+ - 2026-10-17: Animations can be written as .mp4 (H.264) or animated .webp instead of .gif (animation_writer.animation_format)
+ - 2026-10-17: The joint animations (side by side and the four-model 2x2 panel) are put together in memory (panel_compositor.py) and written directly, without convert or the temp1_anim_/temp2_anim_ .jpg files
+ - 2026-10-17: run(state, jobs, workspace) reads and writes the images of the workspace of the run (workspace.py)
 """
 
+import argparse
 import os
-import subprocess
-import time
+import shutil
+
+import animation_writer
+import image_engine
+import panel_compositor
+import product_recipes
+import run_state
+import workspace as run_workspace
 
 
 model_4panel_ul = 'uwincm'
@@ -36,990 +54,339 @@ model_4panel_dl = 'ucdavis'
 model_4panel_dr = 'mpas'
 
 clearDirectory = False # remove existing files
-readSwitches = True
 processImages = True
+reprocessAll = False # False leaves out images already processed since they were downloaded (e.g. by the download stage)
 joinSlideAnimations = True
 moveFinalImages = True
 
 model_day1 = model_day2 = True
 
-forecastDir = os.getcwd()
-saveDir = os.path.join('.','figs')
-cropDir = os.path.join('.','figs_cropped')
-finDir  = os.path.join('.','figs_final')
-
+nJobs = os.cpu_count() or 1 # worker processes for the frames, set with --jobs N (1 processes them one after the other)
 
 nDup_frames = 3
 
 
-def persistLastImage(fileDir, imageNameRoot, nDup=3):
+def animationSteps(fileDir, imageNameRoot, outName):
   """
-  persistLastImage(fileDir, imageNameRoot, nDup)
+  animationSteps(fileDir, imageNameRoot, outName)
 
-  Will copy the last image in the series nDup times, so it persists a bit longer in animation.
+  Writes the .gif animation of the images starting with imageNameRoot (animation_writer.py), with the last frame held nDup_frames delays longer.
 
   Parameters:
   - fileDir: the directory where the files are saved
   - imageNameRoot: the complete root of the animation images (e.g. uwincm_anim_day1_)
-  - nDup: number of times the last image is duplicated
+  - outName: the name of the output file (e.g. something.gif)
   """
 
-  fls = sorted([el for el in os.listdir(fileDir) if imageNameRoot in el])
-  if len(fls) > 0:
-    working = True
-    frame_num = [int(el[-6:-4]) for el in fls]
-    for fl in range(nDup):
-      cmd = ['cp', os.path.join(fileDir,imageNameRoot+'{:02d}'.format(frame_num[-1])+fls[-1][-4:]), os.path.join(fileDir,imageNameRoot+'{:02d}'.format(frame_num[-1]+fl+1)+fls[-1][-4:]) ]
-      os.system(' '.join(cmd))
-  else:
-    working = False
+  dl = animation_writer.animate(fileDir, imageNameRoot, outName, hold=nDup_frames)
+
+  if not dl:
+    print('... ... Missing images - cannot create animation')
 
-  return working
+  return
 
 
-def createAnimation(fileDir, imageNameRoot, outName, delay=50, loop=0):
+def panelFiles(fileDir, imageNamePart):
   """
-  createAnimation(fileDir, imageNameRoot, delay=50, loop=0, outName)
+  panelFiles(fileDir, imageNamePart)
 
-  Will create a .gif animation of the provided images and save it.
+  Returns the sorted paths of the images in fileDir whose names contain imageNamePart.
 
   Parameters:
   - fileDir: the directory where the files are saved
-  - imageNameRoot: the complete root of the animation images (e.g. uwincm_anim_day1_)
-  - outName: the name of the output file (e.g. something.gif)
-  - delay: delay in ms
-  - loop: 0 means repeating
+  - imageNamePart: part of the names of the images (e.g. ECMWF_midRH_anim_day1)
   """
-  cmd = ['convert', '-delay', str(delay), os.path.join(fileDir,imageNameRoot+'*'), '-loop', str(loop), '+repage', os.path.join(fileDir,outName) ]
-  os.system(' '.join(cmd))
 
-  return
+  return [os.path.join(fileDir,el) for el in sorted(os.listdir(fileDir)) if imageNamePart in el]
 
 
-def animationSteps(fileDir, imageNameRoot, outName):
+def jointAnimation(fileDir, left, right, outName):
   """
-  animationSteps(fileDir, imageNameRoot, outName)
+  jointAnimation(fileDir, left, right, outName)
 
-  Sequentially calls persistLastImage, then createAnimation (if possible), to output an animation.
+  Writes the animation of two products side by side (panel_compositor.py), frame by frame, with the last frame held nDup_frames delays longer.
 
   Parameters:
   - fileDir: the directory where the files are saved
-  - imageNameRoot: the complete root of the animation images (e.g. uwincm_anim_day1_)
-  - outName: the name of the output file (e.g. something.gif)
+  - left: part of the names of the images on the left (e.g. ECMWF_midRH_anim_day1)
+  - right: part of the names of the images on the right (e.g. GFS_midRH_anim_day1)
+  - outName: the name of the output file (e.g. ECMWF_GFS_midRH_day1.gif)
   """
 
-  dl = persistLastImage(fileDir, imageNameRoot)
+  fls_left = panelFiles(fileDir, left)
+  fls_right = panelFiles(fileDir, right)
+  if len(fls_left) > len(fls_right):
+    print('... ... The numbers of images for fields do not match.')
+    return
 
-  if dl:
-    createAnimation(fileDir, imageNameRoot, outName)
-  else:
+  dl = panel_compositor.animatePanels([fls_left, fls_right[:len(fls_left)]], 1, 2, os.path.join(fileDir,outName), hold=nDup_frames)
+
+  if not dl:
     print('... ... Missing images - cannot create animation')
 
   return
 
 
+def fourPanelAnimation(fileDir, day, logo, outName, frames=12):
+  """
+  fourPanelAnimation(fileDir, day, logo, outName, frames)
 
+  Writes the 2x2 animation of the precipitation of the four models (model_4panel_ul, _ur, _dl, _dr), frame by frame.
 
+  Parameters:
+  - fileDir: the directory where the files are saved
+  - day: model day (e.g. day1)
+  - logo: PIL image shown instead of a model with fewer than frames images
+  - outName: the name of the output file (e.g. Four_model_joint_movie_day1.gif)
+  - frames: number of frames of the animation
+  """
 
-if clearDirectory:
-  print('Removing existing files.')
-  existing_files = [el for el in sorted(os.listdir(cropDir)) if 'logo_cpexcv.png' not in el]
-  for fl in existing_files:
-    os.remove( os.path.join(cropDir,fl) )
-
-  print('Copying over CPEX-CV logo.')
-  fls = os.listdir(saveDir)
-  cmd = ['cp', os.path.join(saveDir,'logo_cpexcv.png'), os.path.join(cropDir,'logo_cpexcv.png') ]
-  os.system(' '.join(cmd))
-  cmd = ['convert', os.path.join(cropDir,'logo_cpexcv.png'), '-trim',  '-border',  '0',  '+repage', os.path.join(cropDir,'logo_cpexcv.png')]
-  os.system(' '.join(cmd))
-  cmd = ['cp', os.path.join(cropDir,'logo_cpexcv.png'), os.path.join(finDir,'logo_cpexcv.png') ]
-  os.system(' '.join(cmd))
-  print('Removing existing files complete.')
-
-  time.sleep(10)
-
-print('Copying over CPEX-CV logo.')
-fls = os.listdir(saveDir)
-cmd = ['cp', os.path.join(saveDir,'logo_cpexcv.png'), os.path.join(cropDir,'logo_cpexcv.png') ]
-os.system(' '.join(cmd))
-cmd = ['convert', os.path.join(cropDir,'logo_cpexcv.png'), '-trim',  '-border',  '0',  '+repage', os.path.join(cropDir,'logo_cpexcv.png')]
-os.system(' '.join(cmd))
-cmd = ['cp', os.path.join(cropDir,'logo_cpexcv.png'), os.path.join(finDir,'logo_cpexcv.png') ]
-os.system(' '.join(cmd))
-
-print('')
-print('')
-print('')
-print('')
-print('')
-
-
-if readSwitches:
-  print("Reading True/False switches from switches_process.txt")
-  fl = open( os.path.join(forecastDir,'supplementary','switches_process.txt'), 'r')
-  data = fl.readlines()
-  fl.close()
-  data = [line.rstrip() for line in data]
-
-  switches = {}
-  for line in data:
-    if len(line) > 0:
-      switch_name, switch_setting = line.split(' = ')
-
-      if switch_setting == 'True':
-        switches[switch_name] = True
-      elif switch_setting == 'False':
-        switches[switch_name] = False
-
-
-  print("Reading True/False switches complete.")
-
-
-print('')
-print('')
-print('')
-print('')
-print('')
-
-if processImages:
-  all_files = sorted([el for el in os.listdir(saveDir)])
-  print('Processing images.')
-
-
-  if switches['nhc_analysis']:
-    print('... NHC analysis - cropping image and adding   Sal locations.')
-    current_files = [el for el in all_files if 'NHC_surface_analysis.png' in el]
-
-    marker_radius = 5
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '1268x648+1100+350', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 952, 445
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-    current_files = [el for el in all_files if 'NHC_' in el and 'surface_analysis' not in el]
-
-    marker_radius = 5
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '900x665+0+0', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 775, 445
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'blue', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-
-  if switches['mimic_tpw']:
-    print('... MIMIC-TPW - cropping image and adding   Sal locations.')
-    current_files = sorted([el for el in all_files if 'MIMIC-TPW' in el])
-
-    marker_radius = 4
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '990x452+8+18', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 665, 323
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'white', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-    current_files_subset = [el for el in current_files if 'animation-' in el]
-    frame_number = [int(el.split('-')[-1].split('.')[0]) for el in current_files_subset]
-    for num, fl in enumerate(current_files_subset):
-      os.rename(os.path.join(cropDir,fl), os.path.join(cropDir,fl[:24]+'{:02d}'.format(frame_number[num])+fl[-4:]))
-
-
-
-  if switches['brammer_tropical_waves']:
-    print('   ... Tropical wave analysis - cropping image and adding Sal locations.')
-    current_files = [el for el in all_files if 'Brammer' in el]
-
-    marker_radius = 4
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '990x388+10+0', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 662, 243
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-
-  if switches['sal_split']:
-    print('   ... SAL dust split image - cropping image and adding Sal location.')
-    current_files = [el for el in all_files if 'SAL_dryAir_split' in el]
-
-    marker_radius = 6
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '1312x780+230+0', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 1120, 488
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'white', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      # # # crop off the color bar
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '682x38+430+782', '+repage', os.path.join(cropDir,fl[:-4]+'_cbar'+fl[-4:])]
-      os.system(' '.join(cmd))
-
-      # # # resize color bar
-      cmd = ['convert', os.path.join(cropDir,fl[:-4]+'_cbar'+fl[-4:]), '-resize', '1312x73', '+repage', os.path.join(cropDir,fl[:-4]+'_cbar'+fl[-4:]) ]
-      os.system(' '.join(cmd))
-
-      print('      ... Adding a larger version of the color bar.')
-      # # # join original image and larger color bar together
-      cmd = ['convert', os.path.join(cropDir,fl), os.path.join(cropDir,fl[:-4]+'_cbar'+fl[-4:]), '-append', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-  if switches['meteosat_sat']:
-    print('... Meteosat-11 - cropping image, adding Sal location, and adding a Celsius IR scale.')
-    current_files = sorted([el for el in all_files if 'Meteosat' in el])
-
-    marker_radius = 12
-    #xPt, yPt = 600, 675
-    xPt, yPt = 850, 910
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '3000x2000+0+0', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'magenta', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      if 'IRC' in fl:
-        print('      ... Color IR - adding Celsius color scale on side.')
-        #cmd = []
-        cmd = ['convert', os.path.join(cropDir,fl), '-resize', '3100x2000', '-background', 'white', '-gravity', 'west', '-extent', '3100x2000', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        # this will add a  color scale
-
-        xPtT, yPtT = 3000, 1775
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-110', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 1577
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-90', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 1395
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-70', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 1215
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-50', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 1035
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-30', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 855
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-10', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 675
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), ' 10', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 495
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), ' 30', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 315
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), ' 50', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 3000, 245
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), 'ºC', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-
-
-  if switches['GOES16_sat']:
-    print('... GOES-16 - cropping image, adding St. Croix location, and adding a Celsius IR scale.')
-    current_files = sorted([el for el in all_files if 'Goes16' in el])
-
-    marker_radius = 12
-    for fl in current_files:
-      if ('IRC' or 'RGB') in fl:
-        xPt, yPt = 1340, 940
-        cmd = ['convert', os.path.join(saveDir,fl), '-crop', '2000x2000+0+0', '+repage', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-
-        cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'magenta', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-
-      elif 'VIS' in fl:
-        xPt, yPt = 940, 1560
-        cmd = ['convert', os.path.join(saveDir,fl), '-crop', '3712x3700+0+0', '+repage', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-
-        cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'magenta', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius*2) + ',' + str(yPt+marker_radius*2) + '\'', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-
-      if 'IRC' in fl:
-        print('      ... Color IR - adding Celsius color scale on side.')
-        #cmd = []
-        cmd = ['convert', os.path.join(cropDir,fl), '-resize', '2100x2000', '-background', 'white', '-gravity', 'west', '-extent', '2100x2000', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        # this will add a  color scale
-
-        xPtT, yPtT = 2000, 1775
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-110', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 1577
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-90', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 1395
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-70', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 1215
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-50', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 1035
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-30', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 855
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), '-10', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 675
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), ' 10', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 495
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), ' 30', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 315
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), ' 50', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-        xPtT, yPtT = 2000, 245
-        cmd = ['convert', os.path.join(cropDir,fl), '-pointsize', '50', '-annotate', '+' + str(xPtT) + '+' + str(yPtT), 'ºC', os.path.join(cropDir,fl)]
-        os.system(' '.join(cmd))
-
-
-  if switches['meteosat_sat'] and switches['GOES16_sat']:
-    current_files_met = sorted([el for el in all_files if 'Meteosat' in el])
-    current_files_goes = sorted([el for el in all_files if 'Goes16' in el])
-
-
-    # for IRC image:
-    fileName = 'Goes16_Meteosat11_IRC.png'
-    currentInd_met = current_files_met.index([fl for fl in current_files_met if '_IRC.' in fl][0])
-    currentInd_goes = current_files_goes.index([fl for fl in current_files_goes if '_IRC.' in fl][0])
-
-    # 1. crop off the color bar off of GOES16
-    cmd = ['convert', os.path.join(cropDir,current_files_goes[currentInd_goes]), '-crop', '502x2000+0+0', '+repage', os.path.join(cropDir,'temp1.png')]
-    os.system(' '.join(cmd))
-
-    # 2. merge met file with goes file
-    cmd = ['convert', os.path.join(cropDir,'temp1.png'), os.path.join(cropDir,current_files_met[currentInd_met]), '+append', '+repage', os.path.join(cropDir,fileName)]
-    os.system(' '.join(cmd))
-
-
-    current_fls = [fl for fl in os.listdir(cropDir) if 'temp' in fl and '.png' in fl]
-    for fl in current_fls:
-      cmd = ['rm', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-  if switches['uwincm_clouds_animation']:
-    print('   ... UWIN-CM - clouds and TPW - cropping image and adding Sal locations.')
-    current_files = sorted([el for el in all_files if 'uwincm_clouds' in el])
-
-    marker_radius = 5
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '740x450+25+110', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 448, 172
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'white', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-  if switches['uwincm_precipitation_animation']:
-    print('   ... UWIN-CM - precipitation - cropping image and adding Sal locations.')
-    current_files = sorted([el for el in all_files if 'uwincm_precip' in el])
-
-    marker_radius = 5
-
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '740x500+25+110', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      # Cape Verde
-      xPt, yPt = 454, 171
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'black', '-stroke', 'red', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-
-  if switches['uutah_precipitation_animation'] or switches['UTAH_website']:
-    print('   ... Unversity of Utah - precipitation - cropping image and adding Sal location.')
-    current_files = sorted([el for el in all_files if 'uutah_precip' in el])
-
-    marker_radius = 5
-    for fl in current_files:
-      #cmd = ['convert', os.path.join(saveDir,fl), '-crop', '800x500+0+0', '+repage', os.path.join(cropDir,fl)]
-      cmd = ['cp', os.path.join(saveDir,fl), os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 452, 187
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'black', '-stroke', 'red', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      cmd = ['convert', os.path.join(cropDir,fl), '-resize', '750x500', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-    current_files = sorted([el for el in all_files if 'uutah_clouds' in el])
-
-    marker_radius = 5
-    for fl in current_files:
-      #cmd = ['convert', os.path.join(saveDir,fl), '-crop', '800x500+0+0', '+repage', os.path.join(cropDir,fl)]
-      cmd = ['cp', os.path.join(saveDir,fl), os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 452, 187
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'black', '-stroke', 'red', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      cmd = ['convert', os.path.join(cropDir,fl), '-resize', '750x500', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-  if switches['ucdavis_precipitation_animation']:
-    print('   ... Unversity of UCDavis - precipitation - cropping image and adding Sal location.')
-    current_files = sorted([el for el in all_files if 'ucdavis_precip' in el])
-
-    marker_radius = 5
-    for fl in current_files:
-      #cmd = ['convert', os.path.join(saveDir,fl), '-crop', '800x500+0+0', '+repage', os.path.join(cropDir,fl)]
-      cmd = ['cp', os.path.join(saveDir,fl), os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 422, 163
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'black', '-stroke', 'red', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      cmd = ['convert', os.path.join(cropDir,fl), '-resize', '750x500', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-  if switches['ECMWF_prediction']:
-    print('   ... ECMWF outlook - cropping image and adding Sal locations.')
-    current_files = sorted([el for el in all_files if 'ECMWF_midRH_anim' in el])
-
-    marker_radius = 4
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '971x547+0+0', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 235, 325
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-    current_files = sorted([el for el in all_files if 'ECMWF_mslp_pcpn_anim' in el])
-
-    marker_radius = 4
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '971x547+0+0', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 235, 325
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-    current_files = sorted([el for el in all_files if 'GFS_midRH_anim' in el])
-
-
-  if switches['GFS_prediction']:
-    print('   ... GFS outlook - cropping image and adding Sal locations.')
-    marker_radius = 4
-    for fl in current_files:
-      #cmd = ['convert', os.path.join(saveDir,fl), '-crop', '825x530+80+85', '+repage', os.path.join(cropDir,fl)]
-      cmd = ['cp', os.path.join(saveDir,fl), os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 235, 325
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-    current_files = sorted([el for el in all_files if 'GFS_mslp_pcpn_anim' in el])
-
-    marker_radius = 4
-    for fl in current_files:
-      #cmd = ['convert', os.path.join(saveDir,fl), '-crop', '825x530+80+85', '+repage', os.path.join(cropDir,fl)]
-      cmd = ['cp', os.path.join(saveDir,fl), os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 235, 325
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-  if switches['mpas_outlook_day34']:
-    print('   ... MPAS outlook - cropping image and adding Sal locations.')
-    current_files = sorted([el for el in all_files if 'mpas_rainr' in el])
-
-    marker_radius = 4
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '780x400+0+115', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 402, 98
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-    current_files = sorted([el for el in all_files if 'mpas_pw_olr' in el])
-
-    marker_radius = 4
-    for fl in current_files:
-      #cmd = ['convert', os.path.join(saveDir,fl), '-crop', '825x530+80+85', '+repage', os.path.join(cropDir,fl)]
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '780x400+0+115', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 402, 98
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-  if switches['mpas_precipitation']:
-    current_files = sorted([el for el in all_files if 'mpas_precip' in el])
-
-    marker_radius = 4
-    for fl in current_files:
-      #cmd = ['convert', os.path.join(saveDir,fl), '-crop', '825x530+80+85', '+repage', os.path.join(cropDir,fl)]
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '780x400+0+115', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 402, 98
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      cmd = ['convert', os.path.join(cropDir,fl), '-resize', '750x500', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-  if switches['nasa_geos']:
-    print('   ... NASA GEOS images - cropping image and adding Sal locations.')
-    current_files = sorted([el for el in all_files if 'GEOS_700mb_outlook' in el])
-
-    marker_radius = 5
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '984x688+0+80', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 685, 335
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-    current_files = sorted([el for el in all_files if ('GEOS_dust' in el) and ('vert' not in el)])
-
-    marker_radius = 5
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '984x688+0+80', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 360, 325
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'white', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      #os.system(' '.join(cmd))
-
-      xPt, yPt = 685, 335
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'white', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-    current_files = sorted([el for el in all_files if ('GEOS_dust' in el) and ('N.png' in el)])
-
-    marker_radius = 8
-    xPt, yPt = 385, 619
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '1021x654+2+57', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 750, 619
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'white', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-    current_files = sorted([el for el in all_files if ('GEOS_dust' in el) and ('W.png' in el)])
-
-    marker_radius = 8
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '1019x681+0+57', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 495, 619
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'white', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-    current_files = sorted([el for el in all_files if ('GEOS_total_aot' in el)])
-
-    marker_radius = 5
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '984x688+0+80', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 685, 335
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'blue', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-    current_files = sorted([el for el in all_files if ('GEOS_' in el) and ('CloudFraction' in el)])
-
-    marker_radius = 5
-    for fl in current_files:
-      cmd = ['convert', os.path.join(saveDir,fl), '-crop', '984x688+0+80', '+repage', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-      xPt, yPt = 685, 335
-      cmd = ['convert', os.path.join(cropDir,fl), '-fill', 'red', '-stroke', 'black', '-draw', '\''+'circle '+ str(xPt) + ',' + str(yPt) + ' ' + str(xPt+marker_radius) + ',' + str(yPt+marker_radius) + '\'', os.path.join(cropDir,fl)]
-      os.system(' '.join(cmd))
-
-
-
-  print('Processing images complete.')
-  time.sleep(5)
-
-print('')
-print('')
-print('')
-print('')
-print('')
-
-
-
-if joinSlideAnimations:
-  print('Creating joint animations.')
-
-  if switches['ECMWF_prediction'] and switches['GFS_prediction']:
-      print('... ECMWF & GFS midRH')
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'ECMWF_midRH_anim_day1' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'GFS_midRH_anim_day1' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'ECMWF_GFS_midRH_day1_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
-
-      animationSteps(cropDir, 'ECMWF_GFS_midRH_day1_anim_', 'ECMWF_GFS_midRH_day1.gif')
-
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'ECMWF_midRH_anim_day2' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'GFS_midRH_anim_day2' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'ECMWF_GFS_midRH_day2_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
-
-      animationSteps(cropDir, 'ECMWF_GFS_midRH_day2_anim_', 'ECMWF_GFS_midRH_day2.gif')
-
-
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'ECMWF_midRH_anim_day3' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'GFS_midRH_anim_day3' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'ECMWF_GFS_midRH_day3_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
-
-      animationSteps(cropDir, 'ECMWF_GFS_midRH_day3_anim_', 'ECMWF_GFS_midRH_day3.gif')
-
-      print('... ECMWF & GFS precipitation')
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'ECMWF_mslp_pcpn_anim_day1' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'GFS_mslp_pcpn_anim_day1' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'ECMWF_GFS_mslp_pcpn_day1_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
-
-      animationSteps(cropDir, 'ECMWF_GFS_mslp_pcpn_day1_anim_', 'ECMWF_GFS_mslp_pcpn_day1.gif')
-
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'ECMWF_mslp_pcpn_anim_day2' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'GFS_mslp_pcpn_anim_day2' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'ECMWF_GFS_mslp_pcpn_day2_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
-
-      animationSteps(cropDir, 'ECMWF_GFS_mslp_pcpn_day2_anim_', 'ECMWF_GFS_mslp_pcpn_day2.gif')
-
-
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'ECMWF_mslp_pcpn_anim_day3' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'GFS_mslp_pcpn_anim_day3' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'ECMWF_GFS_mslp_pcpn_day3_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
-
-      animationSteps(cropDir, 'ECMWF_GFS_mslp_pcpn_day3_anim_', 'ECMWF_GFS_mslp_pcpn_day3.gif')
-
-
-  if switches['mpas_outlook_day34']:
-      print('... MPAS TPW & precipitation')
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'pw_olr' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'rainr' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'MPAS_outlook_day3_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
+  panels = []
+  for model in [model_4panel_ul, model_4panel_ur, model_4panel_dl, model_4panel_dr]:
+    fls = panelFiles(fileDir, model + '_precip_' + day + '_anim')
+    panels.append(fls[:frames] if len(fls) >= frames else [logo]*frames)
 
+  panel_compositor.animatePanels(panels, 2, 2, os.path.join(fileDir,outName), hold=nDup_frames)
 
-      animationSteps(cropDir, 'MPAS_outlook_day3_anim_', 'MPAS_outlook_day3.gif')
+  return
 
-  if switches['uwincm_clouds_animation'] and switches['uwincm_precipitation_animation']:
 
-    if model_day1:
-      print('... UWINCM TPW and OLR & precipitation - model day 1.')
+def run(state=None, jobs=nJobs, workspace=None):
+  """
+  run(state, jobs, workspace)
 
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'uwincm_clouds_day1_anim' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'uwincm_precip_day1_anim' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'uwincm_joint_clouds_precipitation_day1_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
+  Crops and marks up the images downloaded to ./figs/, joins them into the slide animations, and copies the final images to ./figs_final/ (of the workspace).
 
+  Parameters:
+  - state: run_state.RunState returned by the download stage (None to read ./figs/.run_state.json)
+  - jobs: number of worker processes for the frames
+  - workspace: workspace.Workspace of the run (None for ./figs*/ of the working directory)
+  """
 
-      animationSteps(cropDir, 'uwincm_joint_clouds_precipitation_day1_anim_', 'joint_clouds_precipitation_day1_movie.gif')
+  if workspace is None:
+    workspace = run_workspace.Workspace.inPlace()
+  saveDir = workspace.saveDir
+  cropDir = workspace.cropDir
+  finDir = workspace.finDir
 
-    if model_day2:
-      print('... UWINCM TPW and OLR & precipitation - model day 2.')
+  if clearDirectory:
+    print('Removing existing files.')
+    existing_files = [el for el in sorted(os.listdir(cropDir)) if 'logo_cpexcv.png' not in el]
+    for fl in existing_files:
+      os.remove( os.path.join(cropDir,fl) )
 
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'uwincm_clouds_day2_anim' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'uwincm_precip_day2_anim' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'uwincm_joint_clouds_precipitation_day2_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
+    print('Copying over CPEX-CV logo.')
+    fls = os.listdir(saveDir)
+    image_engine.save(image_engine.trim(image_engine.load(os.path.join(saveDir,'logo_cpexcv.png'))), os.path.join(cropDir,'logo_cpexcv.png'))
+    shutil.copyfile(os.path.join(cropDir,'logo_cpexcv.png'), os.path.join(finDir,'logo_cpexcv.png'))
+    print('Removing existing files complete.')
 
 
-      animationSteps(cropDir, 'uwincm_joint_clouds_precipitation_day2_anim_', 'joint_clouds_precipitation_day2_movie.gif')
+  print('Copying over CPEX-CV logo.')
+  fls = os.listdir(saveDir)
+  image_engine.save(image_engine.trim(image_engine.load(os.path.join(saveDir,'logo_cpexcv.png'))), os.path.join(cropDir,'logo_cpexcv.png'))
+  shutil.copyfile(os.path.join(cropDir,'logo_cpexcv.png'), os.path.join(finDir,'logo_cpexcv.png'))
 
-  if switches['UTAH_website']:
+  print('')
+  print('')
+  print('')
+  print('')
+  print('')
 
-    if model_day1:
-      print('... UTAH TPW and OLR & precipitation - model day 1.')
 
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'uutah_clouds_day1_anim' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'uutah_precip_day1_anim' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'uutah_joint_clouds_precipitation_day1_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-      else:
-        print('... ... The numbers of images for fields do not match.')
+  if state is None:
+    print("Reading the download results from " + workspace.stateFile)
+    state = run_state.load(workspace.stateFile)
+    print("Reading the download results complete.")
+  switches = state.switches()
 
 
-      animationSteps(cropDir, 'uutah_joint_clouds_precipitation_day1_anim_', 'joint_clouds_precipitation_day1_movie.gif')
+  print('')
+  print('')
+  print('')
+  print('')
+  print('')
 
-    if model_day2:
-      print('... UTAH TPW and OLR & precipitation - model day 2.')
+  if processImages:
+    print('Processing images (' + str(jobs) + ' processes).')
+    image_engine.startPool(jobs)
 
-      fls_left = sorted([el for el in os.listdir(cropDir) if 'uutah_clouds_day2_anim' in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if 'uutah_precip_day2_anim' in el])
-      if len(fls_left) <= len(fls_right):
-        for num, fl in enumerate(fls_left):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'uutah_joint_clouds_precipitation_day2_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
+    # the crop, markers and labels of every product are listed in product_recipes.py
+    for step in product_recipes.steps:
+      if product_recipes.isOn(step, switches):
+        # one odd image (e.g. a crop outside of it) only loses its product, as with the tasks of the scheduler
+        try:
+          product_recipes.runStep(step, saveDir, cropDir, skipUpToDate=not reprocessAll)
+        except Exception as err:
+          print('... ... crop:' + step.name + ' failed: ' + str(err))
+
+    image_engine.closePool()
+    print('Processing images complete.')
+
+  print('')
+  print('')
+  print('')
+  print('')
+  print('')
+
+
+
+  if joinSlideAnimations:
+    print('Creating joint animations.')
+
+    if switches['ECMWF_prediction'] and switches['GFS_prediction']:
+        print('... ECMWF & GFS midRH')
+        jointAnimation(cropDir, 'ECMWF_midRH_anim_day1', 'GFS_midRH_anim_day1', 'ECMWF_GFS_midRH_day1.gif')
+        jointAnimation(cropDir, 'ECMWF_midRH_anim_day2', 'GFS_midRH_anim_day2', 'ECMWF_GFS_midRH_day2.gif')
+        jointAnimation(cropDir, 'ECMWF_midRH_anim_day3', 'GFS_midRH_anim_day3', 'ECMWF_GFS_midRH_day3.gif')
+
+        print('... ECMWF & GFS precipitation')
+        jointAnimation(cropDir, 'ECMWF_mslp_pcpn_anim_day1', 'GFS_mslp_pcpn_anim_day1', 'ECMWF_GFS_mslp_pcpn_day1.gif')
+        jointAnimation(cropDir, 'ECMWF_mslp_pcpn_anim_day2', 'GFS_mslp_pcpn_anim_day2', 'ECMWF_GFS_mslp_pcpn_day2.gif')
+        jointAnimation(cropDir, 'ECMWF_mslp_pcpn_anim_day3', 'GFS_mslp_pcpn_anim_day3', 'ECMWF_GFS_mslp_pcpn_day3.gif')
+
+
+    if switches['mpas_outlook_day34']:
+        print('... MPAS TPW & precipitation')
+        jointAnimation(cropDir, 'pw_olr', 'rainr', 'MPAS_outlook_day3.gif')
+
+    if switches['uwincm_clouds_animation'] and switches['uwincm_precipitation_animation']:
+
+      if model_day1:
+        print('... UWINCM TPW and OLR & precipitation - model day 1.')
+        jointAnimation(cropDir, 'uwincm_clouds_day1_anim', 'uwincm_precip_day1_anim', 'joint_clouds_precipitation_day1_movie.gif')
+
+      if model_day2:
+        print('... UWINCM TPW and OLR & precipitation - model day 2.')
+        jointAnimation(cropDir, 'uwincm_clouds_day2_anim', 'uwincm_precip_day2_anim', 'joint_clouds_precipitation_day2_movie.gif')
+
+    if switches['UTAH_website']:
+
+      if model_day1:
+        print('... UTAH TPW and OLR & precipitation - model day 1.')
+        jointAnimation(cropDir, 'uutah_clouds_day1_anim', 'uutah_precip_day1_anim', 'joint_clouds_precipitation_day1_movie.gif')
+
+      if model_day2:
+        print('... UTAH TPW and OLR & precipitation - model day 2.')
+        jointAnimation(cropDir, 'uutah_clouds_day2_anim', 'uutah_precip_day2_anim', 'joint_clouds_precipitation_day2_movie.gif')
+
+
+    print('Creating joint animations complete.')
+
+    if switches['model_4panel']:
+      # a model with fewer than 12 frames is shown as the logo in the middle of a white 780x400 panel
+      logo = panel_compositor.centered(image_engine.load(os.path.join(cropDir,'logo_cpexcv.png')), (780, 400))
+
+      fourPanelAnimation(cropDir, 'day1', logo, 'Four_model_joint_movie_day1.gif')
+      fourPanelAnimation(cropDir, 'day2', logo, 'Four_model_joint_movie_day2.gif')
+
+    animation_writer.summary()
+
+
+  print('')
+  print('')
+  print('')
+  print('')
+  print('')
+
+  if moveFinalImages:
+    print('Moving final images and animations to ./figs_final.')
+
+
+    list_of_images = ['logo_cpexcv.png',
+                      'NHC_surface_analysis.png',
+                      'MIMIC-TPW_latest.png',
+                      'SAL_dryAir_split.jpg',
+                      'AEW_Brammer.jpg',
+                      'Goes16_Meteosat11_IRC.png',
+                      'NHC_2day_outlook.png',
+                      'NHC_5day_outlook.png',
+                      'GEOS_dust_aot_day1.png',
+                      'GEOS_total_aot_day1.png',
+                      'GEOS_dust_aot_day1_vert_15N.png',
+                      'GEOS_dust_aot_day1_vert_20W.png',
+                      'GEOS_dust_aot_day2.png',
+                      'GEOS_total_aot_day2.png',
+                      'GEOS_dust_aot_day2_vert_15N.png',
+                      'GEOS_dust_aot_day2_vert_20W.png',
+                      'GEOS_total_aot_day3.png',
+                      'GEOS_total_aot_day4.png',
+                      'ECMWF_GFS_midRH_day1.gif',
+                      'ECMWF_GFS_midRH_day2.gif',
+                      'ECMWF_GFS_midRH_day3.gif',
+                      'ECMWF_GFS_mslp_pcpn_day1.gif',
+                      'joint_clouds_precipitation_day1_movie.gif',
+                      'Four_model_joint_movie_day1.gif',
+                      'ECMWF_GFS_mslp_pcpn_day2.gif',
+                      'joint_clouds_precipitation_day2_movie.gif',
+                      'Four_model_joint_movie_day2.gif',
+                      'ECMWF_GFS_mslp_pcpn_day3.gif',
+                      'MPAS_outlook_day3.gif'
+                      ]
+
+      # additional images, when they become available:
+      # 'AEW_Brammer.jpg'
+
+    # the animations are written as .gif, .mp4 or .webp (animation_writer.animation_format)
+    list_of_images = [animation_writer.outputName(fl) if fl.endswith('.gif') else fl for fl in list_of_images]
+    for fl in list_of_images:
+      if os.path.isfile(os.path.join(cropDir,fl)):
+        shutil.copyfile(os.path.join(cropDir,fl), os.path.join(finDir,fl))
       else:
-        print('... ... The numbers of images for fields do not match.')
-
-
-      animationSteps(cropDir, 'uutah_joint_clouds_precipitation_day2_anim_', 'joint_clouds_precipitation_day2_movie.gif')
-
-
-  print('Creating joint animations complete.')
-
-#convert -size 500x500 xc:white canvas.png
-#convert canvas.png in.png -geometry +200+200 -composite out.png
-
-  if switches['model_4panel']:
-    cmd = ['convert -size 780x400 xc:white', os.path.join(cropDir,'logo_cpexcv.png'), '-gravity center -composite', os.path.join(cropDir,'logo_cpexcv_cp.png')]
-    os.system(' '.join(cmd))
-    for num in range(12):
-        cmd = ['cp', os.path.join(cropDir,'logo_cpexcv_cp.png'), os.path.join(cropDir,'logo_cpexcv_anim_'+'{:02d}'.format(num)+'.png')]
-        os.system(' '.join(cmd))
-
-    if len(sorted([el for el in os.listdir(cropDir) if 'uwincm_precip_day1_anim' in el])) >= 12: model_1 = model_4panel_ul+'_precip_day1_anim'
-    else: model_1 = 'logo_cpexcv_anim_'
-
-    if len(sorted([el for el in os.listdir(cropDir) if 'uutah_precip_day1_anim' in el])) >= 12: model_2 = model_4panel_ur+'_precip_day1_anim'
-    else: model_2 = 'logo_cpexcv_anim_'
-
-    if len(sorted([el for el in os.listdir(cropDir) if 'ucdavis_precip_day1_anim' in el])) >= 12: model_3 = model_4panel_dl+'_precip_day1_anim'
-    else: model_3 = 'logo_cpexcv_anim_'
-
-    if len(sorted([el for el in os.listdir(cropDir) if 'mpas_precip_day1_anim' in el])) >= 12: model_4 = model_4panel_dr+'_precip_day1_anim'
-    else: model_4 = 'logo_cpexcv_anim_'
-
-
-    if 'model_4' in locals():
-      fls_left = sorted([el for el in os.listdir(cropDir) if model_1 in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if model_2 in el])
-
-      for num, fl in enumerate(fls_left[:12]):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'temp1_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-
-      fls_left = sorted([el for el in os.listdir(cropDir) if model_3 in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if model_4 in el])
-
-      for num, fl in enumerate(fls_left[:12]):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'temp2_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-
-      fls_up = sorted([el for el in os.listdir(cropDir) if 'temp1_anim_' in el])
-      fls_down = sorted([el for el in os.listdir(cropDir) if 'temp2_anim_' in el])
-      if len(fls_up) <= len(fls_down):
-          for num, fl in enumerate(fls_up[:12]):
-              cmd = ['convert', '-append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_down[num]), os.path.join(cropDir,'Four_model_joint_anim_day1_' + '{:02d}'.format(num) + '.jpg')]
-              os.system(' '.join(cmd))
+        print('... ... ' + fl + ' not present and cannot be copied over.')
 
-      animationSteps(cropDir, 'Four_model_joint_anim_day1_', 'Four_model_joint_movie_day1.gif')
 
-    if len(sorted([el for el in os.listdir(cropDir) if 'uwincm_precip_day2_anim' in el])) >= 12: model_1 = model_4panel_ul+'_precip_day2_anim'
-    else: model_1 = 'logo_cpexcv_anim_'
+    print('Moving final images and animations complete.')
+
+
+    rename_of_images = ['logo_cpexcv.png',
+                      '03_NHC_surface_analysis.png',
+                      '04_MIMIC-TPW_latest.png',
+                      '04_SAL_dryAir_split.jpg',
+                      '04_AEW_Brammer.jpg',
+                      '04_Goes16_Meteosat11_IRC.png',
+                      '05_NHC_2day_outlook.png',
+                      '05_NHC_5day_outlook.png',
+                      '06_GEOS_dust_aot_day1.png',
+                      '06_GEOS_total_aot_day1.png',
+                      '06_GEOS_dust_aot_day1_vert_15N.png',
+                      '06_GEOS_dust_aot_day1_vert_20W.png',
+                      '07_GEOS_dust_aot_day2.png',
+                      '07_GEOS_total_aot_day2.png',
+                      '07_GEOS_dust_aot_day2_vert_15N.png',
+                      '07_GEOS_dust_aot_day2_vert_20W.png',
+                      '08_GEOS_total_aot_day3.png',
+                      '08_GEOS_total_aot_day4.png',
+                      '10_ECMWF_GFS_midRH_day1.gif',
+                      '11_ECMWF_GFS_midRH_day2.gif',
+                      '12_ECMWF_GFS_midRH_day3.gif',
+                      '14_ECMWF_GFS_mslp_pcpn_day1.gif',
+                      '15_joint_clouds_precipitation_day1_movie.gif',
+                      '16_Four_model_joint_day1_movie.gif',
+                      '17_ECMWF_GFS_mslp_pcpn_day2.gif',
+                      '18_joint_clouds_precipitation_day2_movie.gif',
+                      '19_Four_model_joint_day2_movie.gif',
+                      '20_ECMWF_GFS_mslp_pcpn_day3.gif',
+                      '21_MPAS_outlook_day3.gif'
+                      ]
+
+    rename_of_images = [animation_writer.outputName(fl) if fl.endswith('.gif') else fl for fl in rename_of_images]
+    for fl, fl_r in zip(list_of_images, rename_of_images):
+        if os.path.isfile( os.path.join(finDir,fl) ):
+          os.replace(os.path.join(finDir,fl), os.path.join(finDir,fl_r))
+        else:
+          print('... ... ' + fl + ' not present and cannot be copied over.')
+
+    #GEOS_dust_aot.png is used twice in the slide
+    #os.system( 'cp ' + os.path.join(finDir,'04_GEOS_dust_aot.png') + ' ' + os.path.join(finDir,'12_GEOS_dust_aot.png') )
+
+    print('Rename final images and animations complete.')
 
-    if len(sorted([el for el in os.listdir(cropDir) if 'uutah_precip_day2_anim' in el])) >= 12: model_2 = model_4panel_ur+'_precip_day2_anim'
-    else: model_2 = 'logo_cpexcv_anim_'
-
-    if len(sorted([el for el in os.listdir(cropDir) if 'ucdavis_precip_day2_anim' in el])) >= 12: model_3 = model_4panel_dl+'_precip_day2_anim'
-    else: model_3 = 'logo_cpexcv_anim_'
-
-    if len(sorted([el for el in os.listdir(cropDir) if 'mpas_precip_day2_anim' in el])) >= 12: model_4 = model_4panel_dr+'_precip_day2_anim'
-    else: model_4 = 'logo_cpexcv_anim_'
-
-    if 'model_4' in locals():
-      fls_left = sorted([el for el in os.listdir(cropDir) if model_1 in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if model_2 in el])
-
-      for num, fl in enumerate(fls_left[:12]):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'temp1_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-
-      fls_left = sorted([el for el in os.listdir(cropDir) if model_3 in el])
-      fls_right = sorted([el for el in os.listdir(cropDir) if model_4 in el])
-
-      for num, fl in enumerate(fls_left[:12]):
-          cmd = ['convert', '+append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_right[num]), os.path.join(cropDir,'temp2_anim_' + '{:02d}'.format(num) + '.jpg')]
-          os.system(' '.join(cmd))
-
-      fls_up = sorted([el for el in os.listdir(cropDir) if 'temp1_anim' in el])
-      fls_down = sorted([el for el in os.listdir(cropDir) if 'temp2_anim' in el])
-      if len(fls_up) <= len(fls_down):
-          for num, fl in enumerate(fls_up[:12]):
-              cmd = ['convert', '-append', os.path.join(cropDir,fl), os.path.join(cropDir,fls_down[num]), os.path.join(cropDir,'Four_model_joint_anim_day2_' + '{:02d}'.format(num) + '.jpg')]
-              os.system(' '.join(cmd))
-
-      animationSteps(cropDir, 'Four_model_joint_anim_day2_', 'Four_model_joint_movie_day2.gif')
-
-
-  time.sleep(10)
-
-print('')
-print('')
-print('')
-print('')
-print('')
-
-if moveFinalImages:
-  print('Moving final images and animations to ./figs_final.')
-
-
-  list_of_images = ['logo_cpexcv.png',
-                    'NHC_surface_analysis.png',
-                    'MIMIC-TPW_latest.png',
-                    'SAL_dryAir_split.jpg',
-                    'AEW_Brammer.jpg',
-                    'Goes16_Meteosat11_IRC.png',
-                    'NHC_2day_outlook.png',
-                    'NHC_5day_outlook.png',
-                    'GEOS_dust_aot_day1.png',
-                    'GEOS_total_aot_day1.png',
-                    'GEOS_dust_aot_day1_vert_15N.png',
-                    'GEOS_dust_aot_day1_vert_20W.png',
-                    'GEOS_dust_aot_day2.png',
-                    'GEOS_total_aot_day2.png',
-                    'GEOS_dust_aot_day2_vert_15N.png',
-                    'GEOS_dust_aot_day2_vert_20W.png',
-                    'GEOS_total_aot_day3.png',
-                    'GEOS_total_aot_day4.png',
-                    'ECMWF_GFS_midRH_day1.gif',
-                    'ECMWF_GFS_midRH_day2.gif',
-                    'ECMWF_GFS_midRH_day3.gif',
-                    'ECMWF_GFS_mslp_pcpn_day1.gif',
-                    'joint_clouds_precipitation_day1_movie.gif',
-                    'Four_model_joint_movie_day1.gif',
-                    'ECMWF_GFS_mslp_pcpn_day2.gif',
-                    'joint_clouds_precipitation_day2_movie.gif',
-                    'Four_model_joint_movie_day2.gif',
-                    'ECMWF_GFS_mslp_pcpn_day3.gif',
-                    'MPAS_outlook_day3.gif'
-                    ]
-
-    # additional images, when they become available:
-    # 'AEW_Brammer.jpg'
-
-  for fl in list_of_images:
-    if os.path.isfile(os.path.join(cropDir,fl)):
-      os.system('cp ' + os.path.join(cropDir,fl) + ' ' + os.path.join(finDir,fl))
-    else:
-      print('... ... ' + fl + ' not present and cannot be copied over.')
-
-
-  print('Moving final images and animations complete.')
-  time.sleep(10)
-
-
-  rename_of_images = ['logo_cpexcv.png',
-                    '03_NHC_surface_analysis.png',
-                    '04_MIMIC-TPW_latest.png',
-                    '04_SAL_dryAir_split.jpg',
-                    '04_AEW_Brammer.jpg',
-                    '04_Goes16_Meteosat11_IRC.png',
-                    '05_NHC_2day_outlook.png',
-                    '05_NHC_5day_outlook.png',
-                    '06_GEOS_dust_aot_day1.png',
-                    '06_GEOS_total_aot_day1.png',
-                    '06_GEOS_dust_aot_day1_vert_15N.png',
-                    '06_GEOS_dust_aot_day1_vert_20W.png',
-                    '07_GEOS_dust_aot_day2.png',
-                    '07_GEOS_total_aot_day2.png',
-                    '07_GEOS_dust_aot_day2_vert_15N.png',
-                    '07_GEOS_dust_aot_day2_vert_20W.png',
-                    '08_GEOS_total_aot_day3.png',
-                    '08_GEOS_total_aot_day4.png',
-                    '10_ECMWF_GFS_midRH_day1.gif',
-                    '11_ECMWF_GFS_midRH_day2.gif',
-                    '12_ECMWF_GFS_midRH_day3.gif',
-                    '14_ECMWF_GFS_mslp_pcpn_day1.gif',
-                    '15_joint_clouds_precipitation_day1_movie.gif',
-                    '16_Four_model_joint_day1_movie.gif',
-                    '17_ECMWF_GFS_mslp_pcpn_day2.gif',
-                    '18_joint_clouds_precipitation_day2_movie.gif',
-                    '19_Four_model_joint_day2_movie.gif',
-                    '20_ECMWF_GFS_mslp_pcpn_day3.gif',
-                    '21_MPAS_outlook_day3.gif'
-                    ]
-
-  for fl, fl_r in zip(list_of_images, rename_of_images):
-      if os.path.isfile( os.path.join(finDir,fl) ):
-        os.system('mv ' + os.path.join(finDir,fl) + ' ' + os.path.join(finDir,fl_r) )
-      else:
-        print('... ... ' + fl + ' not present and cannot be copied over.')
+  return
 
-  #GEOS_dust_aot.png is used twice in the slide
-  #os.system( 'cp ' + os.path.join(finDir,'04_GEOS_dust_aot.png') + ' ' + os.path.join(finDir,'12_GEOS_dust_aot.png') )
 
-  print('Rename final images and animations complete.')
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(prog='python ./supplementary/crop_edit_daily_images.py', description='crop and process the downloaded images')
+  parser.add_argument('--jobs', type=int, default=nJobs, help='worker processes for the frames (default: one per core)')
+  args = parser.parse_args()
+  run(jobs=args.jobs)
@@ -0,0 +1,195 @@
+"""
+This module keeps a copy of every downloaded image on disk (./download_cache/), so an image that has not changed
+on the website is not downloaded again.
+
+For every url, the cache remembers the ETag and Last-Modified headers of the last download. The next request sends
+them back (If-None-Match / If-Modified-Since). If the website answers 304 Not Modified, the cached copy is
+hardlinked into ./figs/ instead. When the cache grows over its size limit, the least recently used images are removed.
+
+Files linked into ./figs/ share their data with the cache, so they should be replaced, never edited in place.
+
+Several runs can share the cache (e.g. the main and model_4panel runs, the days of a backfill): each one merges its
+index into the one on disk when it closes the cache, one run at a time (./download_cache/.index.lock).
+
+Required packages: contextlib, hashlib, json, os, shutil, threading, time, requests.
+"""
+
+
+from contextlib import suppress
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import file_lock
+import http_session
+import requests
+
+
+cacheDir = os.path.join('.','download_cache')
+max_cache_mb = 1024
+
+index = {}
+lock = threading.Lock()
+stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'bytes_downloaded': 0}
+
+
+def openCache(directory=cacheDir, maxMb=max_cache_mb):
+  """
+  openCache(directory, maxMb)
+
+  Reads the cache index. Has to be called before fetch().
+
+  Parameters:
+  - directory: where the cached images and index.json are kept
+  - maxMb: size limit of the cache, in MB
+  """
+
+  global cacheDir, max_cache_mb, index
+  cacheDir = directory
+  max_cache_mb = maxMb
+  if not os.path.isdir(cacheDir):
+    os.makedirs(cacheDir)
+
+  # forget entries whose image was removed by hand
+  index = {key: entry for key, entry in readIndex().items() if os.path.isfile(os.path.join(cacheDir,key))}
+
+  return
+
+
+def readIndex():
+  """
+  readIndex()
+
+  Returns the cache index written on disk (an empty one if there is none).
+  """
+
+  if not os.path.isfile(os.path.join(cacheDir,'index.json')):
+    return {}
+  try:
+    with open(os.path.join(cacheDir,'index.json'), 'r') as fl:
+      return json.load(fl)
+  except ValueError:
+    print('... ... Download cache index is damaged, starting a new one.')
+    return {}
+
+
+def linkFile(source, imageName):
+  """
+  linkFile(source, imageName)
+
+  Puts the file at source under imageName, as a hardlink if possible and as a copy otherwise.
+
+  Parameters:
+  - source: the complete path and name of the cached image
+  - imageName: the complete path and name of the saved image (e.g. ./saveDir/imagename...)
+  """
+
+  if os.path.lexists(imageName):
+    os.remove(imageName)
+  try:
+    os.link(source, imageName)
+  except OSError:
+    shutil.copyfile(source, imageName)
+
+  return
+
+
+def fetch(imageUrl, imageName, timeout=None):
+  """
+  fetch(imageUrl, imageName, timeout)
+
+  Downloads the image (with a conditional GET when it is already cached) through the shared HTTP session
+  (http_session.py) and saves it at imageName. Raises requests.HTTPError when the image is not available, and
+  http_session.NotAnImage when the website did not send an image.
+
+  Parameters:
+  - imageUrl: the url of the image attempting to download (e.g. https:// ...)
+  - imageName: the complete path and name of the saved image (e.g. ./saveDir/imagename...)
+  - timeout: seconds to wait for the website (None waits forever)
+  - checksum: returned sha256 hex digest of the image
+  """
+
+  key = hashlib.sha1(imageUrl.encode('utf8')).hexdigest()
+  cachedName = os.path.join(cacheDir,key)
+
+  with lock:
+    entry = dict(index.get(key, {}))
+
+  headers = {}
+  if entry and os.path.isfile(cachedName):
+    if entry.get('etag'):
+      headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+      headers['If-Modified-Since'] = entry['last_modified']
+
+  response = http_session.get(imageUrl, headers=headers, timeout=timeout, stream=True)
+  if response.status_code == 304 and headers:
+    response.close()
+    try:
+      linkFile(cachedName, imageName)
+    except FileNotFoundError:
+      # removed by another run closing the cache meanwhile: downloaded again
+      with lock:
+        index.pop(key, None)
+      return fetch(imageUrl, imageName, timeout)
+    with lock:
+      index[key]['used'] = time.time()
+      stats['hits'] += 1
+      stats['bytes_saved'] += entry['size']
+    return entry.get('sha256')
+
+  if response.status_code >= 300:
+    response.close()
+    raise requests.HTTPError(str(response.status_code) + ' for url: ' + imageUrl, response=response)
+
+  size, checksum = http_session.saveResponse(response, cachedName)
+  linkFile(cachedName, imageName)
+
+  with lock:
+    index[key] = {'url': imageUrl,
+                  'etag': response.headers.get('ETag'),
+                  'last_modified': response.headers.get('Last-Modified'),
+                  'size': size,
+                  'sha256': checksum,
+                  'used': time.time()}
+    stats['misses'] += 1
+    stats['bytes_downloaded'] += size
+
+  return checksum
+
+
+def closeCache():
+  """
+  closeCache()
+
+  Merges the index with the one on disk (written by the other runs since openCache), removes the least recently
+  used images until the cache is under its size limit, writes the index and prints how much was not downloaded again.
+  """
+
+  with lock, file_lock.FileLock(os.path.join(cacheDir,'.index.lock'), 'download cache'):
+    for key, entry in readIndex().items():
+      if key not in index or entry.get('used', 0) > index[key].get('used', 0):
+        index[key] = entry
+    for key in [key for key in index if not os.path.isfile(os.path.join(cacheDir,key))]:
+      del index[key]
+
+    total = sum(entry['size'] for entry in index.values())
+    for key in sorted(index, key=lambda key: index[key]['used']):
+      if total <= max_cache_mb*1024*1024:
+        break
+      total -= index[key]['size']
+      with suppress(FileNotFoundError):
+        os.remove(os.path.join(cacheDir,key))
+      del index[key]
+
+    tempName = os.path.join(cacheDir,'index.json.part' + str(os.getpid()))
+    with open(tempName, 'w') as fl:
+      json.dump(index, fl)
+    os.replace(tempName, os.path.join(cacheDir,'index.json'))
+
+  print('... Download cache: ' + str(stats['hits']) + ' images unchanged since the last run, ' + '{:.1f}'.format(stats['bytes_saved']/1024/1024) + ' MB not downloaded again (' + '{:.1f}'.format(total/1024/1024) + ' MB in cache).')
+
+  return
@@ -11,7 +11,7 @@ swu@ou.edu
 
 This program is used to retrieve images for the CPEX-AW and CPEX-CV field campaign forecasting template.
 
-Required packages: datetime, numpy, os, subprocess, requests, bs4, urllib.
+Required packages: argparse, datetime, json, os, shutil, requests, threading, PIL.
 
 
 Updates:
@@ -29,701 +29,308 @@ Updates:
  - 2022-09-01: Askos dust download
  - 2022-09-11: Revised to objective oriented presentation
  - 2022-09-17: Changed to a night shift template
+ - 2026-10-17: Images are queued and downloaded all at once (download_engine.py), a few at a time per website
+ - 2026-10-17: The urls, valid times and file names of every image moved to product_catalog.json (read by product_catalog.py)
+ - 2026-10-17: Downloads go through an on-disk cache (download_cache.py), unchanged images are not downloaded again
+ - 2026-10-17: All requests (images and NASA GEOS pages) share one keep-alive HTTP session (http_session.py)
+ - 2026-10-17: Connect/read timeouts, retries with backoff, and skipping websites that keep failing (download_policy.py)
+ - 2026-10-17: NASA GEOS pages are read at the same time and only up to the image tag, found image urls are cached (geos_pages.py)
+ - 2026-10-17: Images are written to a temporary file and renamed once complete; truncated downloads and HTML pages are never left in ./figs/
+ - 2026-10-17: Completed images are written to ./figs/.download_manifest.jsonl; with --resume only the missing ones are fetched (download_manifest.py)
+ - 2026-10-17: Products are cropped (product_recipes.py) as soon as their images are downloaded, scheduled by scheduler.py
+ - 2026-10-17: The steps are in run(switches, resume), called by cpexcv.py (which gets the switches for the next stages back), or when the script is run
+ - 2026-10-17: switches_process.txt is replaced by a run_state.RunState (images and checksums of each product), returned in memory or saved to ./figs/.run_state.json
+ - 2026-10-17: run(day=...) downloads a past forecast day (python -m cpexcv run --date YYYY-MM-DD, or cpexcv backfill for a range of days)
+ - 2026-10-17: run(workspace=...) downloads into the workspace of the run (workspace.py), so several runs can download at the same time
+ - 2026-10-17: For a past day, the products whose url has no date (latest images only) are not downloaded, so they are not archived under that day
 """
 
 
-from datetime import datetime, timedelta
-import numpy as np
+import argparse
+from datetime import datetime
 import os
+import shutil
+
+import download_cache
+import download_engine
+import download_manifest
+import download_policy
+import geos_pages
+import http_session
+import image_engine
+import product_catalog
+import product_recipes
 import requests
-import subprocess
-import time
+import run_state
+import scheduler
+import switch_files
+import workspace as run_workspace
 
-from bs4 import BeautifulSoup
-from urllib import request, error
-import ssl
-ssl._create_default_https_context = ssl._create_unverified_context
-#(ssl package is for ICAP aerosol downlaod)
 
-
-readSwitches = True
 downloadImages = True
+useCache = True # conditional GET with the images kept in ./download_cache/
+processWhileDownloading = True # crop each product (product_recipes.py) as soon as its images are downloaded
+http_session.verify_ssl = False # (for ICAP aerosol downlaod)
 
-model_day1 = model_day2 = True
-
-utah_ini_time = '00'
-#utah_ini_time = '12'
-
-forecastDir = os.getcwd()
-saveDir = os.path.join('.','figs')
-cropDir = os.path.join('.','figs_cropped')
-finDir  = os.path.join('.','figs_final')
-
-
-today = datetime.today()
-#today = datetime.strptime('2022-08-26', '%Y-%m-%d')
-today = today.replace(hour=0, minute=0, second=0, microsecond=0)
-today_m = today - timedelta(days=1)
-yesterday = today - timedelta(days=1)
-forecast_day1 = today + timedelta(days=1)
-forecast_day2 = today + timedelta(days=2)
-nFrames_uwincm = 12
-still_image_forecast_hr = 16
-dust_xLon = 15 # 15 degrees N
-dust_xLat = 20 # 20 degrees W
-nDup_frames = 3
+geos_img_url_pattern = '/missions/static//plots/'
 
-count_good_links = 0
-count_bad_links = 0
 
-pwd = os.getcwd()
-
-cmd = ['cp', os.path.join(forecastDir,'logo_cpexcv.png'), os.path.join(saveDir,'.')]
-os.system(' '.join(cmd))
-
-
-def downloadLink(imageUrl, imageName):
+def downloadLink(imageUrl, imageName, job=None):
   """
-  downloadLink (imageUrl, imageName)
+  downloadLink (imageUrl, imageName, job)
 
   Will attempt to download the image located at imageUrl and save it at the provided imageName. If the image is not available, it will print out the message, and set a working variable to davis, to avoid further processing.
 
   Parameters:
   - imageUrl: the url of the image attempting to download (e.g. https:// ...)
   - imageName: the complete path and name of the saved image (e.g. ./saveDir/imagename...)
+  - job: product_catalog.DownloadJob written to the download manifest once the image is saved (None to not write it)
   - working: returned Boolean that will determine if further processing should be done
   """
+  if not imageUrl:
+    print('... ... Image url could not be found.')
+    return False
+
   try:
-    request.urlretrieve(imageUrl, imageName)
+    if useCache:
+      checksum = download_policy.call(imageUrl, download_cache.fetch, imageUrl, imageName)
+    else:
+      _, checksum = download_policy.call(imageUrl, http_session.download, imageUrl, imageName)
     working = True
-  except error.HTTPError:
+    # images with a post step are written to the manifest once the step is done
+    if job is not None and job.post is None:
+      download_manifest.record(job, checksum)
+  except download_policy.HostDown:
+    print('... ... Website not responding, skipped ' + os.path.basename(imageName) + '.')
+    working = False
+  except requests.HTTPError:
     print('... ... Image currently not available.')
     working = False
+  except http_session.NotAnImage:
+    print('... ... Website sent a page instead of the image, skipped ' + os.path.basename(imageName) + '.')
+    working = False
+  except requests.RequestException as err:
+    print('... ... Download failed (' + type(err).__name__ + '): ' + os.path.basename(imageName))
+    working = False
 
   return working
 
-def write_switch(switch_name, status, fl):
+
+def coalesce_png(imageName):
   """
-  write_switch(switch_name, status, fl)
+  coalesce_png(imageName)
 
-  Based on what files this script is able to download, it writes the True/False switches for the cropping script.
+  Converts the downloaded .gif image to a .png image with the same name.
 
   Parameters:
-  - switch_name: name of the switch (e.g. nhc_analysis)
-  - status: a list of true/false values on whether it was able to download
-  - fl: open file to write into.
+  - imageName: the complete path and name of the .gif image
   """
 
-  if sum(status) > 0:
-    fl.write(switch_name + ' = True \n')
-  elif sum(status) == 0:
-    fl.write(switch_name + ' = False \n')
-
+  print('    ... Converting .gif image to .png image.')
+  cmd = ['convert -coalesce ' + imageName + ' ' + imageName[:-4] + '.png']
+  os.system(cmd[0])
 
   return
 
 
+def mimic_latest(imageName):
+  """
+  mimic_latest(imageName)
 
+  Converts the MIMIC-TPW .gif animation to a .png sequence of images, and copies the latest one to MIMIC-TPW_latest.png.
 
-if readSwitches:
-  print("Reading True/False switches from switches_download.txt")
-  if 'supplementary' in pwd:
-    fl = open(os.path.join('.','switches_download.txt'), 'r')
-  else:
-    fl = open(os.path.join(forecastDir, 'supplementary','switches_download.txt'), 'r')
-  data = fl.readlines()
-  fl.close()
-  data = [line.rstrip() for line in data]
-
-  switches = {}
-  for line in data:
-    if len(line) > 0:
-      switch_name, switch_setting = line.split(' = ')
-
-      if switch_setting == 'True':
-        switches[switch_name] = True
-      elif switch_setting == 'False':
-        switches[switch_name] = False
-
-  if 'supplementary' in pwd:
-    fl_switch = open(os.path.join('.','switches_process.txt'), 'w')
-  else:
-    fl_switch = open(os.path.join(forecastDir, 'supplementary','switches_process.txt'), 'w')
-
-
-  print("Reading True/False switches complete.")
-
-
-print('')
-print('')
-print('')
-print('')
-print('')
-
-
-
-
-if downloadImages:
-  print("Downloading images for today's forecast.")
+  Parameters:
+  - imageName: the complete path and name of the .gif animation
+  """
 
-  # NHC Analysis and Tropical Weather Outlook
-  if switches['nhc_analysis']:
-    print('... Downloading NHC surface analysis.')
-    status = []
+  print('    ... Converting .gif animation to .png sequence of images.')
+  cmd = ['convert -coalesce ' + imageName + ' ' + imageName[:-4] + '.png']
+  os.system(cmd[0])
 
-    url = 'https://www.nhc.noaa.gov/tafb_latest/USA_latest.gif'
-    dl = downloadLink(url, os.path.join(saveDir,'NHC_surface_analysis.gif'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
+  print('    ... Finding the latest image and setting it to _latest.')
+  saveDir = os.path.dirname(imageName)
+  fls = [fl for fl in os.listdir(saveDir) if 'MIMIC-TPW' in fl and '.png' in fl]
+  fls = [fl for fl in fls if 'MIMIC-TPW_24h_animation' in fl]
+  frame_number = [int(fl.split('-')[-1][:-4]) for fl in fls]
+  latest_frame = fls[0][:24] + str(max(frame_number)) + '.png'
+  cmd = ['cp', os.path.join(saveDir,latest_frame), os.path.join(saveDir,'MIMIC-TPW_latest.png')]
+  os.system(' '.join(cmd))
 
-    if dl:
-      print('    ... Converting .gif image to .png image.')
-      cmd = ['convert -coalesce ' + os.path.join(saveDir,'NHC_surface_analysis.gif') + ' ' + os.path.join(saveDir,'NHC_surface_analysis.png')]
-      os.system(cmd[0])
+  return
 
-    print('... Downloading NHC tropical weather 2-day outlook.')
 
-    url = 'https://www.nhc.noaa.gov/xgtwo/two_atl_2d0.png'
-    dl = downloadLink(url, os.path.join(saveDir,'NHC_2day_outlook.png'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
+post_steps = {'coalesce_png': coalesce_png,
+              'mimic_latest': mimic_latest}
 
-    print('... Downloading NHC tropical weather 5-day outlook.')
 
-    url = 'https://www.nhc.noaa.gov/xgtwo/two_atl_5d0.png'
-    dl = downloadLink(url, os.path.join(saveDir,'NHC_5day_outlook.png'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
+def fetchJob(job):
+  """
+  fetchJob(job)
 
-    write_switch('nhc_analysis', status, fl_switch)
+  Downloads the image of a job, trying its other urls (fallbacks) if it is not available, then runs its post step.
 
-  # MIMIC-Total Precipitable Water
-  if switches['mimic_tpw']:
-    print('... Downloading MIMIC-TPW total precipitable water animation.')
-    status = []
+  Parameters:
+  - job: product_catalog.DownloadJob
+  - working: returned Boolean, True if the image was downloaded
+  """
 
-    url = 'http://tropic.ssec.wisc.edu/real-time/mtpw2/webAnims/tpw_nrl_colors/natl/mimictpw_natl_latest.gif'
-    dl = downloadLink(url, os.path.join(saveDir,'MIMIC-TPW_24h_animation.gif'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
+  working = downloadLink(job.url, job.fileName, job)
+  for url in job.fallbacks:
+    if working:
+      break
+    print('    ... Trying a different time for the ' + job.title + '.')
+    working = downloadLink(url, job.fileName, job)
 
-    print('    ... Converting .gif animation to .png sequence of images.')
+  if working and job.post is not None:
+    post_steps[job.post](job.fileName)
+    download_manifest.record(job, None)
 
-    if dl:
-      cmd = ['convert -coalesce ' + os.path.join(saveDir,'MIMIC-TPW_24h_animation.gif') + ' ' + os.path.join(saveDir,'MIMIC-TPW_24h_animation.png')]
-      os.system(cmd[0])
+  return working
 
-      print('    ... Finding the latest image and setting it to _latest.')
-      fls = [fl for fl in os.listdir(saveDir) if 'MIMIC-TPW' in fl and '.png' in fl]
-      fls = [fl for fl in fls if 'MIMIC-TPW_24h_animation' in fl]
-      frame_number = [int(fl.split('-')[-1][:-4]) for fl in fls]
-      latest_frame = fls[0][:24] + str(max(frame_number)) + '.png'
-      cmd = ['cp', os.path.join(saveDir,latest_frame), os.path.join(saveDir,'MIMIC-TPW_latest.png')]
-      os.system(' '.join(cmd))
-
-    write_switch('mimic_tpw', status, fl_switch)
-
-  # GOES-16 satellite imagery - Bedka group
-  if switches['GOES16_sat']:
-    print('... Downloading GOES16 visible satellite imagery.')
-    status = []
-
-    url = 'https://satcorps.larc.nasa.gov/prod/exp/cpex-aw-2020/satpng/g16/latest/G16.LATEST.01KM.HVIS.PNG'
-    dl = downloadLink(url, os.path.join(saveDir,'Goes16_VIS.png'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
 
-    print('... Downloading GOES16 RGB satellite imagery.')
-    url = 'https://satcorps.larc.nasa.gov/prod/exp/cpex-aw-2020/satpng/g16/latest/G16.LATEST.02KM.RGB.PNG'
-    dl = downloadLink(url, os.path.join(saveDir,'Goes16_RGB.png'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
-
-    print('... Downloading GOES16 IRC satellite imagery.')
-    url = 'https://satcorps.larc.nasa.gov/prod/exp/cpex-aw-2020/satpng/g16/latest/G16.LATEST.02KM.IRC.PNG'
-    dl = downloadLink(url, os.path.join(saveDir,'Goes16_IRC.png'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
-
-    write_switch('GOES16_sat', status, fl_switch)
-
-  # METEOSAT-11 satellite imagery - Bedka group
-  if switches['meteosat_sat']:
-    print('... Downloading Meteosat-11 visible satellite imagery.')
-    status = []
-
-    url = 'https://satcorps.larc.nasa.gov/prod/exp/cpex-aw-2020/satpng/met/latest/M11.LATEST.03KM.VIS.PNG'
-    dl = downloadLink(url, os.path.join(saveDir,'Meteosat11_VIS.png'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
-
-    print('... Downloading Meteosat-11 IRC satellite imagery.')
-    url = 'https://satcorps.larc.nasa.gov/prod/exp/cpex-aw-2020/satpng/met/latest/M11.LATEST.03KM.IRC.PNG'
-    dl = downloadLink(url, os.path.join(saveDir,'Meteosat11_IRC.png'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
-
-
-    write_switch('meteosat_sat', status, fl_switch)
-
-  # Alan Brammer's tropical wave tracking
-  if switches['brammer_tropical_waves']:
-    print("... Downloading AEW analysis from Alan Brammer's Website")
-    status = []
-
-    init_date = datetime.strptime('2013-01-01', '%Y-%m-%d')
-    time_diff = int(np.ceil((today-init_date).total_seconds()/3600))
-
-
-    url = 'http://www.atmos.albany.edu/student/abrammer/graphics/gfs_realtime/plots/prate_sf_mslp/ea_prate_sf_mslp_' + str(time_diff) + '.0.jpg'
-    dl = downloadLink(url, os.path.join(saveDir,'AEW_Brammer.jpg'))
-    if not dl:
-      time_diff += 6
-      url = 'http://www.atmos.albany.edu/student/abrammer/graphics/gfs_realtime/plots/prate_sf_mslp/ea_prate_sf_mslp_' + str(time_diff) + '.0.jpg'
-      print('    ... Trying a different time.')
-      dl = downloadLink(url, os.path.join(saveDir,'AEW_Brammer.jpg'))
-
-
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
-
-    write_switch('brammer_tropical_waves', status, fl_switch)
-
-  # Saharan Air Layer - Split Window GOES-16
-  if switches['sal_split']:
-    print("... Downloading dry air and dust image from CIMSS (split window).")
-    status = []
-
-    url = 'http://tropic.ssec.wisc.edu/real-time/sal/g16split/g16split.jpg'
-    dl = downloadLink(url, os.path.join(saveDir,'SAL_dryAir_split.jpg'))
-    count_good_links += dl
-    count_bad_links += (1 - dl)
-    status.append(dl)
-
-    write_switch('sal_split', status, fl_switch)
-
-
-  # # # MODEL STUFF NOW - ANIMATIONS
-  if switches['uwincm_clouds_animation']:
-    status = []
-    if model_day1:
-      print("... Downloading UWINCM cloud map - animation - for model day 1.")
-      for frame in range(nFrames_uwincm):
-        url = 'https://orca.atmos.washington.edu/model_images/atl/umcm_wmh/realtime/' + today_m.strftime('%Y%m%d') + '00/ecmwf/storm/pw_olr/pw_olr.storm.' +  (forecast_day1+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y%m%d%H') + '.jpg'
-        dl = downloadLink(url, os.path.join(saveDir,'uwincm_clouds_day1_anim_' + '{:02d}'.format(frame) + '.jpg'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    if model_day2:
-      print("... Downloading UWINCM cloud map - animation - for model day 2.")
-      for frame in range(nFrames_uwincm):
-        url = 'https://orca.atmos.washington.edu/model_images/atl/umcm_wmh/realtime/' + today_m.strftime('%Y%m%d') + '00/ecmwf/storm/pw_olr/pw_olr.storm.' +  (forecast_day2+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y%m%d%H') + '.jpg'
-        dl = downloadLink(url, os.path.join(saveDir,'uwincm_clouds_day2_anim_' + '{:02d}'.format(frame) + '.jpg'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('uwincm_clouds_animation', status, fl_switch)
-
-
-  if switches['uwincm_precipitation_animation']:
-    status = []
-    if model_day1:
-      print("... Downloading UWINCM precipitation map - animation - for model day 1.")
-      for frame in range(nFrames_uwincm):
-        url = 'https://orca.atmos.washington.edu/model_images/atl/umcm_wmh/realtime/' + today_m.strftime('%Y%m%d') + '00/ecmwf/storm/rr_slp/rainr.storm.' +  (forecast_day1+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y%m%d%H') + '.jpg'
-        dl = downloadLink(url, os.path.join(saveDir,'uwincm_precip_day1_anim_' + '{:02d}'.format(frame) + '.jpg'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    if model_day2:
-      print("... Downloading UWINCM precipitation map - animation - for model day 2.")
-      for frame in range(nFrames_uwincm):
-        url = 'https://orca.atmos.washington.edu/model_images/atl/umcm_wmh/realtime/' + today_m.strftime('%Y%m%d') + '00/ecmwf/storm/rr_slp/rainr.storm.' +  (forecast_day2+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y%m%d%H') + '.jpg'
-        dl = downloadLink(url, os.path.join(saveDir,'uwincm_precip_day2_anim_' + '{:02d}'.format(frame) + '.jpg'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('uwincm_precipitation_animation', status, fl_switch)
-
-  if switches['uutah_precipitation_animation']:
-    status = []
-    if model_day1:
-      print("... Downloading UofUtah model precipitation map - animation - for model day 1.")
-      for frame in range(nFrames_uwincm):
-        url = 'https://orca.atmos.washington.edu/model_images/atl/uutah/realtime/' + today_m.strftime('%Y%m%d') + '00/gfs/storm/rr_slp/slp_rain-' +  (forecast_day1+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y-%m-%d_%H:%M:%S') + '_d02.png'
-        dl = downloadLink(url, os.path.join(saveDir,'uutah_precip_day1_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    if model_day2:
-      print("... Downloading UofUtah model precipitation map - animation - for model day 2.")
-      for frame in range(nFrames_uwincm):
-        url = 'https://orca.atmos.washington.edu/model_images/atl/uutah/realtime/' + today_m.strftime('%Y%m%d') + '00/gfs/storm/rr_slp/slp_rain-' +  (forecast_day2+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y-%m-%d_%H:%M:%S') + '_d02.png'
-        dl = downloadLink(url, os.path.join(saveDir,'uutah_precip_day2_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('uutah_precipitation_animation', status, fl_switch)
-
-
-  if switches['ucdavis_precipitation_animation']:
-    status = []
-    if model_day1:
-      print("... Downloading UofDavis model precipitation map - animation - for model day 1.")
-      for frame in range(nFrames_uwincm):
-        url = 'https://orca.atmos.washington.edu/model_images/atl/ucdavis/realtime/' + today_m.strftime('%Y%m%d') + '00/gfs/storm/rr_slp/SLP_Rainrate_' +  today_m.strftime('%Y%m%d') +'12_fcst_'+"{:02d}".format(frame*2+36+1)+'hr.d02.png'
-        dl = downloadLink(url, os.path.join(saveDir,'ucdavis_precip_day1_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    if model_day2:
-      print("... Downloading UofDavis model precipitation map - animation - for model day 2.")
-      for frame in range(nFrames_uwincm):
-        url = 'https://orca.atmos.washington.edu/model_images/atl/ucdavis/realtime/' + today_m.strftime('%Y%m%d') + '00/gfs/storm/rr_slp/SLP_Rainrate_' +  today_m.strftime('%Y%m%d') +'12_fcst_'+"{:02d}".format(frame*2+60+1)+'hr.d02.png'
-        dl = downloadLink(url, os.path.join(saveDir,'ucdavis_precip_day2_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('ucdavis_precipitation_animation', status, fl_switch)
-
-
-  if switches['UTAH_website']:
-      print("... Downloading UofUtah model precipitation map from UTAH website.")
-      status = []
-      vv = 'slp_rain'
-      dd = 'd02'
-      for frame in range(12):
-        url = 'https://home.chpc.utah.edu/~pu/cpexaw/png/' + today_m.strftime('%Y-%m-%d') + '_'+utah_ini_time+'/' + vv + '-' + (forecast_day1+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y-%m-%d_%H:%M:%S') + '_'+dd+'.png'
-        dl = downloadLink(url, os.path.join(saveDir,'uutah_precip_day1_anim_' + '{:02d}'.format(frame) + '.png'))
-        url = 'https://home.chpc.utah.edu/~pu/cpexaw/png/' + today_m.strftime('%Y-%m-%d') + '_'+utah_ini_time+'/' + vv + '-' + (forecast_day2+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y-%m-%d_%H:%M:%S') + '_'+dd+'.png'
-        dl = downloadLink(url, os.path.join(saveDir,'uutah_precip_day2_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-      print("... Downloading UofUtah model clouds map from UTAH website.")
-      status = []
-      vv = 'tpw_olr'
-      dd = 'd02'
-      for frame in range(12):
-        url = 'https://home.chpc.utah.edu/~pu/cpexaw/png/' + today_m.strftime('%Y-%m-%d') + '_'+utah_ini_time+'/' + vv + '-' + (forecast_day1+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y-%m-%d_%H:%M:%S') + '_'+dd+'.png'
-        dl = downloadLink(url, os.path.join(saveDir,'uutah_clouds_day1_anim_' + '{:02d}'.format(frame) + '.png'))
-        url = 'https://home.chpc.utah.edu/~pu/cpexaw/png/' + today_m.strftime('%Y-%m-%d') + '_'+utah_ini_time+'/' + vv + '-' + (forecast_day2+timedelta(hours=1) + timedelta(hours=2*frame)).strftime('%Y-%m-%d_%H:%M:%S') + '_'+dd+'.png'
-        dl = downloadLink(url, os.path.join(saveDir,'uutah_clouds_day2_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-      write_switch('UTAH_website', status, fl_switch)
-
-  if switches['mpas_precipitation']:
-    vv=['rainr']
-    status = []
-    for var in vv:
-      print("... Downloading MPAS model " + var + " map.")
-      for frame in range(12): #57
-        url = 'https://www2.mmm.ucar.edu/projects/real-time-forecasts/img/' + today_m.strftime('%Y%m%d') + '12/UW/cpex_aw.' + var + '.westafrica.init' + today_m.strftime('%Y%m%d') + '12.fcst' + "{:03d}".format(frame*2+36+1) + 'hr.jpg'
-        dl = downloadLink(url, os.path.join(saveDir,'mpas_precip_day1_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-      for frame in range(12):
-        url = 'https://www2.mmm.ucar.edu/projects/real-time-forecasts/img/' + today_m.strftime('%Y%m%d') + '12/UW/cpex_aw.' + var + '.westafrica.init' + today_m.strftime('%Y%m%d') + '12.fcst' + "{:03d}".format(frame*2+60+1) + 'hr.jpg'
-        dl = downloadLink(url, os.path.join(saveDir,'mpas_precip_day2_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('mpas_precipitation', status, fl_switch)
-
-  if switches['mpas_outlook_day34']:
-    vv=['pw_olr','rainr']
-    status = []
-    for var in vv:
-      print("... Downloading MPAS model " + var + " map.")
-      for frame in range(12): #57
-        url = 'https://www2.mmm.ucar.edu/projects/real-time-forecasts/img/' + today_m.strftime('%Y%m%d') + '12/UW/cpex_aw.' + var + '.westafrica.init' + today_m.strftime('%Y%m%d') + '12.fcst' + "{:03d}".format(frame*2+84+1) + 'hr.jpg'
-        dl = downloadLink(url, os.path.join(saveDir,'mpas_' + var + '_day3_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-      for frame in range(6):
-        url = 'https://www2.mmm.ucar.edu/projects/real-time-forecasts/img/' + today_m.strftime('%Y%m%d') + '12/UW/cpex_aw.' + var + '.westafrica.init' + today_m.strftime('%Y%m%d') + '12.fcst' + "{:03d}".format(frame*2+108+1) + 'hr.jpg'
-        dl = downloadLink(url, os.path.join(saveDir,'mpas_' + var + '_day4_anim_' + '{:02d}'.format(frame) + '.png'))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('mpas_outlook_day34', status, fl_switch)
-
-  if switches['ECMWF_prediction']:
-    fig_day1=[]
-    fig_day2=[]
-    fig_day3=[]
-    for num in range(4): #57
-      fig_day1.append('anim_day1_'+"{:02d}".format(num)+'.png')
-      fig_day2.append('anim_day2_'+"{:02d}".format(num)+'.png')
-
-    for num in range(12):
-      fig_day3.append('anim_day3_'+"{:02d}".format(num)+'.png')
-
-    var = ['midRH','mslp_pcpn']
-    for vv in var:
-      print('... Downloading ECMWF from tropical tidbits-',vv)
-      url_base = 'https://www.tropicaltidbits.com/analysis/models/ecmwf/' + (today_m).strftime('%Y%m%d')+'12/ecmwf_'
-      status = []
-    #day 1
-      for frame in range(4):
-        if vv == 'mslp_pcpn':
-            forecast_num = frame*2
-        else:
-            forecast_num = frame*2+1
-        dl = downloadLink(url_base+vv+'_nafr_'+str(forecast_num+12)+'.png', os.path.join(saveDir,'ECMWF_'+vv+'_'+fig_day1[frame]))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    #day 2
-      for frame in range(4):
-        if vv == 'mslp_pcpn':
-            forecast_num = frame*2
-        else:
-            forecast_num = frame*2+1
-        dl = downloadLink(url_base+vv+'_nafr_'+str(forecast_num+20)+'.png', os.path.join(saveDir,'ECMWF_'+vv+'_'+fig_day2[frame]))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    #day 3
-      for frame in range(12):
-        if vv == 'mslp_pcpn':
-            forecast_num = frame*2
-        else:
-            forecast_num = frame*2+1
-        dl = downloadLink(url_base+vv+'_nafr_'+str(forecast_num+28)+'.png', os.path.join(saveDir,'ECMWF_'+vv+'_'+fig_day3[frame]))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('ECMWF_prediction', status, fl_switch)
-
-
-  if switches['GFS_prediction']:
-    fig_day1=[]
-    fig_day2=[]
-    fig_day3=[]
-    for num in range(4):
-      fig_day1.append('anim_day1_'+"{:02d}".format(num)+'.png')
-      fig_day2.append('anim_day2_'+"{:02d}".format(num)+'.png')
-    for num in range(12):
-      fig_day3.append('anim_day3_'+"{:02d}".format(num)+'.png')
-
-    var = ['midRH','mslp_pcpn']
-    for vv in var:
-      print('... Downloading GFS from tropical tidbits-',vv)
-      url_base = 'https://www.tropicaltidbits.com/analysis/models/gfs/' + (today_m).strftime('%Y%m%d')+'12/gfs_'
-      status = []
-    #day 1
-      for frame in range(4):
-        if vv == 'mslp_pcpn':
-            forecast_num = frame
-        else:
-            forecast_num = frame+1
-        dl = downloadLink(url_base+vv+'_nafr_'+str(forecast_num+6)+'.png', os.path.join(saveDir,'GFS_'+vv+'_'+fig_day1[frame]))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    #day 2
-      for frame in range(4):
-        if vv == 'mslp_pcpn':
-            forecast_num = frame
-        else:
-            forecast_num = frame+1
-        dl = downloadLink(url_base+vv+'_nafr_'+str(forecast_num+10)+'.png', os.path.join(saveDir,'GFS_'+vv+'_'+fig_day2[frame]))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    #day 3
-      for frame in range(12):
-        if vv == 'mslp_pcpn':
-            forecast_num = frame
-        else:
-            forecast_num = frame+1
-        dl = downloadLink(url_base+vv+'_nafr_'+str(forecast_num+14)+'.png', os.path.join(saveDir,'GFS_'+vv+'_'+fig_day3[frame]))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('GFS_prediction', status, fl_switch)
-
-
-  # NASA geos dust simulations
-  if switches['nasa_geos']:
-    fInitialTime = today_m.strftime('%Y%m%d') + 'T120000'
-    img_url_pattern = '/missions/static//plots/'
-    req_timeout = 300 #seconds
-
-    #=== Aerosol optical thickness config
-    AOT_tau = ['012', '036', '060'] #Change tau to choose different lead hour
-    AOT_tau_TOD = ['012', '036', '060','084', '108']
-
-    AOT_url_prefix = 'https://fluid.nccs.nasa.gov/missions/chem2d_mission%2BPRDUST/?one_click=1&'
-    AOT_url_suffix = '&stream=G5FPFC&level=0&region=prdust&fcst=' + fInitialTime
-
-    AOT_img_2D_files = ['GEOS_dust_aot.png',
-                        'GEOS_dust_aot_day1.png',
-                        'GEOS_dust_aot_day2.png']
-
-    AOT_img_total_files = ['GEOS_total_aot.png',
-                           'GEOS_total_aot_day1.png',
-                           'GEOS_total_aot_day2.png',
-                           'GEOS_total_aot_day3.png',
-                           'GEOS_total_aot_day4.png']
-
-    AOT_img_lowcf_files = ['GEOS_lowCloudFraction.png',
-                           'GEOS_lowCloudFraction_day1.png',
-                           'GEOS_lowCloudFraction_day2.png']
-
-    AOT_img_midcf_files = ['GEOS_midCloudFraction.png',
-                           'GEOS_midCloudFraction_day1.png',
-                           'GEOS_midCloudFraction_day2.png']
-
-    AOT_img_highcf_files = ['GEOS_highCloudFraction.png',
-                            'GEOS_highCloudFraction_day1.png',
-                            'GEOS_highCloudFraction_day2.png']
-
-    #lon cross section
-    AOT_img_loncs_files = ['GEOS_dust_aot_vert_' + str(dust_xLon) + 'N.png',
-                           'GEOS_dust_aot_day1_vert_' + str(dust_xLon) + 'N.png',
-                           'GEOS_dust_aot_day2_vert_' + str(dust_xLon) + 'N.png']
-
-    #lat cross section
-    AOT_img_latcs_files = ['GEOS_dust_aot_vert_' + str(dust_xLat) + 'W.png',
-                           'GEOS_dust_aot_day1_vert_' + str(dust_xLat) + 'W.png',
-                           'GEOS_dust_aot_day2_vert_' + str(dust_xLat) + 'W.png']
-
-    #=== 700mb wind & geopotential height config
-    #wind_700mb_tau = ['072', '078', '084', '090', '096', '102', '108', '114', '120', '126', '132', '138']
-    wind_700mb_tau = ['084', '090', '096', '102', '108', '114', '120']
-
-    wind_700mb_files = ['GEOS_700mb_outlook_anim_00.png',
-                        'GEOS_700mb_outlook_anim_01.png',
-                        'GEOS_700mb_outlook_anim_02.png',
-                        'GEOS_700mb_outlook_anim_03.png',
-                        'GEOS_700mb_outlook_anim_04.png',
-                        'GEOS_700mb_outlook_anim_05.png',
-                        'GEOS_700mb_outlook_anim_06.png']
-
-
-    def find_geos_img_url(webpage,text_pattern,timeout):
-
-      geos_domain = 'https://fluid.nccs.nasa.gov'
-      response = request.urlopen(webpage,None,timeout)
-      data = response.read()
-      content = data.decode('utf8')
-      parsedPage = BeautifulSoup(content,features='lxml')
-
-      imgElms = parsedPage.findAll('img')
-
-      img_url = -1
-      for img in imgElms:
-        result = str.find(img.attrs['src'],text_pattern)
-        if result == 0:
-          img_url = geos_domain + img.attrs['src']
-          break
-        elif result > 0:
-          img_url  = img.attrs['src']
-          break
-
-      return img_url
-
-    #Get AOT 2D image (dust only)
-    print("... Downloading images from GEOS - Aerosol Opt. Thickness - Dust.")
-    status = []
-
-    for idx, tau in enumerate(AOT_tau):
-      AOT_page = AOT_url_prefix + 'tau=' + tau + AOT_url_suffix + '&field=duaot'
-      AOT_img_url = find_geos_img_url(AOT_page, img_url_pattern, req_timeout)
-
-      dl = downloadLink(AOT_img_url, os.path.join(saveDir,AOT_img_2D_files[idx]))
-      count_good_links += dl
-      count_bad_links += (1 - dl)
-      status.append(dl)
-
-    #Get AOT total image
-    print("... Downloading images from GEOS - Aerosol Opt. Thickness - Total.")
+def run(switches=None, resume=False, switchesFile='switches_download.txt', profile=None, stateFile=None, day=None, workspace=None, nJobs=None):
+  """
+  run(switches, resume, switchesFile, profile, stateFile, day, workspace, nJobs)
 
-    for idx, tau in enumerate(AOT_tau_TOD):
-      AOT_page = AOT_url_prefix + 'tau=' + tau + AOT_url_suffix + '&field=totaot'
-      AOT_img_url = find_geos_img_url(AOT_page, img_url_pattern, req_timeout)
-
-      dl = downloadLink(AOT_img_url, os.path.join(saveDir,AOT_img_total_files[idx]))
-      count_good_links += dl
-      count_bad_links += (1 - dl)
-      status.append(dl)
-
-
-    #Get AOT longitudinal cross section
-    if switches['nasa_geos_cross_section']:
-      print("... Downloading images from GEOS - Aerosol Opt. Thickness - Lon Cross section.")
-      for idx, tau in enumerate(AOT_tau):
-        AOT_page = AOT_url_prefix.replace('chem2d_mission', 'custom_mission')
-        AOT_page =  AOT_page + 'tau=' + tau + AOT_url_suffix + '&field=du_w2'
-        AOT_img_url = find_geos_img_url(AOT_page, img_url_pattern, req_timeout)
-
-        dl = downloadLink(AOT_img_url, os.path.join(saveDir,AOT_img_loncs_files[idx]))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-      #Get AOT latitudinal cross section image
-      print("... Downloading images from GEOS - Aerosol Opt. Thickness - Lat Cross section.")
-      for idx, tau in enumerate(AOT_tau):
-        AOT_page = AOT_url_prefix.replace('chem2d_mission', 'custom_mission')
-        AOT_page =  AOT_page + 'tau=' + tau + AOT_url_suffix + '&field=du_n1'
-        AOT_img_url = find_geos_img_url(AOT_page, img_url_pattern, req_timeout)
-
-        dl = downloadLink(AOT_img_url, os.path.join(saveDir,AOT_img_latcs_files[idx]))
-        count_good_links += dl
-        count_bad_links += (1 - dl)
-        status.append(dl)
-
-    write_switch('nasa_geos', status, fl_switch)
-
-
-  #Write False to switches_process.txt
-  for s_dl in switches:
-      if switches[s_dl] == False:
-         write_switch(s_dl, '', fl_switch)
-
-  if switches['model_4panel']:
-      print('Found this')
-      write_switch('model_4panel', [True], fl_switch)
-
-  total_links = count_good_links + count_bad_links
-  print("Downloading images for today's forecast complete.")
-  print("There were a total of " + str(count_good_links) + "/" + str(total_links) + " good links (" + '{:.1f}'.format((count_good_links/total_links)*100) + '%).')
-  fl_switch.close()
+  Downloads the images of today's forecast (or of day) to ./figs/ of the workspace, and returns what was found for the next stages.
 
+  Parameters:
+  - switches: dictionary of switch name -> True/False of the products to download (None to read switchesFile)
+  - resume: True to only fetch the images missing from ./figs/.download_manifest.jsonl
+  - switchesFile: switch file in ./supplementary/ read when switches is None
+  - profile: name of the profile, kept in the state (e.g. main)
+  - stateFile: JSON file the state is also written to (None to keep it in memory only)
+  - day: forecast day to download (datetime, e.g. datetime(2022, 8, 26) to run a past day again; None for today)
+  - workspace: workspace.Workspace of the run (None for ./figs/ of the working directory)
+  - nJobs: number of processes cropping the products while downloading (None for one per core)
+  - state: returned run_state.RunState, with the images downloaded for each product
+  """
 
-  time.sleep(10)
+  today = day if day is not None else datetime.today()
+  today = today.replace(hour=0, minute=0, second=0, microsecond=0)
+
+  if workspace is None:
+    workspace = run_workspace.Workspace.inPlace()
+  saveDir = workspace.saveDir
+  cropDir = workspace.cropDir
+
+  shutil.copyfile(workspace.logo, os.path.join(saveDir,'logo_cpexcv.png'))
+
+  if switches is None:
+    print("Reading True/False switches from " + switchesFile)
+    switches = switch_files.readSwitches(switch_files.switchesPath(switchesFile))
+    print("Reading True/False switches complete.")
+
+  # for the animation and cropping stages: a product is available if any of its images was downloaded
+  state = run_state.RunState(profile, today.strftime('%Y-%m-%d'), workspace.runId)
+  for switch_name in switches:
+    state.request(switch_name, switches[switch_name])
+
+
+  print('')
+  print('')
+  print('')
+  print('')
+  print('')
+
+
+
+
+  if downloadImages:
+    print("Downloading images for today's forecast.")
+
+    if useCache:
+      download_cache.openCache(workspace.cacheDir)
+    tasks = None
+    try:
+      catalog = product_catalog.loadCatalog()
+      # the "latest" images of a website (NHC analysis, satellites, MIMIC, SAL) are of today, not of a past day
+      pastDay = today < datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+      if pastDay:
+        skipped = [product['title'] for switch_name, products in catalog.items() if switches.get(switch_name)
+                   for product in products if not product_catalog.isDated(product)]
+        if len(skipped) > 0:
+          print('... Past forecast day: not downloading the latest-only ' + ', '.join(dict.fromkeys(skipped)) + '.')
+      jobs = product_catalog.buildJobs(catalog, switches, today, saveDir, datedOnly=pastDay)
+
+      download_manifest.openManifest(os.path.join(saveDir,'.download_manifest.jsonl'), today, resume)
+      done = set(job.fileName for job in jobs if resume and download_manifest.isDone(job))
+      if resume:
+        print('... Resuming: ' + str(len(done)) + '/' + str(len(jobs)) + ' images already downloaded for this forecast day.')
+
+      titles = []
+      for job in jobs:
+        if job.title not in titles:
+          titles.append(job.title)
+          print('... Downloading ' + job.title + '.')
+
+      # NASA GEOS pages have to be read first, to find the url of the image
+      pages = [job.page for job in jobs if job.page is not None and job.fileName not in done]
+      if len(pages) > 0:
+        img_urls = geos_pages.resolvePages(pages, geos_img_url_pattern, os.path.join(workspace.cacheDir,'geos_pages.json'))
+        for idx, job in enumerate(jobs):
+          if job.page is not None and job.fileName not in done:
+            jobs[idx] = job._replace(url=img_urls[job.page] if img_urls[job.page] != -1 else '')
+      todo = [job for job in jobs if job.fileName not in done]
+
+      # the same image can be asked for by two switches (e.g. uutah_precipitation_animation and UTAH_website)
+      unique_links = list(dict.fromkeys((job.url, job.fileName) for job in todo))
+      jobOf = {}
+      for job in todo:
+        jobOf.setdefault((job.url, job.fileName), job)
+
+      print('')
+      print('... Fetching ' + str(len(unique_links)) + ' images from ' + str(len(set(download_engine.hostOf(url) for url, _ in unique_links))) + ' websites at once.')
+
+      # each product is cropped as soon as all of its images are in ./figs/, while the others are still downloading
+      # (a product with a failed image is left to crop_edit_daily_images.py, which works with the images there are)
+      tasks = scheduler.Scheduler()
+      if processWhileDownloading:
+        image_engine.startPool(nJobs or os.cpu_count() or 1)
+        for idx in range(len(unique_links)):
+          tasks.addExternal('download:' + str(idx))
+        for step in product_recipes.steps:
+          if product_recipes.isOn(step, switches):
+            deps = ['download:' + str(idx) for idx, link in enumerate(unique_links) if jobOf[link].switch in step.switches]
+            deps += ['crop:' + name for name in step.needs if 'crop:' + name in tasks.tasks]
+            tasks.add('crop:' + step.name, product_recipes.runStep, (step, saveDir, cropDir, True), deps)
+      tasks.start()
+
+      downloaded = dict(zip(unique_links, download_engine.downloadJobs(unique_links, lambda url, name: fetchJob(jobOf[(url, name)]),
+                                                                       onDone=lambda idx, result: tasks.complete('download:' + str(idx), result))))
+
+      for job in jobs:
+        state.addImage(job.switch, job.fileName, job.fileName in done or downloaded[(job.url, job.fileName)],
+                       download_manifest.entries.get(job.fileName, {}).get('sha256'))
+
+      if switches['model_4panel']:
+          state.setAvailable('model_4panel')
+
+      if stateFile is not None:
+        state.save(stateFile)
+
+      task_status = tasks.wait()
+      if processWhileDownloading:
+        print('... Processed ' + str(sum(1 for name in task_status if name.startswith('crop:') and task_status[name] == 'done')) + ' products while downloading.')
+
+      count_good_links, total_links = state.counts()
+      print("Downloading images for today's forecast complete.")
+      print("There were a total of " + str(count_good_links) + "/" + str(total_links) + " good links (" + '{:.1f}'.format((count_good_links/total_links)*100) + '%).')
+    finally:
+      # also when the downloads stopped on an error: the cache keeps what was downloaded, and no worker is left
+      if useCache:
+        download_cache.closeCache()
+      if tasks is not None:
+        tasks.cancel()
+        tasks.wait()
+      image_engine.closePool()
+      download_manifest.closeManifest()
+
+  return state
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(prog='python ./supplementary/download_daily_images_all.py', description="download the images of today's forecast")
+  parser.add_argument('--resume', action='store_true', help='only fetch the images missing from ./figs/.download_manifest.jsonl')
+  args = parser.parse_args()
+  run(resume=args.resume, stateFile=run_state.stateFile)
@@ -0,0 +1,78 @@
+"""
+This module is used to download the images for the CPEX-CV field campaign forecasting template concurrently.
+
+Every image is a (url, fileName) job. Jobs are grouped by website, and each website gets its own small set of
+worker threads, so a slow or dead website only holds up its own images. The wall-clock time of the download
+stage is then set by the slowest website, instead of the sum of all of them.
+
+Required packages: queue, threading, urllib.
+"""
+
+
+import queue
+import threading
+from urllib import parse
+
+
+max_per_host = 4    # simultaneous connections to the same website
+
+
+def hostOf(imageUrl):
+  """
+  hostOf(imageUrl)
+
+  Returns the website (host name) of the url, which is used to group the download jobs.
+
+  Parameters:
+  - imageUrl: the url of the image (e.g. https:// ...)
+  """
+
+  return parse.urlsplit(imageUrl).netloc.lower()
+
+
+def downloadJobs(jobs, fetch, nPerHost=max_per_host, onDone=None):
+  """
+  downloadJobs(jobs, fetch, nPerHost, onDone)
+
+  Will download all the jobs at once, with at most nPerHost simultaneous downloads from the same website.
+
+  Parameters:
+  - jobs: list of (imageUrl, imageName) pairs
+  - fetch: function called as fetch(imageUrl, imageName), returning True/False (e.g. downloadLink)
+  - nPerHost: maximum number of simultaneous downloads from one website
+  - onDone: function called as onDone(index, result) as soon as each job is finished (e.g. to start processing it)
+  - results: returned list of True/False values, in the same order as jobs
+  """
+
+  results = [False] * len(jobs)
+
+  host_queues = {}
+  for idx, (imageUrl, imageName) in enumerate(jobs):
+    host_queues.setdefault(hostOf(imageUrl), queue.Queue()).put(idx)
+
+  def worker(host_queue):
+    while True:
+      try:
+        idx = host_queue.get_nowait()
+      except queue.Empty:
+        return
+      imageUrl, imageName = jobs[idx]
+      try:
+        results[idx] = bool(fetch(imageUrl, imageName))
+      except Exception as err:
+        print('... ... ' + imageName + ' failed: ' + str(err))
+        results[idx] = False
+      if onDone is not None:
+        onDone(idx, results[idx])
+
+  threads = []
+  for host_queue in host_queues.values():
+    for num in range(min(nPerHost, host_queue.qsize())):
+      thread = threading.Thread(target=worker, args=(host_queue,), daemon=True)
+      thread.start()
+      threads.append(thread)
+
+  for thread in threads:
+    thread.join()
+
+  return results
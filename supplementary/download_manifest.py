@@ -0,0 +1,149 @@
+"""
+This module keeps the list of images already downloaded for today's forecast (./figs/.download_manifest.jsonl),
+so a download stage that died partway through can be run again with --resume and only fetch what is missing.
+
+The first line of the manifest holds the forecast day it belongs to. Every following line is one completed image
+(product, frame, valid time, file name, sha256), appended as soon as the image is saved, so the manifest is up to
+date even if the run is killed. Images that failed are not written, and are tried again on resume.
+
+Required packages: hashlib, json, os, threading.
+"""
+
+
+import hashlib
+import json
+import os
+import threading
+
+
+manifestFile = os.path.join('.','figs','.download_manifest.jsonl')
+
+entries = {}
+lock = threading.Lock()
+fl_manifest = None
+
+
+def openManifest(fileName, today, resume):
+  """
+  openManifest(fileName, today, resume)
+
+  Opens the manifest for writing. With resume, the images already written for the same forecast day are kept,
+  otherwise (or for another day) a new manifest is started.
+
+  Parameters:
+  - fileName: the complete path and name of the manifest
+  - today: the forecast day (datetime at 00 UTC)
+  - resume: True to keep the images of an earlier run for the same forecast day
+  """
+
+  global manifestFile, entries, fl_manifest
+  manifestFile = fileName
+  cycle = today.strftime('%Y-%m-%d')
+
+  entries = {}
+  if resume and os.path.isfile(manifestFile):
+    with open(manifestFile, 'r') as fl:
+      lines = fl.readlines()
+    try:
+      header = json.loads(lines[0]) if len(lines) > 0 else {}
+    except ValueError:
+      header = {}
+    if header.get('cycle') == cycle:
+      for line in lines[1:]:
+        try:
+          entry = json.loads(line)
+        except ValueError:
+          continue  # last line cut short when the run was killed
+        entries[entry['file']] = entry
+    else:
+      print('... ... Download manifest is for another forecast day, starting a new one.')
+
+  fl_manifest = open(manifestFile, 'w')
+  fl_manifest.write(json.dumps({'cycle': cycle}) + '\n')
+  for entry in entries.values():
+    fl_manifest.write(json.dumps(entry) + '\n')
+  fl_manifest.flush()
+
+  return
+
+
+def fileChecksum(fileName):
+  """
+  fileChecksum(fileName)
+
+  Returns the sha256 hex digest of a file.
+
+  Parameters:
+  - fileName: the complete path and name of the file
+  """
+
+  digest = hashlib.sha256()
+  with open(fileName, 'rb') as fl:
+    for chunk in iter(lambda: fl.read(1024*1024), b''):
+      digest.update(chunk)
+
+  return digest.hexdigest()
+
+
+def isDone(job):
+  """
+  isDone(job)
+
+  Returns True when the image of the download job is in the manifest and the file in ./figs/ still matches its checksum.
+
+  Parameters:
+  - job: product_catalog.DownloadJob
+  """
+
+  with lock:
+    entry = entries.get(job.fileName)
+
+  if entry is None or not entry.get('sha256') or not os.path.isfile(job.fileName):
+    return False
+
+  return fileChecksum(job.fileName) == entry['sha256']
+
+
+def record(job, checksum):
+  """
+  record(job, checksum)
+
+  Writes a completed download job to the manifest.
+
+  Parameters:
+  - job: product_catalog.DownloadJob
+  - checksum: sha256 hex digest of the saved image (None when it is not known)
+  """
+
+  if checksum is None and os.path.isfile(job.fileName):
+    checksum = fileChecksum(job.fileName)
+
+  entry = {'file': job.fileName,
+           'switch': job.switch,
+           'product': job.title,
+           'frame': job.frame,
+           'valid': job.valid.strftime('%Y-%m-%d %H:%M') if job.valid is not None else None,
+           'sha256': checksum}
+  with lock:
+    entries[job.fileName] = entry
+    if fl_manifest is not None:
+      fl_manifest.write(json.dumps(entry) + '\n')
+      fl_manifest.flush()
+
+  return
+
+
+def closeManifest():
+  """
+  closeManifest()
+
+  Closes the manifest file.
+  """
+
+  global fl_manifest
+  with lock:
+    if fl_manifest is not None:
+      fl_manifest.close()
+      fl_manifest = None
+
+  return
@@ -0,0 +1,114 @@
+"""
+This module decides how long to wait for a website, how often to try again, and when to give up on it.
+
+Every request gets a connect and a read timeout, so a hung socket can not block the download stage forever.
+Timeouts, dropped connections and server errors (5xx, 429) are tried again after a growing pause (backoff).
+Each website also has a circuit breaker: once it has failed breaker_threshold times in a row, the rest of its
+images are skipped right away, instead of each one waiting out its own timeout.
+
+Required packages: random, requests, threading, time.
+"""
+
+
+import random
+import threading
+import time
+
+import requests
+from download_engine import hostOf
+
+
+connect_timeout = 10     # seconds to open the connection
+read_timeout = 60        # seconds to wait for data once connected
+max_retries = 2          # extra attempts after the first one
+backoff_seconds = 2      # pause before the first retry, doubled for each one after
+backoff_max_seconds = 30
+breaker_threshold = 5    # consecutive failures before a website is skipped for the rest of the run
+retry_status = (429, 500, 502, 503, 504)
+
+failures = {}
+lock = threading.Lock()
+
+
+class HostDown(requests.ConnectionError):
+  """
+  Raised instead of sending a request to a website whose circuit breaker is open.
+  """
+
+
+def hostIsDown(url):
+  """
+  hostIsDown(url)
+
+  Returns True when the circuit breaker of the url's website is open.
+
+  Parameters:
+  - url: the url (e.g. https:// ...)
+  """
+
+  with lock:
+    return failures.get(hostOf(url), 0) >= breaker_threshold
+
+
+def recordResult(url, working):
+  """
+  recordResult(url, working)
+
+  Resets the consecutive failure count of the url's website when it answered, or adds one when it did not.
+
+  Parameters:
+  - url: the url (e.g. https:// ...)
+  - working: True if the website answered
+  """
+
+  host = hostOf(url)
+  with lock:
+    if working:
+      failures[host] = 0
+    else:
+      failures[host] = failures.get(host, 0) + 1
+      if failures[host] == breaker_threshold:
+        print('... ... ' + host + ' failed ' + str(breaker_threshold) + ' times in a row, skipping the rest of its images.')
+
+  return
+
+
+def call(url, func, *args, **kwargs):
+  """
+  call(url, func, *args, **kwargs)
+
+  Calls func(*args, timeout=(connect_timeout, read_timeout), **kwargs), trying again with backoff when the
+  website times out, drops the connection or answers with a server error. Other HTTP errors (e.g. 404) are
+  raised right away. Raises HostDown if the website's circuit breaker is open.
+
+  Parameters:
+  - url: the url requested by func (used for the website's circuit breaker)
+  - func: function doing the request (e.g. download_cache.fetch), which takes a timeout argument
+  - result: returned value of func
+  """
+
+  kwargs['timeout'] = (connect_timeout, read_timeout)
+
+  for attempt in range(max_retries + 1):
+    if hostIsDown(url):
+      raise HostDown(hostOf(url) + ' is not responding')
+
+    try:
+      result = func(*args, **kwargs)
+      recordResult(url, True)
+      return result
+    except requests.HTTPError as err:
+      status = err.response.status_code if err.response is not None else None
+      if status not in retry_status:
+        recordResult(url, True)
+        raise
+      last_error = err
+    except (requests.ConnectionError, requests.Timeout) as err:
+      last_error = err
+
+    recordResult(url, False)
+    if attempt < max_retries and not hostIsDown(url):
+      pause = min(backoff_max_seconds, backoff_seconds * 2**attempt)
+      time.sleep(pause * random.uniform(0.5, 1.0))
+
+  raise last_error
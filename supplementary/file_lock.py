@@ -0,0 +1,156 @@
+"""
+This module holds a lock shared by all the processes of the CPEX-CV forecasting template (the main and model_4panel
+runs, the days of a backfill, the archive compaction running in the background), so they take turns on what they
+share: ./figs_final/, the archive and the download cache.
+
+The lock is a file created with O_EXCL (works on every operating system), holding a token that names its owner
+(host, process and a random part). A lock whose process is gone (same host), or older than stale_timeout (another
+host), is taken over. A lock is only removed by its owner: a run that held it so long that it was taken over does not
+remove the lock of the run that took it.
+
+  with file_lock.FileLock('./forecast_archive/.archive.lock', 'main-2022-09-17'):
+    ...
+
+Required packages: os, socket, time, uuid.
+"""
+
+
+import os
+import socket
+import time
+import uuid
+
+
+stale_timeout = 600   # seconds after which a lock of another host is taken over
+poll_seconds = 0.2
+
+
+class FileLock:
+  """
+  FileLock(lockName, owner)
+
+  Lock file shared between processes, used with a with statement (not re-entrant).
+
+  Parameters:
+  - lockName: the complete path and name of the lock file
+  - owner: written in the lock file to tell who holds it (e.g. the run id)
+  """
+
+  def __init__(self, lockName, owner=None):
+    self.lockName = lockName
+    self.token = ' '.join([socket.gethostname(), str(os.getpid()), uuid.uuid4().hex, owner or ''])
+
+  def acquire(self):
+    """
+    acquire()
+
+    Waits until the lock file can be created with the token of this lock.
+    """
+
+    directory = os.path.dirname(self.lockName)
+    if directory and not os.path.isdir(directory):
+      os.makedirs(directory, exist_ok=True)
+
+    while True:
+      try:
+        fd = os.open(self.lockName, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+      except FileExistsError:
+        token = readToken(self.lockName)
+        if token is not None and isStale(self.lockName, token):
+          print('... Taking over the lock ' + self.lockName + ' left by ' + token + '.')
+          removeIfOwned(self.lockName, token)
+          continue
+        time.sleep(poll_seconds)
+        continue
+
+      with os.fdopen(fd, 'w') as fl:
+        fl.write(self.token)
+      return
+
+  def release(self):
+    """
+    release()
+
+    Removes the lock file, unless it was taken over by another process meanwhile.
+    """
+
+    if not removeIfOwned(self.lockName, self.token):
+      print('... The lock ' + self.lockName + ' was taken over by another run, left to it.')
+
+    return
+
+  def __enter__(self):
+    self.acquire()
+    return self
+
+  def __exit__(self, *exc):
+    self.release()
+    return False
+
+
+def readToken(lockName):
+  """
+  readToken(lockName)
+
+  Returns the token written in a lock file (None if there is no lock file, '' if it is being written).
+  """
+
+  try:
+    with open(lockName, 'r') as fl:
+      return fl.read()
+  except FileNotFoundError:
+    return None
+
+
+def isAlive(pid):
+  if os.name != 'posix':
+    return True   # os.kill(pid, 0) would end the process on Windows, the age of the lock decides there
+  try:
+    os.kill(pid, 0)
+  except ProcessLookupError:
+    return False
+  except PermissionError:
+    return True
+
+  return True
+
+
+def isStale(lockName, token):
+  """
+  isStale(lockName, token)
+
+  Tells if the lock holding token was left by a process that is gone.
+
+  Parameters:
+  - lockName: the complete path and name of the lock file
+  - token: the token read from it
+  """
+
+  try:
+    age = time.time() - os.path.getmtime(lockName)
+  except OSError:
+    return False
+
+  parts = token.split(' ')
+  if len(parts) >= 3 and parts[0] == socket.gethostname() and parts[1].isdigit() and os.name == 'posix':
+    return not isAlive(int(parts[1]))
+
+  # a lock being written (empty token) is never left that long
+  return age > stale_timeout
+
+
+def removeIfOwned(lockName, token):
+  """
+  removeIfOwned(lockName, token)
+
+  Removes the lock file if it still holds token, and tells if it did.
+  """
+
+  if readToken(lockName) != token:
+    return False
+  try:
+    os.remove(lockName)
+  except FileNotFoundError:
+    return False
+
+  return True
@@ -0,0 +1,139 @@
+"""
+This module finds the image urls on the NASA GEOS (fluid.nccs.nasa.gov) web pages.
+
+Each GEOS image (field, tau, initial time) has its own web page, and the image url has to be read from it. The
+pages are read at the same time (a few per website, see download_engine.py), and each page is only read until
+the first matching <img src=...>, without building the whole HTML tree. Image urls that were found are kept in
+a small JSON file keyed by the page url, so a re-run for the same model cycle does not read the pages again.
+Several runs can share that file: each one merges its urls into it, one run at a time (file_lock.py).
+
+Required packages: html.parser, json, os, threading, requests.
+"""
+
+
+from html.parser import HTMLParser
+import json
+import os
+import threading
+
+import download_engine
+import download_policy
+import file_lock
+import http_session
+import requests
+
+
+geos_domain = 'https://fluid.nccs.nasa.gov'
+
+
+class ImgScanner(HTMLParser):
+  """
+  HTML parser that only looks at <img> tags, and remembers the first src containing text_pattern.
+  """
+
+  def __init__(self, text_pattern):
+    HTMLParser.__init__(self)
+    self.text_pattern = text_pattern
+    self.img_url = -1
+
+  def handle_starttag(self, tag, attrs):
+    if tag != 'img' or self.img_url != -1:
+      return
+    src = dict(attrs).get('src')
+    if src is None:
+      return
+    result = str.find(src, self.text_pattern)
+    if result == 0:
+      self.img_url = geos_domain + src
+    elif result > 0:
+      self.img_url = src
+
+
+def find_geos_img_url(webpage, text_pattern, timeout=None):
+  """
+  find_geos_img_url(webpage, text_pattern, timeout)
+
+  Reads the NASA GEOS web page through the shared HTTP session until the first image whose path contains
+  text_pattern, and stops reading the page there.
+
+  Parameters:
+  - webpage: the url of the page
+  - text_pattern: the image path to look for (e.g. /missions/static//plots/)
+  - timeout: seconds to wait for the page
+  - img_url: returned image url, -1 if it was not found
+  """
+
+  response = http_session.get(webpage, timeout=timeout, stream=True)
+  with response:
+    response.raise_for_status()
+    scanner = ImgScanner(text_pattern)
+    for chunk in response.iter_content(http_session.chunk_size, decode_unicode=False):
+      scanner.feed(chunk.decode('utf8', errors='replace'))
+      if scanner.img_url != -1:
+        break
+
+  return scanner.img_url
+
+
+def resolvePages(pages, text_pattern, cacheFile=None):
+  """
+  resolvePages(pages, text_pattern, cacheFile)
+
+  Finds the image url of every page, reading the pages at the same time. Pages already in cacheFile are not read.
+
+  Parameters:
+  - pages: list of NASA GEOS page urls
+  - text_pattern: the image path to look for (e.g. /missions/static//plots/)
+  - cacheFile: JSON file with the image urls found on previous runs (None to always read the pages)
+  - img_urls: returned dictionary of page url -> image url (-1 if it could not be found)
+  """
+
+  cached = readCache(cacheFile) if cacheFile is not None else {}
+
+  img_urls = {page: cached[page] for page in pages if page in cached}
+  to_read = [page for page in dict.fromkeys(pages) if page not in img_urls]
+  if len(img_urls) > 0:
+    print('... ... ' + str(len(img_urls)) + ' NASA GEOS image urls found in the page cache.')
+
+  lock = threading.Lock()
+
+  def readPage(page, name):
+    try:
+      img_url = download_policy.call(page, find_geos_img_url, page, text_pattern)
+    except requests.RequestException as err:
+      print('... ... NASA GEOS page failed (' + type(err).__name__ + ').')
+      img_url = -1
+    with lock:
+      img_urls[page] = img_url
+    return img_url != -1
+
+  download_engine.downloadJobs([(page, page) for page in to_read], readPage)
+
+  for page in to_read:
+    img_urls.setdefault(page, -1)
+
+  if cacheFile is not None and len(to_read) > 0:
+    # the urls found by the other runs since the cache was read are kept
+    with file_lock.FileLock(cacheFile + '.lock', 'geos pages'):
+      cached = readCache(cacheFile)
+      cached.update({page: img_url for page, img_url in img_urls.items() if img_url != -1})
+      tempName = cacheFile + '.part' + str(os.getpid()) + '-' + str(threading.get_ident())
+      with open(tempName, 'w') as fl:
+        json.dump(cached, fl, indent=0)
+      os.replace(tempName, cacheFile)
+
+  return img_urls
+
+
+def readCache(cacheFile):
+  """
+  readCache(cacheFile)
+
+  Returns the dictionary of page url -> image url kept in cacheFile (empty if there is none, or it is damaged).
+  """
+
+  try:
+    with open(cacheFile, 'r') as fl:
+      return json.load(fl)
+  except (OSError, ValueError):
+    return {}
@@ -0,0 +1,157 @@
+"""
+This module holds one shared HTTP session for all downloads of the CPEX-CV field campaign forecasting template.
+
+The session keeps its connections open (keep-alive), so the TCP and TLS handshakes are done once per website
+connection and reused for the following frames, instead of once per image as with urlretrieve.
+
+Images are streamed to a temporary file and only renamed to their final name once they are complete and start
+like a PNG, GIF or JPEG file, so ./figs/ never holds a truncated image or an HTML error page.
+
+Required packages: hashlib, os, requests, threading.
+"""
+
+
+import hashlib
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+pool_hosts = 32       # number of websites to keep connections open to
+pool_per_host = 8     # open connections kept per website (at least download_engine.max_per_host)
+verify_ssl = False    # same as the unverified ssl context the download script used (for ICAP aerosol download)
+chunk_size = 64*1024
+image_magic = (b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a', b'\xff\xd8\xff')  # PNG, GIF, JPEG
+
+session = None
+lock = threading.Lock()
+
+
+class NotAnImage(requests.RequestException):
+  """
+  Raised when a website answers with something that is not a PNG, GIF or JPEG image (e.g. an HTML error page).
+  """
+
+
+class IncompleteDownload(requests.ConnectionError):
+  """
+  Raised when the connection ended before the whole image arrived (tried again by download_policy.py).
+  """
+
+
+def getSession():
+  """
+  getSession()
+
+  Returns the shared requests.Session, creating it the first time.
+  """
+
+  global session
+  with lock:
+    if session is None:
+      session = requests.Session()
+      adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_per_host)
+      session.mount('http://', adapter)
+      session.mount('https://', adapter)
+      session.verify = verify_ssl
+      if not verify_ssl:
+        requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+
+  return session
+
+
+def get(url, headers=None, timeout=None, stream=False):
+  """
+  get(url, headers, timeout, stream)
+
+  Sends a GET request through the shared session and returns the requests.Response.
+
+  Parameters:
+  - url: the url to request (e.g. https:// ...)
+  - headers: dictionary of extra request headers
+  - timeout: seconds to wait for the website (None waits forever)
+  - stream: if True, the body is read later (e.g. with saveResponse)
+  """
+
+  return getSession().get(url, headers=headers, timeout=timeout, stream=stream)
+
+
+def isImage(head):
+  """
+  isImage(head)
+
+  Returns True when the first bytes of a file are those of a PNG, GIF or JPEG image.
+
+  Parameters:
+  - head: the first bytes of the file
+  """
+
+  return head.startswith(image_magic)
+
+
+def saveResponse(response, imageName):
+  """
+  saveResponse(response, imageName)
+
+  Writes the body of a streamed response to a temporary file next to imageName, and renames it to imageName once
+  the whole image has arrived. An interrupted download never leaves a partial image at imageName. Releases the
+  connection back to the pool. Raises NotAnImage when the website sent something else (e.g. an HTML error page
+  with status 200), and IncompleteDownload when fewer bytes than announced arrived.
+
+  Parameters:
+  - response: requests.Response from get(..., stream=True)
+  - imageName: the complete path and name of the saved image
+  - size: returned number of bytes written
+  - checksum: returned sha256 hex digest of the image
+  """
+
+  # unique per process and thread: several runs can write the same cached image at once
+  tempName = imageName + '.part' + str(os.getpid()) + '-' + str(threading.get_ident())
+  digest = hashlib.sha256()
+  size = 0
+  head = b''
+  try:
+    with response, open(tempName, 'wb') as fl:
+      for chunk in response.iter_content(chunk_size):
+        if len(head) < 8:
+          head += chunk[:8]
+          if len(head) >= 8 and not isImage(head):
+            break
+        fl.write(chunk)
+        digest.update(chunk)
+        size += len(chunk)
+
+    if not isImage(head):
+      raise NotAnImage(response.headers.get('Content-Type', 'unknown content') + ' instead of an image: ' + response.url, response=response)
+    expected = response.headers.get('Content-Length')
+    if expected is not None and 'Content-Encoding' not in response.headers and int(expected) != size:
+      raise IncompleteDownload(str(size) + ' of ' + expected + ' bytes received: ' + response.url, response=response)
+
+    os.replace(tempName, imageName)
+  finally:
+    if os.path.exists(tempName):
+      os.remove(tempName)
+
+  return size, digest.hexdigest()
+
+
+def download(url, imageName, timeout=None):
+  """
+  download(url, imageName, timeout)
+
+  Downloads url to imageName through the shared session. Raises requests.HTTPError when the image is not available.
+
+  Parameters:
+  - url: the url of the image (e.g. https:// ...)
+  - imageName: the complete path and name of the saved image
+  - timeout: seconds to wait for the website (None waits forever)
+  - size, checksum: returned number of bytes and sha256 hex digest of the image
+  """
+
+  response = get(url, timeout=timeout, stream=True)
+  if response.status_code >= 400:
+    response.close()
+    response.raise_for_status()
+  return saveResponse(response, imageName)
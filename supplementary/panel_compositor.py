@@ -0,0 +1,174 @@
+"""
+This module joins the frames of several products into one panel animation of the CPEX-CV forecasting template
+(e.g. ECMWF | GFS, clouds | precipitation, and the four-model 2x2 panel), instead of calling ImageMagick's convert
+once per frame and per row, and going through temporary .jpg files:
+
+  convert +append ECMWF_midRH_anim_day1_00.jpg GFS_midRH_anim_day1_00.jpg ECMWF_GFS_midRH_day1_anim_00.jpg
+  convert -append temp1_anim_00.jpg temp2_anim_00.jpg Four_model_joint_anim_day1_00.jpg
+
+A PanelGrid keeps one canvas (numpy array) for the whole animation, allocated for the first frame, and copies the
+decoded frames of the panels into their place for each frame index, so each source image is read once and
+compressed once, by the animation writer. The panels of a row are placed side by side (+append) aligned to the
+top, and the rows one under the other (-append) aligned to the left, with white in the space left next to
+smaller images:
+
+  panels = [animation_writer.frameFiles(cropDir, 'ECMWF_midRH_anim_day1'), animation_writer.frameFiles(cropDir, 'GFS_midRH_anim_day1')]
+  animatePanels(panels, 1, 2, './figs_cropped/ECMWF_GFS_midRH_day1.gif')
+
+A panel can also be a list of images already in memory (e.g. the logo, for a model with no frames).
+
+Required packages: numpy, PIL.
+"""
+
+
+import numpy as np
+from PIL import Image, ImageColor
+
+import animation_writer
+import image_engine
+
+
+class PanelGrid:
+  """
+  PanelGrid(rows, cols, background)
+
+  Canvas of rows x cols panels, reused for every frame of an animation.
+
+  Parameters:
+  - rows: number of rows of panels
+  - cols: number of panels per row
+  - background: color name of the space left next to smaller panels
+  """
+
+  def __init__(self, rows, cols, background='white'):
+    self.rows = rows
+    self.cols = cols
+    self.background = ImageColor.getrgb(background)
+    self.sizes = None
+    self.offsets = None
+    self.canvas = None
+
+  def layout(self, sizes):
+    """
+    layout(sizes)
+
+    Sets the place of each panel and allocates the canvas, for the sizes (width, height) of the panels in row order.
+    """
+
+    offsets = []
+    width = height = 0
+    for row in range(self.rows):
+      rowSizes = sizes[row*self.cols:(row+1)*self.cols]
+      x = 0
+      for size in rowSizes:
+        offsets.append((x, height))
+        x += size[0]
+      width = max(width, x)
+      height += max(size[1] for size in rowSizes)
+
+    self.sizes = sizes
+    self.offsets = offsets
+    self.canvas = np.empty((height, width, 3), dtype=np.uint8)
+    self.canvas[:] = self.background
+
+    return
+
+  def compose(self, images):
+    """
+    compose(images)
+
+    Copies the images (RGB PIL images, in row order) into the canvas and returns it as a new PIL image.
+    """
+
+    if len(images) != self.rows*self.cols:
+      raise ValueError('expected ' + str(self.rows*self.cols) + ' panels, got ' + str(len(images)))
+
+    sizes = [img.size for img in images]
+    if sizes != self.sizes:
+      self.layout(sizes)
+
+    for img, (x, y) in zip(images, self.offsets):
+      self.canvas[y:y+img.height, x:x+img.width] = np.asarray(img.convert('RGB'))
+
+    # an RGB image is copied out of the array, so the canvas can be filled again for the next frame
+    return Image.fromarray(self.canvas, 'RGB')
+
+
+def centered(img, size, background='white'):
+  """
+  centered(img, size, background)
+
+  Returns img in the middle of a canvas of the size (convert -size 780x400 xc:white img -gravity center -composite).
+
+  Parameters:
+  - img: PIL.Image
+  - size: (width, height) of the canvas
+  - background: color name of the canvas
+  """
+
+  canvas = Image.new('RGB', size, background)
+  canvas.paste(img.convert('RGB'), ((size[0]-img.width)//2, (size[1]-img.height)//2))
+
+  return canvas
+
+
+def frameCount(panels):
+  """
+  frameCount(panels)
+
+  Returns the number of frames of the joint animation (the shortest panel).
+  """
+
+  return min(len(panel) for panel in panels)
+
+
+def panelFrames(panels, rows, cols, indices=None, background='white'):
+  """
+  panelFrames(panels, rows, cols, indices, background)
+
+  Yields the joint frames one by one, decoding only the images of the frame index being joined.
+
+  Parameters:
+  - panels: list of rows x cols panels in row order, each a list of frame files or PIL images
+  - rows: number of rows of panels
+  - cols: number of panels per row
+  - indices: the frame indices to join (None for all of them)
+  - background: color name of the space left next to smaller panels
+  """
+
+  grid = PanelGrid(rows, cols, background)
+  if indices is None:
+    indices = range(frameCount(panels))
+
+  for num in indices:
+    images = [image_engine.load(panel[num]) if isinstance(panel[num], str) else panel[num] for panel in panels]
+    yield grid.compose(images)
+
+
+def animatePanels(panels, rows, cols, outName, delay=animation_writer.frame_delay, loop=0, hold=animation_writer.hold_frames, fmt=None):
+  """
+  animatePanels(panels, rows, cols, outName, delay, loop, hold, fmt)
+
+  Streams the joint frames of the panels into the animation writer (animation_writer.writeAnimation).
+
+  Parameters:
+  - panels: list of rows x cols panels in row order, each a list of frame files or PIL images
+  - rows: number of rows of panels
+  - cols: number of panels per row
+  - outName: the complete path and name of the output file (e.g. ./figs_cropped/something.gif)
+  - delay: delay between frames in centiseconds
+  - loop: 0 means repeating
+  - hold: the last frame stays on screen hold delays longer
+  - fmt: gif, mp4 or webp (None for animation_writer.animation_format)
+  - working: returned Boolean, False if there were no frames
+  """
+
+  nFrames = frameCount(panels)
+  if nFrames == 0:
+    return False
+
+  report = animation_writer.writeAnimation(panelFrames(panels, rows, cols), outName, delay, loop, hold, fmt,
+                                           paletteFrames=panelFrames(panels, rows, cols, animation_writer.sampleOf(list(range(nFrames)))))
+  animation_writer.printReport(report)
+
+  return True
@@ -0,0 +1,145 @@
+"""
+This module reads product_catalog.json, which describes every image downloaded for the CPEX-CV field campaign
+forecasting template, and turns it into the full list of download jobs for a given forecast day.
+
+Each switch in switches_download.txt has a list of products. Product fields:
+ - title: printed while downloading (e.g. NHC surface analysis)
+ - url: template of the image url
+ - page: template of a NASA GEOS web page, whose <img> is the image (used instead of url)
+ - file: template of the saved image name; files: one explicit name per frame instead
+ - init_hour: model initialization hour on the day before today (e.g. 12 for the 12Z run)
+ - day, hour, step, frames: valid times are today + day days + hour hours + step*frame hours
+ - leads: explicit list of forecast lead hours (used instead of day, hour, step and frames)
+ - lead_unit: hours between the image numbers in the url (tropical tidbits counts every 3 or 6 hours)
+ - epoch, epoch_offsets: {epoch_hr} is the number of hours from epoch to today plus the offset. Each offset is tried in turn.
+ - post: name of a step to run once the image is downloaded (see download_daily_images_all.py)
+ - requires: another switch that also has to be True
+
+Template fields: {today}, {init}, {valid} (datetimes, e.g. {valid:%Y%m%d%H}), {lead}, {frame} and {epoch_hr}.
+A product whose url (or page) has none of the date fields is always the latest image of its website (e.g. NHC
+USA_latest.gif), so it is left out when a past forecast day is run (buildJobs(..., datedOnly=True)).
+
+Required packages: collections, datetime, json, os.
+"""
+
+
+from collections import namedtuple, OrderedDict
+from datetime import datetime, timedelta
+import json
+import os
+
+
+catalogFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'product_catalog.json')
+
+date_fields = ('{today', '{init', '{valid', '{lead', '{epoch_hr')
+
+DownloadJob = namedtuple('DownloadJob', ['switch', 'title', 'frame', 'valid', 'url', 'page', 'fileName', 'post', 'fallbacks'])
+
+
+def loadCatalog(fileName=catalogFile):
+  """
+  loadCatalog(fileName)
+
+  Reads the product catalog, keeping the order of the switches and products in the file.
+
+  Parameters:
+  - fileName: the complete path and name of the catalog (default: product_catalog.json next to this module)
+  - catalog: returned ordered dictionary of switch name -> list of products
+  """
+
+  with open(fileName, 'r') as fl:
+    catalog = json.load(fl, object_pairs_hook=OrderedDict)
+
+  return OrderedDict((key, products) for key, products in catalog.items() if not key.startswith('_'))
+
+
+def productJobs(switch_name, product, today, saveDir):
+  """
+  productJobs(switch_name, product, today, saveDir)
+
+  Expands one catalog product into its download jobs (one per frame).
+
+  Parameters:
+  - switch_name: name of the switch the product belongs to (e.g. ECMWF_prediction)
+  - product: the catalog entry of the product
+  - today: the forecast day (datetime at 00 UTC)
+  - saveDir: directory where the images get saved
+  - jobs: returned list of DownloadJob
+  """
+
+  today_m = today - timedelta(days=1)
+  init = today_m + timedelta(hours=product.get('init_hour', 0))
+  lead_unit = product.get('lead_unit', 1)
+
+  if 'leads' in product:
+    valid_times = [init + timedelta(hours=lead) for lead in product['leads']]
+  elif 'frames' in product:
+    valid_times = [today + timedelta(days=product['day'], hours=product['hour'] + product['step']*frame) for frame in range(product['frames'])]
+  else:
+    valid_times = [None]
+
+  epoch_hr = [None]
+  if 'epoch' in product:
+    hours = int((today - datetime.strptime(product['epoch'], '%Y-%m-%d')).total_seconds()//3600)
+    epoch_hr = [hours + offset for offset in product.get('epoch_offsets', [0])]
+
+  jobs = []
+  for frame, valid in enumerate(valid_times):
+    fields = {'today': today, 'init': init, 'frame': frame}
+    if valid is not None:
+      fields['valid'] = valid
+      fields['lead'] = int((valid - init).total_seconds()//3600)//lead_unit
+
+    urls = [product['url'].format(epoch_hr=hr, **fields) for hr in epoch_hr] if 'url' in product else [None]
+    page = product['page'].format(**fields) if 'page' in product else None
+
+    if 'files' in product:
+      fileName = product['files'][frame]
+    else:
+      fileName = product['file'].format(**fields)
+
+    jobs.append(DownloadJob(switch_name, product['title'], frame if valid is not None else None, valid, urls[0], page,
+                            os.path.join(saveDir, fileName), product.get('post'), tuple(urls[1:])))
+
+  return jobs
+
+
+def isDated(product):
+  """
+  isDated(product)
+
+  Tells if the url (or page) of a product depends on the forecast day, so it can be downloaded for a past day.
+  """
+
+  template = product.get('url', '') + product.get('page', '')
+
+  return any(field in template for field in date_fields)
+
+
+def buildJobs(catalog, switches, today, saveDir, datedOnly=False):
+  """
+  buildJobs(catalog, switches, today, saveDir, datedOnly)
+
+  Builds the full list of download jobs for every switch that is set to True, in catalog order.
+
+  Parameters:
+  - catalog: the product catalog (see loadCatalog)
+  - switches: dictionary of switch name -> True/False (from switches_download.txt)
+  - today: the forecast day (datetime at 00 UTC)
+  - saveDir: directory where the images get saved
+  - datedOnly: True to leave out the products whose url does not depend on the day (for a past forecast day)
+  - jobs: returned list of DownloadJob
+  """
+
+  jobs = []
+  for switch_name, products in catalog.items():
+    if not switches.get(switch_name):
+      continue
+    for product in products:
+      if 'requires' in product and not switches.get(product['requires']):
+        continue
+      if datedOnly and not isDated(product):
+        continue
+      jobs += productJobs(switch_name, product, today, saveDir)
+
+  return jobs
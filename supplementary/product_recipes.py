@@ -0,0 +1,245 @@
+"""
+This module lists how each downloaded product is cropped and marked up for the CPEX-CV forecasting template
+(one ProcessStep per group of images), so the steps can be run by crop_edit_daily_images.py, or by the download
+stage as soon as the images of a product have arrived.
+
+ProcessStep fields:
+ - name: short name of the step (used by the scheduler)
+ - title: printed when the step runs (None to print nothing)
+ - switches: the step runs when any of these switches is True (all of them with all_switches=True)
+ - select: function of a file name in ./figs/, True for the images of the step
+ - recipe: image_engine.Recipe applied to each image (None when custom does the work)
+ - custom: function(files, saveDir, cropDir) for steps that are not a single recipe
+ - after: function(files, saveDir, cropDir) run once the images are written
+ - needs: names of other steps that have to be done first
+ - outName: function of a file name, the name of its processed image in ./figs_cropped/ when after renames it
+
+Required packages: collections, os, PIL.
+"""
+
+
+from collections import namedtuple
+import os
+
+import image_engine
+from image_engine import Label, Marker, Recipe
+
+
+ProcessStep = namedtuple('ProcessStep', ['name', 'title', 'switches', 'select', 'recipe', 'custom', 'after', 'needs', 'all_switches', 'outName'],
+                         defaults=[None, None, None, (), False, None])
+
+# labels of the Celsius IR color scale added to the side of the GOES-16 and Meteosat-11 IRC images: (y, text)
+celsius_scale = [(1775, '-110'), (1577, '-90'), (1395, '-70'), (1215, '-50'), (1035, '-30'),
+                 (855, '-10'), (675, ' 10'), (495, ' 30'), (315, ' 50'), (245, 'ºC')]
+
+
+def mimicFrameName(fl):
+  """
+  mimicFrameName(fl)
+
+  Returns the name of a MIMIC-TPW frame with a two-digit frame number (MIMIC-TPW_24h_animation-3.png -> ...-03.png),
+  the other file names as they are.
+  """
+
+  if 'animation-' not in fl:
+    return fl
+
+  return fl[:24] + '{:02d}'.format(int(fl.split('-')[-1].split('.')[0])) + fl[-4:]
+
+
+def mimicFrameNames(files, saveDir, cropDir):
+  """
+  mimicFrameNames(files, saveDir, cropDir)
+
+  Renames the cropped MIMIC-TPW frames to two-digit frame numbers (mimicFrameName).
+  """
+
+  for fl in files:
+    if mimicFrameName(fl) != fl:
+      os.replace(os.path.join(cropDir,fl), os.path.join(cropDir,mimicFrameName(fl)))
+
+  return
+
+
+def salSplit(files, saveDir, cropDir):
+  """
+  salSplit(files, saveDir, cropDir)
+
+  Crops the SAL dust split image, and adds a larger version of its color bar underneath.
+  """
+
+  recipe = Recipe(crop='1312x780+230+0', markers=[Marker(1120, 488, 6, 'white')])
+  recipe_cbar = Recipe(crop='682x38+430+782', resize='1312x73')
+
+  for fl in files:
+    source = image_engine.load(os.path.join(saveDir,fl))
+    print('      ... Adding a larger version of the color bar.')
+    # # # join original image and larger color bar together
+    image_engine.save(image_engine.append([recipe.apply(source), recipe_cbar.apply(source)], vertical=True), os.path.join(cropDir,fl))
+
+  return
+
+
+def goesMeteosatIRC(files, saveDir, cropDir):
+  """
+  goesMeteosatIRC(files, saveDir, cropDir)
+
+  Joins the cropped GOES-16 (without its color scale) and Meteosat-11 color IR images into Goes16_Meteosat11_IRC.png.
+  """
+
+  current_files_met = [fl for fl in files if 'Meteosat' in fl and '_IRC.' in fl]
+  current_files_goes = [fl for fl in files if 'Goes16' in fl and '_IRC.' in fl]
+  if len(current_files_met) == 0 or len(current_files_goes) == 0:
+    print('... ... Missing images - cannot join GOES-16 and Meteosat-11 IR images')
+    return
+
+  # crop off the color bar off of GOES16, and merge met file with goes file
+  goes = image_engine.crop(image_engine.load(os.path.join(cropDir,current_files_goes[0])), '502x2000+0+0')
+  met = image_engine.load(os.path.join(cropDir,current_files_met[0]))
+  image_engine.save(image_engine.append([goes, met]), os.path.join(cropDir,'Goes16_Meteosat11_IRC.png'))
+
+  return
+
+
+steps = [
+  ProcessStep('nhc_analysis', '... NHC analysis - cropping image and adding   Sal locations.', ('nhc_analysis',),
+              lambda fl: 'NHC_surface_analysis.png' in fl,
+              Recipe(crop='1268x648+1100+350', markers=[Marker(952, 445, 5, 'red')])),
+  ProcessStep('nhc_outlook', None, ('nhc_analysis',),
+              lambda fl: 'NHC_' in fl and 'surface_analysis' not in fl,
+              Recipe(crop='900x665+0+0', markers=[Marker(775, 445, 5, 'blue')])),
+
+  ProcessStep('mimic_tpw', '... MIMIC-TPW - cropping image and adding   Sal locations.', ('mimic_tpw',),
+              lambda fl: 'MIMIC-TPW' in fl,
+              Recipe(crop='990x452+8+18', markers=[Marker(665, 323, 4, 'white')]), after=mimicFrameNames, outName=mimicFrameName),
+
+  ProcessStep('brammer_tropical_waves', '   ... Tropical wave analysis - cropping image and adding Sal locations.', ('brammer_tropical_waves',),
+              lambda fl: 'Brammer' in fl,
+              Recipe(crop='990x388+10+0', markers=[Marker(662, 243, 4, 'red')])),
+
+  ProcessStep('sal_split', '   ... SAL dust split image - cropping image and adding Sal location.', ('sal_split',),
+              lambda fl: 'SAL_dryAir_split' in fl, custom=salSplit),
+
+  #Marker(600, 675, 12, 'magenta')
+  ProcessStep('meteosat_sat', '... Meteosat-11 - cropping image, adding Sal location, and adding a Celsius IR scale.', ('meteosat_sat',),
+              lambda fl: 'Meteosat' in fl and 'IRC' not in fl,
+              Recipe(crop='3000x2000+0+0', markers=[Marker(850, 910, 12, 'magenta')])),
+  # the color IR image also gets a Celsius color scale on its side
+  ProcessStep('meteosat_irc', '      ... Color IR - adding Celsius color scale on side.', ('meteosat_sat',),
+              lambda fl: 'Meteosat' in fl and 'IRC' in fl,
+              Recipe(crop='3000x2000+0+0', markers=[Marker(850, 910, 12, 'magenta')], resize='3100x2000', extent='3100x2000',
+                     labels=[Label(3000, yPtT, text) for yPtT, text in celsius_scale])),
+
+  ProcessStep('goes16_irc', '... GOES-16 - cropping image, adding St. Croix location, and adding a Celsius IR scale.', ('GOES16_sat',),
+              lambda fl: 'Goes16' in fl and 'IRC' in fl,
+              Recipe(crop='2000x2000+0+0', markers=[Marker(1340, 940, 12, 'magenta')], resize='2100x2000', extent='2100x2000',
+                     labels=[Label(2000, yPtT, text) for yPtT, text in celsius_scale])),
+  ProcessStep('goes16_vis', None, ('GOES16_sat',),
+              lambda fl: 'Goes16' in fl and 'IRC' not in fl and 'VIS' in fl,
+              Recipe(crop='3712x3700+0+0', markers=[Marker(940, 1560, 24, 'magenta')])),
+
+  ProcessStep('goes16_meteosat_irc', None, ('meteosat_sat', 'GOES16_sat'),
+              lambda fl: 'Meteosat' in fl or 'Goes16' in fl, custom=goesMeteosatIRC, needs=('meteosat_irc', 'goes16_irc'), all_switches=True),
+
+  ProcessStep('uwincm_clouds_animation', '   ... UWIN-CM - clouds and TPW - cropping image and adding Sal locations.', ('uwincm_clouds_animation',),
+              lambda fl: 'uwincm_clouds' in fl,
+              Recipe(crop='740x450+25+110', markers=[Marker(448, 172, 5, 'white')])),
+
+  # Cape Verde
+  ProcessStep('uwincm_precipitation_animation', '   ... UWIN-CM - precipitation - cropping image and adding Sal locations.', ('uwincm_precipitation_animation',),
+              lambda fl: 'uwincm_precip' in fl,
+              Recipe(crop='740x500+25+110', markers=[Marker(454, 171, 5, 'black', 'red')])),
+
+  #Recipe(crop='800x500+0+0', ...)
+  ProcessStep('uutah_precipitation_animation', '   ... Unversity of Utah - precipitation - cropping image and adding Sal location.', ('uutah_precipitation_animation', 'UTAH_website'),
+              lambda fl: 'uutah_precip' in fl or 'uutah_clouds' in fl,
+              Recipe(markers=[Marker(452, 187, 5, 'black', 'red')], resize='750x500')),
+
+  ProcessStep('ucdavis_precipitation_animation', '   ... Unversity of UCDavis - precipitation - cropping image and adding Sal location.', ('ucdavis_precipitation_animation',),
+              lambda fl: 'ucdavis_precip' in fl,
+              Recipe(markers=[Marker(422, 163, 5, 'black', 'red')], resize='750x500')),
+
+  ProcessStep('ECMWF_prediction', '   ... ECMWF outlook - cropping image and adding Sal locations.', ('ECMWF_prediction',),
+              lambda fl: 'ECMWF_midRH_anim' in fl or 'ECMWF_mslp_pcpn_anim' in fl,
+              Recipe(crop='971x547+0+0', markers=[Marker(235, 325, 4, 'red')])),
+
+  #Recipe(crop='825x530+80+85', ...)
+  ProcessStep('GFS_prediction', '   ... GFS outlook - cropping image and adding Sal locations.', ('GFS_prediction',),
+              lambda fl: 'GFS_midRH_anim' in fl or 'GFS_mslp_pcpn_anim' in fl,
+              Recipe(markers=[Marker(235, 325, 4, 'red')])),
+
+  ProcessStep('mpas_outlook_day34', '   ... MPAS outlook - cropping image and adding Sal locations.', ('mpas_outlook_day34',),
+              lambda fl: 'mpas_rainr' in fl or 'mpas_pw_olr' in fl,
+              Recipe(crop='780x400+0+115', markers=[Marker(402, 98, 4, 'red')])),
+
+  ProcessStep('mpas_precipitation', None, ('mpas_precipitation',),
+              lambda fl: 'mpas_precip' in fl,
+              Recipe(crop='780x400+0+115', markers=[Marker(402, 98, 4, 'red')], resize='750x500')),
+
+  ProcessStep('geos_700mb', '   ... NASA GEOS images - cropping image and adding Sal locations.', ('nasa_geos',),
+              lambda fl: 'GEOS_700mb_outlook' in fl,
+              Recipe(crop='984x688+0+80', markers=[Marker(685, 335, 5, 'red')])),
+  #Marker(360, 325, 5, 'white')
+  ProcessStep('geos_dust', None, ('nasa_geos',),
+              lambda fl: 'GEOS_dust' in fl and 'vert' not in fl,
+              Recipe(crop='984x688+0+80', markers=[Marker(685, 335, 5, 'white')])),
+  ProcessStep('geos_dust_15N', None, ('nasa_geos',),
+              lambda fl: 'GEOS_dust' in fl and 'N.png' in fl,
+              Recipe(crop='1021x654+2+57', markers=[Marker(750, 619, 8, 'white')])),
+  ProcessStep('geos_dust_20W', None, ('nasa_geos',),
+              lambda fl: 'GEOS_dust' in fl and 'W.png' in fl,
+              Recipe(crop='1019x681+0+57', markers=[Marker(495, 619, 8, 'white')])),
+  ProcessStep('geos_total_aot', None, ('nasa_geos',),
+              lambda fl: 'GEOS_total_aot' in fl,
+              Recipe(crop='984x688+0+80', markers=[Marker(685, 335, 5, 'blue')])),
+  ProcessStep('geos_cloud_fraction', None, ('nasa_geos',),
+              lambda fl: 'GEOS_' in fl and 'CloudFraction' in fl,
+              Recipe(crop='984x688+0+80', markers=[Marker(685, 335, 5, 'red')])),
+]
+
+
+def isOn(step, switches):
+  """
+  isOn(step, switches)
+
+  Returns True when the switches of the step are set.
+
+  Parameters:
+  - step: ProcessStep
+  - switches: dictionary of switch name -> True/False
+  """
+
+  setting = [switches.get(switch_name, False) for switch_name in step.switches]
+
+  return all(setting) if step.all_switches else any(setting)
+
+
+def runStep(step, saveDir, cropDir, skipUpToDate=False):
+  """
+  runStep(step, saveDir, cropDir, skipUpToDate)
+
+  Crops and marks up the images of one step, from saveDir into cropDir.
+
+  Parameters:
+  - step: ProcessStep
+  - saveDir: directory of the downloaded images (e.g. ./figs/)
+  - cropDir: directory of the processed images (e.g. ./figs_cropped/)
+  - skipUpToDate: True to leave out images whose processed copy is newer than the download
+  """
+
+  if step.title is not None:
+    print(step.title)
+
+  files = sorted([fl for fl in os.listdir(saveDir) if step.select(fl)])
+  if skipUpToDate and step.outName is not None:
+    # the processed images are renamed by after, so they are looked for under their new name
+    files = [fl for fl in files if not image_engine.isUpToDate(os.path.join(saveDir,fl), os.path.join(cropDir,step.outName(fl)))]
+  if step.custom is not None:
+    step.custom(files, saveDir, cropDir)
+  else:
+    image_engine.processFiles(step.recipe, files, saveDir, cropDir, skipUpToDate)
+
+  if step.after is not None:
+    step.after(files, saveDir, cropDir)
+
+  return
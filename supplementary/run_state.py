@@ -0,0 +1,184 @@
+"""
+This module holds what the download stage found for each product of one run of the CPEX-CV forecasting
+template (was it asked for, which images arrived, their checksums), and hands it to the animation and cropping
+stages in memory. It replaces switches_process.txt, so two profiles running at the same time (e.g. main and
+model_4panel) do not overwrite each other's switches.
+
+The state is only written to disk (JSON) when the stages are run as separate scripts:
+
+  state = run_state.RunState('main', '2022-09-17')
+  state.addImage('nhc_analysis', './figs/NHC_surface_analysis.png', True, '9f2c...')
+  crop_edit_daily_images.run(state)
+  state.save(run_state.stateFile)
+
+Required packages: json, os.
+"""
+
+
+import json
+import os
+
+
+stateFile = os.path.join('.','figs','.run_state.json')   # used by the stage scripts run on their own
+
+
+class ProductState:
+  """
+  ProductState(requested)
+
+  What the download stage found for one product (switch).
+
+  Parameters:
+  - requested: True if the switch of the product was on
+  """
+
+  def __init__(self, requested=False):
+    self.requested = requested
+    self.available = False
+    self.files = {}     # file name -> sha256 (None when not known, e.g. after a post step)
+    self.missing = []   # file names that could not be downloaded
+
+  @property
+  def frames(self):
+    return len(self.files)
+
+  def toDict(self):
+    return {'requested': self.requested, 'available': self.available, 'files': self.files, 'missing': self.missing}
+
+
+class RunState:
+  """
+  RunState(profile, cycle, runId)
+
+  State of one run, passed from the download stage to the animation and cropping stages.
+
+  Parameters:
+  - profile: name of the profile (e.g. main, model_4panel)
+  - cycle: forecast day (e.g. 2022-09-17)
+  - runId: name of the run (workspace.Workspace.runId, None for a run in place)
+  """
+
+  def __init__(self, profile=None, cycle=None, runId=None):
+    self.profile = profile
+    self.cycle = cycle
+    self.runId = runId
+    self.products = {}
+
+  def product(self, switch_name):
+    """
+    product(switch_name)
+
+    Returns the ProductState of a switch, adding it if needed.
+    """
+
+    return self.products.setdefault(switch_name, ProductState())
+
+  def request(self, switch_name, requested=True):
+    """
+    request(switch_name, requested)
+
+    Records whether the switch of a product was on.
+    """
+
+    self.product(switch_name).requested = requested
+
+    return
+
+  def addImage(self, switch_name, fileName, ok, checksum=None):
+    """
+    addImage(switch_name, fileName, ok, checksum)
+
+    Records one image of a product. A product is available once any of its images was downloaded.
+
+    Parameters:
+    - switch_name: name of the switch (e.g. nhc_analysis)
+    - fileName: the complete path and name of the image
+    - ok: True if the image was downloaded
+    - checksum: sha256 of the image
+    """
+
+    product = self.product(switch_name)
+    product.requested = True
+    name = os.path.basename(fileName)
+    if ok:
+      product.files[name] = checksum
+      product.available = True
+    elif name not in product.files and name not in product.missing:
+      product.missing.append(name)
+
+    return
+
+  def setAvailable(self, switch_name, available=True):
+    """
+    setAvailable(switch_name, available)
+
+    Sets a product as available (or not) without images (e.g. model_4panel, which is made from other products).
+    """
+
+    self.product(switch_name).available = available
+
+    return
+
+  def switches(self):
+    """
+    switches()
+
+    Returns a dictionary of switch name -> True/False, True if the product is available.
+    """
+
+    return dict((switch_name, product.available) for switch_name, product in self.products.items())
+
+  def counts(self):
+    """
+    counts()
+
+    Returns the number of images downloaded and the number asked for, over all the products.
+    """
+
+    good = sum(product.frames for product in self.products.values())
+    bad = sum(len(product.missing) for product in self.products.values())
+
+    return good, good + bad
+
+  def toDict(self):
+    return {'profile': self.profile, 'cycle': self.cycle, 'run': self.runId,
+            'products': dict((switch_name, product.toDict()) for switch_name, product in self.products.items())}
+
+  def save(self, fileName):
+    """
+    save(fileName)
+
+    Writes the state to a JSON file (written to a temporary file first, then renamed).
+    """
+
+    tmpName = fileName + '.part'
+    with open(tmpName, 'w') as fl:
+      json.dump(self.toDict(), fl, indent=1)
+    os.replace(tmpName, fileName)
+
+    return
+
+
+def load(fileName):
+  """
+  load(fileName)
+
+  Reads a state written by RunState.save().
+
+  Parameters:
+  - fileName: the complete path and name of the JSON file
+  - state: returned RunState
+  """
+
+  with open(fileName, 'r') as fl:
+    data = json.load(fl)
+
+  state = RunState(data.get('profile'), data.get('cycle'), data.get('run'))
+  for switch_name, entry in data.get('products', {}).items():
+    product = state.product(switch_name)
+    product.requested = entry.get('requested', False)
+    product.available = entry.get('available', False)
+    product.files = dict(entry.get('files', {}))
+    product.missing = list(entry.get('missing', []))
+
+  return state
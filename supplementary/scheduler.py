@@ -0,0 +1,196 @@
+"""
+This module runs tasks as soon as the tasks they depend on are done (a dependency graph), so e.g. the images of
+a product are cropped while the other products are still downloading.
+
+Tasks are either functions, run on a few worker threads, or external tasks (e.g. downloads done by
+download_engine.py) that are marked done with complete(). A task whose dependency failed is skipped.
+
+  tasks = Scheduler()
+  tasks.addExternal('download:0')
+  tasks.add('crop:nhc_analysis', product_recipes.runStep, (step, saveDir, cropDir), deps=['download:0'])
+  tasks.start()
+  ...
+  tasks.complete('download:0')
+  status = tasks.wait()
+
+Required packages: concurrent.futures, threading.
+"""
+
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+
+max_workers = 4
+
+
+class Scheduler:
+  """
+  Scheduler(workers)
+
+  Dependency graph of tasks. Tasks have to be added after the tasks they depend on.
+
+  Parameters:
+  - workers: number of threads running the function tasks
+  """
+
+  def __init__(self, workers=max_workers):
+    self.workers = workers
+    self.tasks = {}
+    self.status = {}
+    self.waiting = {}
+    self.dependents = {}
+    self.condition = threading.Condition()
+    self.executor = None
+
+  def add(self, name, func, args=(), deps=()):
+    """
+    add(name, func, args, deps)
+
+    Adds a task calling func(*args) once all the tasks in deps are done.
+
+    Parameters:
+    - name: unique name of the task (e.g. crop:nhc_analysis)
+    - func: the function to run
+    - args: arguments of func
+    - deps: names of the tasks that have to be done first
+    """
+
+    with self.condition:
+      self.tasks[name] = (func, args)
+      self.status[name] = 'waiting'
+      self.waiting[name] = set(deps)
+      for dep in deps:
+        self.dependents.setdefault(dep, []).append(name)
+      ready = self.executor is not None and self.checkReady(name)
+
+    if ready:
+      self.submit(name)
+
+    return
+
+  def addExternal(self, name):
+    """
+    addExternal(name)
+
+    Adds a task that is done outside of the scheduler, and marked with complete().
+
+    Parameters:
+    - name: unique name of the task (e.g. download:12)
+    """
+
+    with self.condition:
+      self.tasks[name] = None
+      self.status[name] = 'running'
+      self.waiting[name] = set()
+
+    return
+
+  def checkReady(self, name):
+    # called with the condition held: marks a waiting task as running (returns True) or skipped
+    if self.status[name] != 'waiting':
+      return False
+    deps = self.waiting[name]
+    if any(self.status[dep] in ('failed', 'skipped') for dep in deps):
+      self.finish(name, 'skipped')
+      return False
+    if all(self.status[dep] == 'done' for dep in deps):
+      self.status[name] = 'running'
+      return True
+    return False
+
+  def finish(self, name, result):
+    # called with the condition held: records the result and returns the dependents that became ready
+    self.status[name] = result
+    self.condition.notify_all()
+    return [dependent for dependent in self.dependents.get(name, []) if self.checkReady(dependent)]
+
+  def submit(self, name):
+    self.executor.submit(self.runTask, name)
+
+  def runTask(self, name):
+    func, args = self.tasks[name]
+    try:
+      func(*args)
+      result = 'done'
+    except Exception as err:
+      print('... ... ' + name + ' failed: ' + str(err))
+      result = 'failed'
+
+    with self.condition:
+      ready = self.finish(name, result)
+    for dependent in ready:
+      self.submit(dependent)
+
+    return
+
+  def start(self):
+    """
+    start()
+
+    Starts running the tasks whose dependencies are done.
+    """
+
+    self.executor = ThreadPoolExecutor(max_workers=self.workers)
+    with self.condition:
+      ready = [name for name in self.tasks if self.tasks[name] is not None and self.checkReady(name)]
+    for name in ready:
+      self.submit(name)
+
+    return
+
+  def complete(self, name, ok=True):
+    """
+    complete(name, ok)
+
+    Marks an external task as done (or failed), and starts the tasks waiting only for it.
+
+    Parameters:
+    - name: name of the external task
+    - ok: False if the task failed (the tasks depending on it are skipped)
+    """
+
+    with self.condition:
+      ready = self.finish(name, 'done' if ok else 'failed')
+    for dependent in ready:
+      self.submit(dependent)
+
+    return
+
+  def cancel(self):
+    """
+    cancel()
+
+    Marks the external tasks not completed yet as failed (the tasks depending on them are skipped), and the tasks
+    not started yet as skipped when start() was never called, so wait() returns once the running tasks are done
+    (e.g. when the downloads stopped on an error).
+    """
+
+    with self.condition:
+      ready = []
+      for name in self.tasks:
+        if self.tasks[name] is None and self.status[name] == 'running':
+          ready += self.finish(name, 'failed')
+      if self.executor is None:
+        for name in self.tasks:
+          if self.status[name] == 'waiting':
+            self.finish(name, 'skipped')
+        ready = []
+    for dependent in ready:
+      self.submit(dependent)
+
+    return
+
+  def wait(self):
+    """
+    wait()
+
+    Waits for all the tasks, and returns a dictionary of task name -> done, failed or skipped.
+    """
+
+    with self.condition:
+      self.condition.wait_for(lambda: all(status in ('done', 'failed', 'skipped') for status in self.status.values()))
+    if self.executor is not None:
+      self.executor.shutdown()
+
+    return dict(self.status)
@@ -0,0 +1,53 @@
+"""
+This module reads the True/False switch files of the CPEX-CV forecasting template
+(e.g. switches_download_main.txt, switches_download_model_4panel.txt and switches_download.txt), which hold one
+"switch_name = True" line per product.
+
+Required packages: os.
+"""
+
+
+import os
+
+
+def switchesPath(fileName):
+  """
+  switchesPath(fileName)
+
+  Returns the path of a switch file in ./supplementary/ (next to this module), from any working directory
+  (e.g. the workspace of a backfill day).
+
+  Parameters:
+  - fileName: name of the switch file (e.g. switches_download.txt)
+  """
+
+  return os.path.join(os.path.dirname(os.path.abspath(__file__)),fileName)
+
+
+def readSwitches(fileName):
+  """
+  readSwitches(fileName)
+
+  Reads a switch file into a dictionary of switch name -> True/False.
+
+  Parameters:
+  - fileName: the complete path and name of the switch file
+  - switches: returned dictionary
+  """
+
+  fl = open(fileName, 'r')
+  data = fl.readlines()
+  fl.close()
+  data = [line.rstrip() for line in data]
+
+  switches = {}
+  for line in data:
+    if len(line) > 0:
+      switch_name, switch_setting = line.split(' = ')
+
+      if switch_setting == 'True':
+        switches[switch_name] = True
+      elif switch_setting == 'False':
+        switches[switch_name] = False
+
+  return switches
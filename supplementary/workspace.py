@@ -0,0 +1,268 @@
+"""
+This module holds where one run of the CPEX-CV forecasting template reads and writes its images, so several runs
+(e.g. the main and model_4panel profiles, or two forecast days) can run at the same time without writing into each
+other's ./figs/, ./figs_cropped/ and ./figs_final/.
+
+A run started by cpexcv.py works in its own workspace, ./runs/<run id>/ (e.g. ./runs/main-2022-09-17/), with its
+own figs/, figs_cropped/ and figs_final/. The run id is the profile and the forecast day, so --resume finds the
+workspace of the run that died. Only at the end are the final images published into the template's ./figs_final/
+(the directory the .pptx template reads): each image is written under a temporary name and renamed over the old
+one, so ./figs_final/ never holds a half-written image, and two runs publishing at the same time take turns
+(./figs_final/.publish.lock). The images are replaced one by one, not the directory as a whole: ./figs_final/ holds
+the images of both profiles (each run only replaces its own) and stays a plain directory on every operating system,
+so a reader listing it during the second or so of a publish can see new and old images side by side. The images a
+profile no longer makes are removed when it publishes (./figs_final/.published.json tells which run published
+what). The download cache and the archive stay shared by all the runs.
+
+The stage scripts run on their own (e.g. python ./supplementary/crop_edit_daily_images.py) keep working in place,
+in ./figs/, ./figs_cropped/ and ./figs_final/ of the working directory (Workspace.inPlace()).
+
+  ws = workspace.Workspace.forRun('main', datetime(2022, 9, 17))
+  ws.create()
+  crop_edit_daily_images.run(state, workspace=ws)
+  ws.publish()
+
+Required packages: contextlib, datetime, json, os, shutil.
+"""
+
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import shutil
+
+import file_lock
+
+
+templateDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+runsDir = os.path.join(templateDir,'runs')
+
+
+class Workspace:
+  """
+  Workspace(root, runId, publishDir, shareDir, profile, day)
+
+  The directories of one run.
+
+  Parameters:
+  - root: directory holding figs/, figs_cropped/ and figs_final/ of the run
+  - runId: name of the run (e.g. main-2022-09-17), None for a run in place
+  - publishDir: where publish() puts the final images (None to leave them in root/figs_final/)
+  - shareDir: directory of the logo, download cache and archive shared by the runs (None for root)
+  - profile: name of the profile run (e.g. main)
+  - day: forecast day of the run (datetime, None for today)
+  """
+
+  def __init__(self, root, runId=None, publishDir=None, shareDir=None, profile=None, day=None):
+    self.root = root
+    self.runId = runId
+    self.profile = profile
+    self.day = day
+    self.publishDir = publishDir
+    self.shareDir = shareDir or root
+    self.saveDir = os.path.join(root,'figs')
+    self.cropDir = os.path.join(root,'figs_cropped')
+    self.finDir = os.path.join(root,'figs_final')
+    self.stateFile = os.path.join(self.saveDir,'.run_state.json')
+    self.cacheDir = os.path.join(self.shareDir,'download_cache')
+    self.archiveDir = os.path.join(self.shareDir,'forecast_archive')
+    self.logo = os.path.join(self.shareDir,'logo_cpexcv.png')
+
+  @classmethod
+  def inPlace(cls, root='.'):
+    """
+    inPlace(root)
+
+    Returns the workspace of a run working directly in root/figs*, as the stage scripts always did.
+    """
+
+    return cls(root)
+
+  @classmethod
+  def forRun(cls, profile, day=None, runId=None):
+    """
+    forRun(profile, day, runId)
+
+    Returns the workspace of a run of a profile for a forecast day, in ./runs/<profile>-<YYYY-MM-DD>/ of the template.
+
+    Parameters:
+    - profile: name of the profile (e.g. main)
+    - day: forecast day (datetime, None for today)
+    - runId: name of the run (None for <profile>-<YYYY-MM-DD>)
+    """
+
+    if runId is None:
+      runId = profile + '-' + (day or datetime.today()).strftime('%Y-%m-%d')
+
+    return cls(os.path.join(runsDir,runId), runId, os.path.join(templateDir,'figs_final'), templateDir, profile, day)
+
+  @property
+  def finalDir(self):
+    # where the final images are read by the .pptx template (and archived from)
+    return self.publishDir or self.finDir
+
+  def create(self):
+    """
+    create()
+
+    Creates the directories of the workspace.
+    """
+
+    for directory in [self.saveDir, self.cropDir, self.finDir]:
+      if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    return
+
+  @contextmanager
+  def running(self):
+    """
+    running()
+
+    Holds the lock of the run (root/.run.lock) while its steps run, and marks it finished (root/.finished) once they
+    all went through, so removeOldRuns() never removes a run that is working or that died (kept for --resume).
+    """
+
+    if self.runId is None:
+      yield
+      return
+
+    finished = os.path.join(self.root,'.finished')
+    with file_lock.FileLock(os.path.join(self.root,'.run.lock'), self.runId):
+      if os.path.exists(finished):
+        os.remove(finished)
+      yield
+      with open(finished, 'w') as fl:
+        fl.write(datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
+
+  def publish(self):
+    """
+    publish()
+
+    Puts the final images of the run into publishDir, one run at a time: each image is renamed over the old one, and
+    the images a previous run of the same profile published there but this run did not make are removed. Who
+    published each image is kept in publishDir/.published.json.
+
+    Parameters:
+    - names: returned list of the file names published
+    """
+
+    if self.publishDir is None:
+      return []
+
+    names = [fl for fl in sorted(os.listdir(self.finDir)) if not fl.startswith('.') and os.path.isfile(os.path.join(self.finDir,fl))]
+    owner = self.profile or self.runId
+    with self.publishLock():
+      published = readPublished(self.publishDir)
+
+      for fl in names:
+        tmpName = os.path.join(self.publishDir,'.' + fl + '.' + self.runId + '.part')
+        if os.path.lexists(tmpName):
+          os.remove(tmpName)
+        # a copy, not a hardlink: the workspace file is written again in place by a rerun, and the published one
+        # is moved into the archive store (read-only) by the archive step
+        shutil.copyfile(os.path.join(self.finDir,fl), tmpName)
+        os.replace(tmpName, os.path.join(self.publishDir,fl))
+
+      for fl, entry in list(published.items()):
+        fileName = os.path.join(self.publishDir,fl)
+        if entry.get('owner') == owner and fl not in names and os.path.isfile(fileName):
+          os.remove(fileName)   # left by a previous run of the profile, no longer made
+        if not os.path.isfile(fileName):
+          del published[fl]   # removed, or moved out by the archive step
+
+      now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+      for fl in names:
+        published[fl] = {'owner': owner, 'run': self.runId, 'time': now}
+      writePublished(self.publishDir, published)
+
+    return names
+
+  @contextmanager
+  def publishLock(self):
+    """
+    publishLock()
+
+    Holds the lock of publishDir (nothing for a run in place), so no other run publishes into it or archives it meanwhile.
+    """
+
+    if self.publishDir is None:
+      yield
+      return
+
+    if not os.path.isdir(self.publishDir):
+      os.makedirs(self.publishDir)
+
+    with file_lock.FileLock(os.path.join(self.publishDir,'.publish.lock'), self.runId):
+      yield
+
+
+def readPublished(publishDir):
+  """
+  readPublished(publishDir)
+
+  Returns the dictionary of file name -> {'owner': profile, 'run': run id, 'time': ...} of the images published.
+  """
+
+  try:
+    with open(os.path.join(publishDir,'.published.json'), 'r') as fl:
+      return json.load(fl).get('files', {})
+  except (OSError, ValueError):
+    return {}
+
+
+def writePublished(publishDir, published):
+  fileName = os.path.join(publishDir,'.published.json')
+  with open(fileName + '.part', 'w') as fl:
+    json.dump({'files': published}, fl, indent=1, sort_keys=True)
+  os.replace(fileName + '.part', fileName)
+
+  return
+
+
+def removeOldRuns(before, directory=None, keep=None):
+  """
+  removeOldRuns(before, directory, keep)
+
+  Removes the workspaces of the finished runs of the days before a day (their final images are published and
+  archived). A run still working (its lock is held) or that died (not marked finished) is left alone.
+
+  Parameters:
+  - before: datetime of the forecast day of the run calling it
+  - directory: where the workspaces are (None for runsDir)
+  - keep: run id never removed (the run calling it)
+  - removed: returned list of the run ids removed
+  """
+
+  directory = directory or runsDir
+  if not os.path.isdir(directory):
+    return []
+
+  before = before.strftime('%Y-%m-%d')
+  removed = []
+  for runId in sorted(os.listdir(directory)):
+    root = os.path.join(directory,runId)
+    if runId == keep or runId.startswith('.') or not os.path.isdir(root):
+      continue
+    try:
+      day = datetime.strptime(runId[-10:], '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+      continue   # named with --run-id, removed by hand
+    if day >= before or not os.path.isfile(os.path.join(root,'.finished')):
+      continue
+    lockName = os.path.join(root,'.run.lock')
+    token = file_lock.readToken(lockName)
+    if token is not None and not file_lock.isStale(lockName, token):
+      continue   # run again (e.g. --resume) right now
+
+    # renamed first, so a run starting in it meanwhile makes a new workspace instead of losing its files
+    trash = os.path.join(directory,'.' + runId + '.removed')
+    try:
+      os.replace(root, trash)
+    except OSError:
+      continue
+    shutil.rmtree(trash, ignore_errors=True)
+    removed.append(runId)
+
+  return removed